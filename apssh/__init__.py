@@ -6,48 +6,77 @@ http://apssh.readthedocs.io/
 
 """
 
-from .version import __version__
+import importlib
 
-# protect for install-time when dependencies are not yet installed
-try:
-    import asyncssh
+# the public names, grouped by the module that defines them
+#
+# these are imported lazily, upon first access, so that a mere
+# 'import apssh' - and e.g. 'apssh --version' - does not need to load
+# asyncssh, asynciojobs, jinja2 or yaml
+_LAZY_NAMES = {
+    # from pyproject.toml, through importlib.metadata that is not cheap either
+    'version': ('__version__',),
+    # basic tools to deal with keys
+    'keys': (
+        'load_private_keys', 'load_agent_keys', 'import_private_key',
+        'co_load_private_keys', 'co_load_agent_keys', 'clear_keys_cache',
+    ),
+    # basic ssh connections and sessions
+    'sshproxy': ('SshProxy', 'COMMAND_TIMEOUT'),
+    # how to format outputs
+    'formatters': (
+        'RawFormatter', 'TerminalFormatter',
+        'HostFormatter', 'TimeHostFormatter', 'CaptureFormatter',
+    ),
+    'commands': (
+        'Run', 'RunScript', 'RunString', 'Push', 'Pull',
+        'PurgeRemoteWorkdir', 'Parallel',
+    ),
+    # feeding the standard input of commands
+    'stdin': ('StdinBroadcast',),
+    # jobs for asynciojobs
+    'sshjob': (
+        'SshJob', 'FanoutJob', 'QuorumJob', 'ProgressJob',
+        'CommandFailedError', 'QuorumReached',
+    ),
+    # SshNode is just an SshProxy with a slightly different
+    #  default for keys management
+    # LocalNode is helpful to add local commands in a scenario
+    'nodes': ('SshNode', 'LocalNode'),
+    # limiting the simultaneous connection attempts
+    'adaptive': ('AdaptiveWindow',),
+    'service': ('Service',),
+    'topology': (
+        'close_ssh_in_scheduler', 'co_close_ssh_in_scheduler',
+        'prewarm', 'co_prewarm',
+        'topology_graph', 'topology_dot', 'topology_as_dotfile',
+        'topology_as_pngfile',
+    ),
+    'deferred': ('Variables', 'Deferred', 'Capture'),
+    'yaml_loader': ('YamlLoader',),
+}
 
-except ModuleNotFoundError:
-    print("WARNING: could not import asyncssh, required by apssh")
+# name -> module
+_LAZY_MODULES = {
+    name: module
+    for module, names in _LAZY_NAMES.items()
+    for name in names
+}
 
-# basic tools to deal with keys
-from .keys import load_private_keys, load_agent_keys, import_private_key
+__all__ = list(_LAZY_MODULES)
 
-# basic ssh connections and sessions
-from .sshproxy import SshProxy
 
-# how to format outputs
-from .formatters import (
-    RawFormatter, TerminalFormatter,
-    HostFormatter, TimeHostFormatter, CaptureFormatter
-)
+def __getattr__(name):
+    try:
+        module = _LAZY_MODULES[name]
+    except KeyError:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    # so that this happens only once
+    globals()[name] = value
+    return value
 
-from .commands import Run, RunScript, RunString, Push, Pull
 
-# jobs for asynciojobs
-from .sshjob import SshJob, CommandFailedError
-
-# SshNode is just an SshProxy with a slightly different
-#  default for keys management
-# LocalNode is helpful to add local commands in a scenario
-from .nodes import SshNode, LocalNode
-
-from .service import Service
-
-from .topology import (
-    close_ssh_in_scheduler, co_close_ssh_in_scheduler,
-    topology_graph, topology_dot, topology_as_dotfile, topology_as_pngfile
-)
-
-from .deferred import (
-    Variables, Deferred, Capture,
-)
-
-from .yaml_loader import (
-    YamlLoader
-)
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_MODULES))
@@ -0,0 +1,176 @@
+"""
+An adaptive limit on the number of simultaneous ssh connection attempts,
+see :class:`AdaptiveWindow`; this is what ``apssh -w auto`` uses.
+"""
+
+import time
+import asyncio
+import contextlib
+from collections import deque
+
+import asyncssh
+
+
+class AdaptiveWindow:                                   # pylint: disable=r0902
+    """
+    Limits the number of ssh connections being established at any given
+    time, and adjusts that limit on the fly with an AIMD policy, much like
+    TCP does with its congestion window:
+
+    * the window starts small, and grows by one for each successful
+      connection - so it roughly doubles each round - until the first
+      congestion occurs; after that it grows by one per round;
+    * a connection that is fast enough counts as a success; if it takes
+      more than ``slow_factor`` times the fastest one so far, the window
+      is left unchanged;
+    * a connection that times out, is refused or is reset - the way an
+      sshd that exceeds its ``MaxStartups``, or a saturated gateway,
+      usually behave - counts as a congestion, and divides the window by 2;
+      the attempts that started before that cut are not taken into account,
+      so that a burst of failures causes a single cut.
+
+    An instance is meant to be shared by many nodes through their
+    ``connect_window`` setting, see :class:`~apssh.sshproxy.SshProxy`.
+
+    Parameters:
+      initial: the initial window
+      minimum: the window never gets smaller
+      maximum: the window never gets larger; default is no limit
+      decrease: the factor applied to the window on congestion
+      slow_factor: the latency above which a connection is not
+        considered healthy, relative to the fastest one
+
+    The window sizes are recorded in :attr:`trajectory`, a list of
+    ``(seconds, window, reason)`` tuples, with the number of seconds since
+    the first attempt, and reason being either ``"increase"`` or the name
+    of the exception that caused a cut.
+    """
+
+    # the exceptions that denote a congestion
+    CONGESTION_ERRORS = (asyncio.TimeoutError, ConnectionRefusedError,
+                         ConnectionResetError, asyncssh.ConnectionLost)
+
+    def __init__(self, initial=8, *, minimum=1, maximum=None,
+                 decrease=0.5, slow_factor=4.):
+        if minimum < 1:
+            raise ValueError(f"AdaptiveWindow: minimum must be positive,"
+                             f" got {minimum}")
+        if maximum is not None and maximum < minimum:
+            raise ValueError(f"AdaptiveWindow: maximum {maximum}"
+                             f" is less than minimum {minimum}")
+        if not 0 < decrease < 1:
+            raise ValueError(f"AdaptiveWindow: decrease must be"
+                             f" between 0 and 1, got {decrease}")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.slow_factor = slow_factor
+        self.size = float(self._bounded(initial))
+        # slow start until the first congestion
+        self.threshold = float('inf')
+        self.in_flight = 0
+        self.trajectory = []
+        self._started = None
+        self._best_latency = None
+        # bumped at each cut
+        self._epoch = 0
+        self._waiters = deque()
+
+    def __repr__(self):
+        return (f"<AdaptiveWindow {self.limit()} -"
+                f" {self.in_flight} in flight>")
+
+    def _bounded(self, size):
+        size = max(size, self.minimum)
+        if self.maximum is not None:
+            size = min(size, self.maximum)
+        return size
+
+    def limit(self):
+        """
+        Returns:
+          int: the current number of connection attempts allowed
+        """
+        return int(self.size)
+
+    def _record(self, reason):
+        now = time.monotonic()
+        self.trajectory.append(
+            (round(now - self._started, 3), self.limit(), reason))
+
+    def _resize(self, size, reason):
+        before = self.limit()
+        self.size = float(self._bounded(size))
+        if self.limit() != before:
+            self._record(reason)
+            self._wake()
+
+    def _wake(self):
+        free = self.limit() - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def _acquire(self):
+        loop = asyncio.get_running_loop()
+        while self.in_flight >= self.limit():
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # we were woken up, pass it on
+                    self._wake()
+                else:
+                    self._waiters.remove(waiter)
+                raise
+        self.in_flight += 1
+
+    def _release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _success(self, latency):
+        if self._best_latency is None or latency < self._best_latency:
+            self._best_latency = latency
+        if latency > self.slow_factor * self._best_latency:
+            return
+        increment = 1 if self.size < self.threshold else 1 / self.size
+        self._resize(self.size + increment, "increase")
+
+    def _congestion(self, epoch, exc):
+        if epoch != self._epoch:
+            return
+        self._epoch += 1
+        self.threshold = self._bounded(self.size * self.decrease)
+        self._resize(self.threshold, type(exc).__name__)
+
+    @contextlib.asynccontextmanager
+    async def attempt(self):
+        """
+        An asynchronous context manager, to be used around the
+        establishment of a connection; it waits until the window allows
+        for one more attempt, and then adjusts the window depending on
+        whether the connection could be established, and how fast::
+
+          async with window.attempt():
+              await asyncssh.connect(...)
+        """
+        if self._started is None:
+            self._started = time.monotonic()
+            self._record("start")
+        await self._acquire()
+        epoch = self._epoch
+        beg = time.monotonic()
+        try:
+            yield
+        except self.CONGESTION_ERRORS as exc:
+            self._congestion(epoch, exc)
+            raise
+        else:
+            self._success(time.monotonic() - beg)
+        finally:
+            self._release()
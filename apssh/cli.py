@@ -13,24 +13,59 @@ which is the purpose of targets.py
 # import sys
 # sys.path.insert(0, "../../asyncssh/")
 
+# the heavy dependencies - asyncssh, asynciojobs, jinja2 - are imported
+# only once they are needed, so that e.g. 'apssh --version' or
+# 'apssh --list-targets' return quickly; hence the imports in the functions
+# pylint: disable=import-outside-toplevel
+
 import sys
 from pathlib import Path
 import argparse
 import re
 
-from asynciojobs import Scheduler
-
 from .util import print_stderr
-from .config import (default_time_name, default_timeout, default_remote_workdir)
-from .formatters import (RawFormatter, HostFormatter,
-                         TimeHostFormatter, SubdirFormatter,
-                         TerminalFormatter, shorten_hostname)
-from .keys import load_private_keys
-from .version import __version__ as apssh_version
-from .sshjob import SshJob
-from .commands import Run, RunScript, RunString, Push, Pull
+from .config import (default_time_name, default_timeout, default_remote_workdir,
+                     default_fanout_threshold, COMMAND_TIMEOUT)
 from .targets import Targets
 
+# the outcome of the hosts that were cut short by --deadline or --quorum
+ABANDONED = "ABANDONED"
+# the outcome of the hosts left out by --skip-recently-failed
+SKIPPED = "SKIPPED"
+# the connect timeout used when re-probing the skipped hosts, at most
+REPROBE_TIMEOUT = 5.
+
+
+def window_type(text):
+    """
+    the type of the -w option in apssh: an int, or 'auto'
+    """
+    if text == 'auto':
+        return text
+    try:
+        return int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"expecting an integer or 'auto', got {text}") from None
+
+
+def report_window(connect_window, args):
+    """
+    the outcome of -w auto, as requested by --window-log and --verbose
+    """
+    trajectory = connect_window.trajectory
+    if args.window_log:
+        with open(args.window_log, 'w') as log:         # pylint: disable=w1514
+            for seconds, size, reason in trajectory:
+                log.write(f"{seconds} {size} {reason}\n")
+    if args.verbose and trajectory:
+        cuts = sum(1 for *_, reason in trajectory
+                   if reason not in ("start", "increase"))
+        print_stderr(f"adaptive window ended at"
+                     f" {connect_window.limit()}, peaked at"
+                     f" {max(size for _, size, _ in trajectory)},"
+                     f" with {cuts} cuts")
+
 
 class CliWithFormatterOptions:         # pylint: disable=too-few-public-methods
     """
@@ -67,6 +102,9 @@ class CliWithFormatterOptions:         # pylint: disable=too-few-public-methods
             help="use date-based directory to store results")
 
     def _get_formatter(self, parsed_args):
+        from .formatters import (RawFormatter, HostFormatter,
+                                 TimeHostFormatter, SubdirFormatter,
+                                 TerminalFormatter)
         if self.formatter is None:
             verbose = parsed_args.verbose
             if parsed_args.format:
@@ -109,16 +147,70 @@ class Apssh(CliWithFormatterOptions):
                             help="just lists the targets and exits")
         # global settings
         parser.add_argument(
-            "-w", "--window", type=int, default=0,
+            "-w", "--window", type=window_type, default=0,
             help="""
             specify how many connections can run simultaneously;
-            default is no limit
+            default is no limit; with 'auto', the number of connections
+            being established at the same time is adjusted on the fly:
+            it grows as long as connections succeed quickly, and shrinks
+            on timeouts, refusals and resets
             """)
+        parser.add_argument(
+            "--window-log", default=None, metavar="FILE",
+            help="""with -w auto, write the successive window sizes
+            in FILE, as lines of the form 'seconds window reason'""")
         # ssh settings
         parser.add_argument(
             "-c", "--connect-timeout", dest='timeout',
             type=float, default=default_timeout,
             help=f"specify connection timeout, default is {default_timeout}s")
+        parser.add_argument(
+            "--command-timeout", type=float, default=None, metavar="SECONDS",
+            help="""terminate the remote command if it has not completed
+            after that many seconds; such hosts are reported as TIMEOUT;
+            default is no limit""")
+        parser.add_argument(
+            "--retries", type=int, default=0, metavar="N",
+            help="""on a host where the command could not run, e.g. because
+            the connection failed or was reset, reconnect and retry
+            up to N times, waiting 1s, then 2s, 4s... in between;
+            default is no retry""")
+        parser.add_argument(
+            "--prewarm", default=False, action='store_true',
+            help="""establish all the connections - within the limits of
+            --window - before running the command anywhere;
+            unreachable hosts are reported upfront""")
+        parser.add_argument(
+            "--deadline", type=float, default=None, metavar="SECONDS",
+            help="""stop waiting after that many seconds overall;
+            the hosts that are not done by then are abandoned,
+            and reported as ABANDONED""")
+        parser.add_argument(
+            "--quorum", type=int, default=None, metavar="K",
+            help="""stop as soon as K hosts have succeeded, abandoning
+            the other ones; the return code is then 0 if at least K hosts
+            have succeeded, instead of all of them""")
+        parser.add_argument(
+            "--skip-recently-failed", type=float, default=None,
+            metavar="TTL",
+            help="""do not run on the hosts that could not be reached in
+            the previous runs, if that was less than TTL seconds ago;
+            they are reported as SKIPPED, and probed in the background
+            so that the ones that are back get used again next time;
+            the outcomes of the runs that use this option are kept
+            in ~/.apssh/.reachability, for a week or TTL if longer""")
+        parser.add_argument(
+            "--progress", default=False, action='store_true',
+            help="""show on stderr how many hosts are pending, running,
+            succeeded or failed, with the throughput and an estimated time
+            left; best used together with -d or -o, so that the outputs
+            do not get mixed with the progress line""")
+        parser.add_argument(
+            "--summary", default=None, choices=('json', 'table'),
+            help="""once done, print a summary of the run: the failure
+            classes and the slowest hosts; with json, this also
+            details the outcome, duration and bytes received
+            for each command on each host""")
         parser.add_argument(
             "-k", "--key", dest='keys',
             default=None, action='append', type=str,
@@ -147,7 +239,10 @@ class Apssh(CliWithFormatterOptions):
             When specified, then for all nodes there will be a file created
             in the output subdir, named either
             0ok/<hostname> for successful nodes,
-            or 1failed/<hostname> for the other ones.
+            2abandoned/<hostname> for the nodes cut short by --deadline
+            or --quorum, 3skipped/<hostname> for the nodes left out
+            by --skip-recently-failed, or 1failed/<hostname>
+            for the other ones.
 
             This mark file will contain a single line with the returned code,
             or 'None' if the node was not reachable at all
@@ -186,6 +281,20 @@ class Apssh(CliWithFormatterOptions):
             to run remotely a shell script that sources other files;
             remember that on the remote end all files (scripts and includes)
             end up in the same location""")
+        parser.add_argument(
+            "--stdin", default=None, metavar="FILE",
+            help="""stream the contents of FILE into the standard input
+            of the remote command; use '-' to forward apssh's own standard
+            input; in that case the contents are read only once,
+            and sent to all targets, which cannot be combined
+            with --retries""")
+        parser.add_argument(
+            "--gc-remote", type=float, default=None, metavar="SECONDS",
+            help=f"""remove the files left by apssh in the remote
+            {default_remote_workdir} directory - like the scripts
+            copied over in script mode - that are older than
+            that many seconds; this runs after the command if one is given,
+            otherwise it is the only thing done on the targets""")
         # the commands to run
         parser.add_argument(
             "commands", nargs=argparse.REMAINDER, type=str,
@@ -206,14 +315,22 @@ class Apssh(CliWithFormatterOptions):
 
         # helpers
         if args.version:
+            from .version import __version__ as apssh_version
             print(f"apssh version {apssh_version}")
             sys.exit(0)
 
         # manual check for REMAINDER
-        if not args.commands:
+        if not args.commands and args.gc_remote is None:
             print("apssh: You must provide a command to be run remotely")
             # parser.print_help()
             sys.exit(1)
+        # a retried command would need to read its input again
+        if args.stdin == '-' and args.retries:
+            print("apssh: --stdin - cannot be used with --retries")
+            sys.exit(1)
+
+        from .keys import load_private_keys
+        from .adaptive import AdaptiveWindow
 
         # load keys
         private_keys = load_private_keys(args.keys, args.verbose or args.debug)
@@ -223,8 +340,15 @@ class Apssh(CliWithFormatterOptions):
 
         targets.init_from_args(args, private_keys, self._get_formatter(args))
 
+        window = args.window
+        connect_window = None
+        if window == 'auto':
+            # jobs are not limited, connection attempts are
+            window = 0
+            connect_window = AdaptiveWindow()
+
         try:
-            self.proxies = targets.create_proxies()
+            self.proxies = targets.create_proxies(connect_window=connect_window)
             if args.debug:
                 for proxy in self.proxies:
                     print(f"using target {proxy}")
@@ -238,14 +362,37 @@ class Apssh(CliWithFormatterOptions):
                 print(proxy)
             sys.exit(0)
 
-        if args.verbose:
-            print_stderr(f"apssh is working on {len(self.proxies)} nodes")
+        from asynciojobs import Scheduler, Job
+        from .formatters import SubdirFormatter
+        from .sshjob import SshJob, FanoutJob, QuorumJob, ProgressJob
+        from .commands import (Run, RunScript, RunString,
+                               PurgeRemoteWorkdir)
+        from .topology import prewarm
+        from .stdin import StdinBroadcast
+        from .records import summary_json, summary_table
+        from .reachability import (Reachability, reachability_key,
+                                   co_reprobe, MAX_AGE)
+
+        # the hosts that could not be reached lately
+        reachability = None
+        skipped = {}
+        if args.skip_recently_failed is not None:
+            reachability = Reachability().load()
+            for proxy in self.proxies:
+                age = reachability.failed_since(
+                    reachability_key(proxy), args.skip_recently_failed)
+                if age is not None:
+                    skipped[proxy] = age
+        active = [proxy for proxy in self.proxies if proxy not in skipped]
 
-        window = args.window
+        if args.verbose:
+            print_stderr(f"apssh is working on {len(active)} nodes"
+                         f" ({len(skipped)} skipped)")
 
-        # populate scheduler
-        scheduler = Scheduler(verbose=args.verbose)
-        if not args.script:
+        # populate scheduler - not critical, so that a --deadline
+        # or a --quorum cuts it short without raising
+        scheduler = Scheduler(critical=False, verbose=args.verbose)
+        if not args.script or not args.commands:
             command_class = Run
             extra_kwds_args = {}
         else:
@@ -259,22 +406,95 @@ class Apssh(CliWithFormatterOptions):
                     print(f"Warning: file not found '{script}'\n"
                           f"=> Using RunString instead")
                 command_class = RunString
-
-        # keep them ordered
-        jobs = [
-            SshJob(node=proxy,
-                    critical=False,
-                    command=command_class(*args.commands, **extra_kwds_args))
-            for proxy in self.proxies
-        ]
-        for job in jobs:
-            scheduler.add(job)
-
-        # pylint: disable=w0106
-        scheduler.jobs_window = window
+        if args.command_timeout:
+            extra_kwds_args['timeout'] = args.command_timeout
+        if args.stdin == '-':
+            # can be read only once; each chunk is forgotten
+            # once all the nodes have read it
+            extra_kwds_args['stdin'] = StdinBroadcast('-', consumers=len(active))
+        elif args.stdin:
+            # each node streams its own copy, rather than having
+            # the whole file in memory
+            extra_kwds_args['stdin'] = Path(args.stdin)
+
+        def job_commands():
+            commands = []
+            if args.commands:
+                commands.append(
+                    command_class(*args.commands, **extra_kwds_args))
+            if args.gc_remote is not None:
+                commands.append(PurgeRemoteWorkdir(args.gc_remote,
+                                                   verbose=args.verbose))
+            return commands
+
+        if len(active) >= default_fanout_threshold:
+            # a single compact job, that has its own window
+            fanout = FanoutJob(active, commands=job_commands(),
+                               window=window, critical=False,
+                               records=bool(args.summary),
+                               retries=args.retries)
+            scheduler.add(fanout)
+        else:
+            fanout = None
+            # keep them ordered
+            jobs = [
+                SshJob(node=proxy,
+                        critical=False,
+                        retries=args.retries,
+                        commands=job_commands())
+                for proxy in active
+            ]
+            for job in jobs:
+                scheduler.add(job)
+            # pylint: disable=w0106
+            scheduler.jobs_window = window
+
+        quorum = None
+        if args.quorum:
+            quorum = QuorumJob([fanout] if fanout else jobs, args.quorum,
+                               scheduler=scheduler)
+        if args.deadline:
+            scheduler.timeout = args.deadline
+        if args.prewarm:
+            prewarm(scheduler, window)
+        if args.progress:
+            # after prewarm, so that it is displayed right away
+            ProgressJob([fanout] if fanout else jobs, scheduler=scheduler)
+        if skipped:
+            # not worth waiting for: it gets cancelled once the actual jobs
+            # are done, and the outcomes of the probes that have completed
+            # by then are saved below
+            Job(co_reprobe(list(skipped), reachability,
+                           min(args.timeout, REPROBE_TIMEOUT)),
+                forever=True, critical=False, label="re-probe skipped hosts",
+                scheduler=scheduler)
         if not scheduler.run():
-            scheduler.debrief()
-        retcods = [job.result() for job in jobs]
+            if not scheduler.failed_time_out() \
+                    and not (quorum and quorum.reached):
+                scheduler.debrief()
+        if connect_window:
+            report_window(connect_window, args)
+        # the hosts that were cut short are ABANDONED
+        if fanout:
+            retcods = [result if status == FanoutJob.DONE else ABANDONED
+                       for status, result in zip(fanout.status, fanout.results)]
+        else:
+            retcods = [(job.result() if not job.raised_exception() else None)
+                       if job.is_done() else ABANDONED
+                       for job in jobs]
+        active_retcods = retcods
+        if skipped:
+            results = iter(retcods)
+            retcods = [SKIPPED if proxy in skipped else next(results)
+                       for proxy in self.proxies]
+
+        # a host that returned anything at all was reachable
+        if reachability is not None:
+            for proxy, result in zip(active, active_retcods):
+                if result != ABANDONED:
+                    reachability.record(reachability_key(proxy),
+                                        result is not None)
+            reachability.save(max(MAX_AGE, args.skip_recently_failed))
 
         ##########
         # print on stdout the name of the output directory
@@ -286,33 +506,56 @@ class Apssh(CliWithFormatterOptions):
             print(subdir)
 
         # marks
-        names = {0: '0ok', None: '1failed'}
+        names = {0: '0ok', None: '1failed', ABANDONED: '2abandoned',
+                 SKIPPED: '3skipped'}
+        def mark_name(result):
+            return names[result] if result in (0, ABANDONED, SKIPPED) \
+                else names[None]
         if subdir and args.mark:
             # do we need to create the subdirs
-            if any(retcod==0 for retcod in retcods):
-                (Path(subdir) / names[0]).mkdir(exist_ok=True)
-            if any(retcod!=0 for retcod in retcods):
-                (Path(subdir) / names[None]).mkdir(exist_ok=True)
+            for name in {mark_name(retcod) for retcod in retcods}:
+                (Path(subdir) / name).mkdir(exist_ok=True)
 
             for proxy, result in zip(self.proxies, retcods):
-                prefix = names[0] if result == 0 else names[None]
+                prefix = mark_name(result)
                 mark_path = Path(subdir) / prefix / proxy.hostname
                 with mark_path.open("w") as mark:
                     mark.write(f"{result}\n")
 
         # details on the individual retcods - a bit hacky
-        for proxy, result, job in zip(self.proxies, retcods, jobs):
+        for proxy, result in zip(self.proxies, retcods):
             if result is None:
                 print_stderr(f"{proxy.hostname}: apssh WARNING - no result !")
+            elif result == COMMAND_TIMEOUT:
+                print_stderr(f"{proxy.hostname}: apssh WARNING - command timed out"
+                             f" after {args.command_timeout}s")
+            elif result == ABANDONED:
+                reason = "quorum reached" if quorum and quorum.reached \
+                    else f"deadline of {args.deadline}s"
+                print_stderr(f"{proxy.hostname}: apssh WARNING - abandoned ({reason})")
+            elif result == SKIPPED:
+                print_stderr(f"{proxy.hostname}: apssh WARNING - skipped"
+                             f" (unreachable {skipped[proxy]:.0f}s ago)")
             elif args.debug:
-                print(f"DEBUG: PROXY {proxy.hostname} -> {result} ({job.node})")
+                print(f"DEBUG: PROXY {proxy.hostname} -> {result} ({proxy})")
+
 
+        if args.summary:
+            records = fanout.records if fanout \
+                else [job.record if job.is_done() else None for job in jobs]
+            summary = summary_json if args.summary == 'json' else summary_table
+            print(summary(
+                (proxy.hostname, record)
+                for proxy, record in zip(active, records)))
 
         # when in gateway mode, the gateway proxy # pylint: disable=fixme
         # never gets disconnected, which probably is just fine
 
         # return 0 only if all hosts have returned 0
+        # - or at least the quorum if one was specified
         # otherwise, return 1
+        if quorum:
+            return 0 if retcods.count(0) >= args.quorum else 1
         return 0 if all(retcod == 0 for retcod in retcods) else 1
 
 
@@ -334,6 +577,7 @@ class Copy(CliWithFormatterOptions):
 
     @staticmethod
     def instantiate(template, proxy):
+        from .formatters import shorten_hostname
         fqdn = proxy.hostname
         host = shorten_hostname(proxy.hostname)
         user = proxy.username
@@ -358,11 +602,18 @@ class Copy(CliWithFormatterOptions):
         targets.add_target_options(parser)
         # global settings
         parser.add_argument(
-            "-w", "--window", type=int, default=0,
+            "-w", "--window", type=window_type, default=0,
             help="""
             specify how many connections can run simultaneously;
-            default is no limit
+            default is no limit; with 'auto', the number of connections
+            being established at the same time is adjusted on the fly:
+            it grows as long as connections succeed quickly, and shrinks
+            on timeouts, refusals and resets
             """)
+        parser.add_argument(
+            "--window-log", default=None, metavar="FILE",
+            help="""with -w auto, write the successive window sizes
+            in FILE, as lines of the form 'seconds window reason'""")
         # ssh settings
         parser.add_argument(
             "-c", "--connect-timeout", dest='timeout',
@@ -379,6 +630,36 @@ class Copy(CliWithFormatterOptions):
             """)
         # how to store results - choice of formatter
         self.add_formatter_options(parser)
+        # transfer tuning
+        parser.add_argument(
+            "--block-size", type=int, default=None,
+            help="""
+            the size in bytes of each SFTP read or write request;
+            default is to use asyncssh's default
+            """)
+        parser.add_argument(
+            "--max-requests", type=int, default=None,
+            help="""
+            how many SFTP requests can be outstanding at the same time
+            for a given file; default is to use asyncssh's default
+            """)
+        parser.add_argument(
+            "--parallel", type=int, default=None,
+            help="""
+            how many files can be transferred simultaneously
+            on each connection; default is one at a time
+            """)
+        parser.add_argument(
+            "--transport", choices=('sftp', 'tar'), default='sftp',
+            help="""
+            with 'tar', files and directories are streamed in tar format
+            over a single ssh channel, which is much faster than SFTP
+            for trees with many small files; tar must then be available
+            on both ends, and the destination is always a directory
+            """)
+        parser.add_argument(
+            "-z", "--compress", default=False, action='store_true',
+            help="with --transport tar, gzip the stream")
 
         # usual stuff
         parser.add_argument(
@@ -416,24 +697,38 @@ class Copy(CliWithFormatterOptions):
                      " should be an existing directory")
 
         def command(proxy):
+            tuning = dict(block_size=args.block_size,
+                          max_requests=args.max_requests,
+                          parallel=args.parallel,
+                          transport=args.transport,
+                          compress=args.compress)
             if self.mode == 'push':
                 remote = self.remote_path(args.remote_location[0])
                 return Push([ self.instantiate(local, proxy) for local in args.local_files ],
                             self.instantiate(remote, proxy),
-                            verbose=args.verbose or args.debug)
+                            verbose=args.verbose or args.debug,
+                            **tuning)
             else:
                 remotes = [self.remote_path(remote) for remote in args.remote_files]
                 return Pull([self.instantiate(remote, proxy) for remote in remotes],
                             self.instantiate(args.local_destination[0], proxy),
-                            verbose=args.verbose or args.debug)
+                            verbose=args.verbose or args.debug,
+                            **tuning)
 
         # should allow to run with --version and no more arg
         args = parser.parse_args()
 
         if args.version:
+            from .version import __version__ as apssh_version
             print(f"ap{self.mode} version {apssh_version}")
             sys.exit(0)
 
+        from asynciojobs import Scheduler
+        from .keys import load_private_keys
+        from .sshjob import SshJob
+        from .commands import Push, Pull
+        from .adaptive import AdaptiveWindow
+
         # check remote files
         if self.mode == 'push':
             remotes = args.remote_location
@@ -452,8 +747,13 @@ class Copy(CliWithFormatterOptions):
             sys.exit(1)
 
         targets.init_from_args(args, private_keys, self._get_formatter(args))
+        window = args.window
+        connect_window = None
+        if window == 'auto':
+            window = 0
+            connect_window = AdaptiveWindow()
         try:
-            self.proxies = targets.create_proxies()
+            self.proxies = targets.create_proxies(connect_window=connect_window)
             if args.debug:
                 for proxy in self.proxies:
                     print(f"using target {proxy}")
@@ -468,9 +768,11 @@ class Copy(CliWithFormatterOptions):
             scheduler.add(SshJob(node=proxy, critical=False, command=command(proxy)))
 
         # pylint: disable=w0106
-        scheduler.jobs_window = args.window
+        scheduler.jobs_window = window
         if not scheduler.run():
             scheduler.debrief()
+        if connect_window:
+            report_window(connect_window, args)
         retcods = [job.result() for job in scheduler.jobs]
 
         # return 0 only if all hosts have returned 0
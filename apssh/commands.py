@@ -3,16 +3,39 @@ The ``commands`` module implements all the command classes, typically
 :class:`Run`, :class:`RunScript`, :class:`Pull`, and similar classes.
 """
 
-from pathlib import Path
+from pathlib import Path, PurePath
+import asyncio
 import random
 import re
 import copy
+import shlex
+import shutil
 
-from asyncssh import EXTENDED_DATA_STDERR
+from asyncssh import EXTENDED_DATA_STDERR, SFTPError
 
 from .formatters import CaptureFormatter
 from .deferred import Capture
 from .config import default_remote_workdir
+from .stdin import check_stdin, stdin_consumer
+
+# the words that the shell deals with by itself, so that a command that
+# starts with one of these cannot be exec'ed, even if some program
+# with that name can be found on the PATH, like /usr/bin/time or /bin/kill
+_SHELL_WORDS = frozenset((
+    # keywords
+    '!', '{', '}', '[[', ']]', 'case', 'coproc', 'do', 'done', 'elif',
+    'else', 'esac', 'fi', 'for', 'function', 'if', 'in', 'select',
+    'then', 'time', 'until', 'while',
+    # builtins
+    '.', ':', '[', 'alias', 'bg', 'bind', 'break', 'builtin', 'caller',
+    'cd', 'command', 'compgen', 'complete', 'continue', 'declare', 'dirs',
+    'disown', 'echo', 'enable', 'eval', 'exec', 'exit', 'export', 'false',
+    'fc', 'fg', 'getopts', 'hash', 'help', 'history', 'jobs', 'kill', 'let',
+    'local', 'logout', 'mapfile', 'popd', 'printf', 'pushd', 'pwd', 'read',
+    'readarray', 'readonly', 'return', 'set', 'shift', 'shopt', 'source',
+    'suspend', 'test', 'times', 'trap', 'true', 'type', 'typeset',
+    'ulimit', 'umask', 'unalias', 'unset', 'wait',
+))
 
 ####################
 # The base class for items that make a SshJob's commands
@@ -116,26 +139,29 @@ class CapturableMixin:
     """
     this class implements the simple logic for capturing a command output
 
-    NOTE. it relies on the presence of the `self.node` attribute that points
-    back at the SshNode where this command is going to run;
-    which is set by the SshJob class
+    the capture is attached to the command's session only, through a
+    dedicated formatter, so that several captured commands can
+    run at the same time on the same node
     """
     def __init__(self, capture: Capture):
         self.capture = capture
 
-    def start_capture(self):       # pylint: disable=missing-function-docstring
-        if self.capture:
-            # store the node's formatter and set aside for later
-            self.previous_formatter = self.node.formatter
-            self.node.formatter = CaptureFormatter()
+    def start_capture(self):
+        """
+        Returns:
+          a fresh CaptureFormatter if capture is requested, None otherwise;
+          it is meant to be passed as the ``formatter`` argument
+          to the node's ``run()`` method
+        """
+        return CaptureFormatter() if self.capture else None
 
-    def end_capture(self):         # pylint: disable=missing-function-docstring
+    def end_capture(self, formatter):
+        """
+        store what formatter has captured in the capture variable
+        """
         if self.capture:
             # get result from transient formatter
-            captured = self.node.formatter.get_capture()
-            # restore the node's formatter
-            self.node.formatter = self.previous_formatter
-            self.previous_formatter = None
+            captured = formatter.get_capture()
             # sanitize
             if captured and captured[-1] == "\n":
                 captured = captured[:-1]
@@ -180,6 +206,19 @@ class Run(AbstractCommand, CapturableMixin, StrLikeMixin):
         in that case, the stdout and stderr of the forked process are bound to /dev/null,
         and no attempt is made to read them; this has turned out a useful trick when
         spawning port-forwarding ssh sessions
+      stdin: if set, the contents to stream into the command's standard input;
+        can be ``bytes``, a local ``Path``, an async iterable of bytes, or
+        a :class:`~apssh.stdin.StdinBroadcast` instance when the same
+        contents go to many nodes.
+      timeout: if set, the maximal duration in seconds of the command;
+        a command that is still running after that gets terminated, and
+        its result is the ``"TIMEOUT"`` string (which, like any other result,
+        can be listed in ``allowed_exits``).
+
+    On a :class:`~apssh.nodes.LocalNode`, when all the parts of ``argv``
+    are plain words - i.e. with no space, quote, or other character that
+    the shell would interpret - and the program can be found in the PATH,
+    it is executed directly, saving the cost of forking a shell.
 
     Examples:
 
@@ -191,6 +230,14 @@ class Run(AbstractCommand, CapturableMixin, StrLikeMixin):
 
           Run("tail", "-n", 1, "/etc/lsb-release")
           Run("tail -n", 1, "/etc/lsb-release")
+
+      Feed a local file into a remote process, with no intermediate copy::
+
+          Run("psql mydb", stdin=Path("dump.sql"))
+
+      Give up on a command that hangs for more than one minute::
+
+          Run("apt-get update", timeout=60)
     """
 
     # it was tempting to use x11_forwarding as the name here, but
@@ -201,6 +248,7 @@ class Run(AbstractCommand, CapturableMixin, StrLikeMixin):
     def __init__(self, *argv,
                  # proper
                  verbose=False, x11=False, ignore_outputs=False,
+                 stdin=None, timeout=None,
                  # AbstractCommand
                  label=None, allowed_exits=None,
                  # CapturableMixin
@@ -209,6 +257,10 @@ class Run(AbstractCommand, CapturableMixin, StrLikeMixin):
         self.verbose = verbose
         self.x11 = x11
         self.ignore_outputs = ignore_outputs
+        if stdin is not None:
+            check_stdin(stdin)
+        self.stdin = stdin
+        self.timeout = timeout
         AbstractCommand.__init__(self, label=label,
                                  allowed_exits=allowed_exits)
         CapturableMixin.__init__(self, capture)
@@ -223,34 +275,61 @@ class Run(AbstractCommand, CapturableMixin, StrLikeMixin):
     def _remote_command(self):
         return " ".join(str(x) for x in self.argv)
 
+    def _local_command(self):
+        """
+        the argv as a list if it can be exec'ed with no change in
+        semantics, the command string for /bin/sh otherwise
+        """
+        tokens = [str(x) for x in self.argv]
+        if (tokens
+                # no shell metacharacters, quotes or blanks
+                and all(token and shlex.quote(token) == token
+                        for token in tokens)
+                # not an environment setting
+                and '=' not in tokens[0]
+                # not a shell keyword or builtin like time or cd
+                and tokens[0] not in _SHELL_WORDS
+                and shutil.which(tokens[0])):
+            return tokens
+        return self._remote_command()
+
     async def co_run_remote(self, node):
         """
         The semantics of running on a remote node.
         """
-        self.start_capture()
+        capture_formatter = self.start_capture()
         command = self._remote_command()
         self._verbose_message(node, f"Run: -> {command}")
-        # need an ssh connection
-        connected = await node.connect_lazy()
-        if not connected:
-            return
-        node_run = await node.run(command, x11_forwarding=self.x11)
+        # the other nodes must not wait for this one if it fails early
+        with stdin_consumer(self.stdin) as stdin:
+            # need an ssh connection
+            connected = await node.connect_lazy()
+            if not connected:
+                return
+            node_run = await node.run(command, stdin=stdin,
+                                      timeout=self.timeout,
+                                      formatter=capture_formatter,
+                                      x11_forwarding=self.x11)
         self._verbose_message(
             node, f"Run: {node_run} <- {command}")
-        self.end_capture()
+        self.end_capture(capture_formatter)
         return node_run
 
     async def co_run_local(self, localnode):
         """
         The semantics of running on a local node.
         """
-        self.start_capture()
+        capture_formatter = self.start_capture()
         command = self._remote_command()
         self._verbose_message(localnode, f"Run: -> {command}")
-        retcod = await localnode.run(command, ignore_outputs=self.ignore_outputs)
+        with stdin_consumer(self.stdin) as stdin:
+            retcod = await localnode.run(self._local_command(),
+                                         ignore_outputs=self.ignore_outputs,
+                                         stdin=stdin, timeout=self.timeout,
+                                         formatter=capture_formatter)
         self._verbose_message(
             localnode, f"Run: {retcod} <- {command}")
-        self.end_capture()
+        self.end_capture(capture_formatter)
         return retcod
 
 # the base class for running a script provided locally
@@ -273,6 +352,17 @@ class RunLocalStuff(AbstractCommand, CapturableMixin, StrLikeMixin):
         the remote script to be invoked through ``bash -x``, which admittedly
         is totally hacky. xxx we need to remove this.
       remote_basename: an optional name for the remote copy of the script.
+      stdin: if set, the contents to stream into the script's standard input,
+        see :class:`Run`.
+      timeout: if set, the maximal duration in seconds of the script,
+        see :class:`Run`.
+      cleanup: if set, the copy of the script gets removed
+        right after a successful run; default is to leave it behind,
+        see also :class:`PurgeRemoteWorkdir`; the ``includes`` are always
+        left behind: unlike the script, they are copied under their own
+        name, so they may be in use by another command running at the
+        same time on the same node; :class:`PurgeRemoteWorkdir`
+        takes care of them as well.
 
     Local commands are copied in a remote directory
     - typically in ``~/.apssh-remote``.
@@ -290,7 +380,8 @@ class RunLocalStuff(AbstractCommand, CapturableMixin, StrLikeMixin):
                  label=None, allowed_exits=None,
                  includes=None, remote_basename=None,
                  x11=False, verbose=False,
-                 ignore_outputs=False,
+                 ignore_outputs=False, stdin=None, timeout=None,
+                 cleanup=False,
                  capture: Capture=None):
         self.args = args
         self.includes = includes if includes is not None else []
@@ -298,6 +389,11 @@ class RunLocalStuff(AbstractCommand, CapturableMixin, StrLikeMixin):
         self.x11 = x11
         self.verbose = verbose
         self.ignore_outputs = ignore_outputs
+        if stdin is not None:
+            check_stdin(stdin)
+        self.stdin = stdin
+        self.timeout = timeout
+        self.cleanup = cleanup
         AbstractCommand.__init__(self, label=label,
                                  allowed_exits=allowed_exits)
         CapturableMixin.__init__(self, capture)
@@ -340,6 +436,11 @@ class RunLocalStuff(AbstractCommand, CapturableMixin, StrLikeMixin):
         :meth:`co_install()` to push the local material
         over; it should raise an exception in case of failure.
         """
+        # the other nodes must not wait for this one if it fails early
+        with stdin_consumer(self.stdin) as stdin:
+            return await self._co_install_and_run(node, stdin)
+
+    async def _co_install_and_run(self, node, stdin):
         # we need the node to be connected by ssh and SFTP
         # and we need the remote work dir to be created
         if not (await node.sftp_connect_lazy()
@@ -371,15 +472,27 @@ class RunLocalStuff(AbstractCommand, CapturableMixin, StrLikeMixin):
                     return
 
         # trigger it
-        self.start_capture()
+        capture_formatter = self.start_capture()
         command = self._remote_command()
         self._verbose_message(node, f"RunLocalStuff: -> {command}")
-        node_run = await node.run(command, x11_forwarding=self.x11)
+        node_run = await node.run(command, stdin=stdin,
+                                  timeout=self.timeout,
+                                  formatter=capture_formatter,
+                                  x11_forwarding=self.x11)
         self._verbose_message(
             node, f"RunLocalStuff: {node_run} <- {command}")
-        self.end_capture()
+        self.end_capture(capture_formatter)
+        if self.cleanup and self._succeeded(node_run):
+            try:
+                await node.sftp_client.remove(remote_path)
+            except SFTPError as exc:
+                self._verbose_message(
+                    node, f"RunLocalStuff: could not remove {remote_path} - {exc}")
         return node_run
 
+    def _succeeded(self, retcod):
+        return retcod == 0 or retcod in self.allowed_exits
+
     # virtual method that needs to be implemented on each subclass
     def _actual_contents(self) -> str:
         print(f"_actual_contents needs to be redefined on {type(self)}")
@@ -398,13 +511,19 @@ class RunLocalStuff(AbstractCommand, CapturableMixin, StrLikeMixin):
         local_copy.chmod(0o700)
 
 
-        self.start_capture()
+        capture_formatter = self.start_capture()
         command = f"{Path.home()}/{self._remote_command()}"
         self._verbose_message(localnode, f"Run: -> {command}")
-        retcod = await localnode.run(command, ignore_outputs=self.ignore_outputs)
+        with stdin_consumer(self.stdin) as stdin:
+            retcod = await localnode.run(command,
+                                         ignore_outputs=self.ignore_outputs,
+                                         stdin=stdin, timeout=self.timeout,
+                                         formatter=capture_formatter)
         print(f"{retcod=}")
         self._verbose_message(localnode, f"Run: {retcod} <- {command}")
-        self.end_capture()
+        self.end_capture(capture_formatter)
+        if self.cleanup and self._succeeded(retcod):
+            local_copy.unlink(missing_ok=True)
         return retcod
 
 
@@ -423,6 +542,12 @@ class RunScript(RunLocalStuff):
         location as the remote script, i.e. typically in ``~/.apssh-remote``
       x11 (bool): allows to enable X11 x11_forwarding
       verbose: more output
+      stdin: the contents to stream into the script's standard input,
+        see :class:`Run`
+      timeout: the maximal duration in seconds of the script,
+        see :class:`Run`
+      cleanup: whether to remove the remote copy of the script
+        after a successful run, see :class:`RunLocalStuff`
 
     Examples:
 
@@ -441,6 +566,7 @@ class RunScript(RunLocalStuff):
                  includes=None, x11=False,
                  # if this is set, run bash -x
                  verbose=False,
+                 stdin=None, timeout=None, cleanup=False,
                  capture: Capture=None):
         self.local_script = local_script
         self.local_basename = Path(local_script).name
@@ -451,7 +577,9 @@ class RunScript(RunLocalStuff):
                          allowed_exits=allowed_exits,
                          includes=includes,
                          remote_basename=remote_basename,
-                         x11=x11, verbose=verbose, capture=capture)
+                         x11=x11, verbose=verbose, stdin=stdin,
+                         timeout=timeout, cleanup=cleanup,
+                         capture=capture)
 
     def label_line(self):
         return "RunScript: " + self.local_basename + " " + self._args_line()
@@ -488,6 +616,12 @@ class RunString(RunLocalStuff):
         should be named on the remote node; it is randomly generated
         if not specified by caller.
       verbose: more output
+      stdin: the contents to stream into the script's standard input,
+        see :class:`Run`
+      timeout: the maximal duration in seconds of the script,
+        see :class:`Run`
+      cleanup: whether to remove the remote copy of the script
+        after a successful run, see :class:`RunLocalStuff`
 
     Examples:
 
@@ -507,6 +641,7 @@ class RunString(RunLocalStuff):
                  remote_name=None,
                  # if this is set, run bash -x
                  verbose=False,
+                 stdin=None, timeout=None, cleanup=False,
                  capture: Capture=None):
         self.script_body = script_body
         if remote_name:
@@ -522,7 +657,8 @@ class RunString(RunLocalStuff):
                          allowed_exits=allowed_exits,
                          includes=includes,
                          remote_basename=remote_basename,
-                         x11=x11, verbose=verbose,
+                         x11=x11, verbose=verbose, stdin=stdin,
+                         timeout=timeout, cleanup=cleanup,
                          capture=capture)
 
 
@@ -565,7 +701,60 @@ class RunString(RunLocalStuff):
 ####
 
 
-class Pull(AbstractCommand):
+def _home_paths(paths):
+    """
+    on a LocalNode, the 'remote' paths are relative to the home directory,
+    like with SFTP to localhost
+    """
+    if isinstance(paths, (str, PurePath)):
+        return Path.home() / paths
+    return [Path.home() / path for path in paths]
+
+
+class TransferTuningMixin:
+    """
+    this class gathers the tuning knobs that are common to Push and Pull
+
+    transport is either 'sftp' (the default) or 'tar'; the SFTP settings
+    that are left to None are not passed along at all, so that
+    asyncssh's own defaults apply
+    """
+    TRANSPORTS = ('sftp', 'tar')
+
+    def __init__(self, block_size=None, max_requests=None, parallel=None,
+                 transport='sftp', compress=False):
+        if transport not in self.TRANSPORTS:
+            raise ValueError(f"transport should be one of {self.TRANSPORTS},"
+                             f" got {transport}")
+        self.block_size = block_size
+        self.max_requests = max_requests
+        self.parallel = parallel
+        self.transport = transport
+        self.compress = compress
+
+    def _transfer_kwds(self):     # pylint: disable=missing-function-docstring
+        kwds = dict(self.kwds)
+        if self.block_size is not None:
+            kwds['block_size'] = self.block_size
+        if self.max_requests is not None:
+            kwds['max_requests'] = self.max_requests
+        if self.parallel is not None:
+            kwds['parallel'] = self.parallel
+        return kwds
+
+    def _prepare_local_transfer(self, destination):
+        """
+        the settings for LocalNode.copy_file_s(); with the tar transport,
+        this boils down to copying recursively into a directory,
+        that is created if needed
+        """
+        if self.transport != 'tar':
+            return self._transfer_kwds()
+        Path(destination).mkdir(parents=True, exist_ok=True)
+        return dict(recurse=True, preserve=True)
+
+
+class Pull(AbstractCommand, TransferTuningMixin):
     """
     Retrieve remote files and stores them locally
 
@@ -574,8 +763,23 @@ class Pull(AbstractCommand):
       localpath: the local directory where to store resulting copies.
       label: if set, is used to describe the command in scheduler graphs.
       verbose (bool): be verbose.
+      block_size (int): the size of each SFTP read request.
+      max_requests (int): how many SFTP read requests can be outstanding
+        at the same time, for each file.
+      parallel (int): how many files can be transferred simultaneously
+        over the node's SFTP channel; default is one at a time.
+      transport (str): either ``'sftp'`` - the default - or ``'tar'``;
+        in the latter case, the files are streamed in tar format
+        through a single ssh channel, see
+        :meth:`~apssh.sshproxy.SshProxy.get_tar_stream()`;
+        this requires ``tar`` on both ends, and the local path
+        is then always a directory; the SFTP-related settings are ignored.
+      compress (bool): with the tar transport, whether to gzip the stream.
       kwds: passed as-is to the SFTPClient get method.
 
+    On a :class:`~apssh.nodes.LocalNode`, the files are copied locally,
+    see :meth:`~apssh.nodes.LocalNode.copy_file_s`.
+
     See also:
     http://asyncssh.readthedocs.io/en/latest/api.html#asyncssh.SFTPClient.get
 
@@ -585,6 +789,9 @@ class Pull(AbstractCommand):
                  *args,
                  label=None,
                  verbose=False,
+                 # TransferTuningMixin
+                 block_size=None, max_requests=None, parallel=None,
+                 transport='sftp', compress=False,
                  # asyncssh's SFTP client get options
                  **kwds):
         self.remotepaths = remotepaths
@@ -592,7 +799,9 @@ class Pull(AbstractCommand):
         self.verbose = verbose
         self.args = args
         self.kwds = kwds
-        super().__init__(label=label)
+        AbstractCommand.__init__(self, label=label)
+        TransferTuningMixin.__init__(self, block_size, max_requests, parallel,
+                                     transport, compress)
 
     def _remote_path(self):
         paths = self.remotepaths
@@ -610,15 +819,33 @@ class Pull(AbstractCommand):
         self._verbose_message(
             node,
             f"Pull: remotepaths={self.remotepaths}, localpath={self.localpath}")
+        if self.transport == 'tar':
+            retcod = await node.get_tar_stream(
+                self.remotepaths, self.localpath, compress=self.compress)
+            self._verbose_message(node, f"Pull done ({retcod})")
+            return retcod
         await node.sftp_connect_lazy()
         await node.get_file_s(self.remotepaths, self.localpath,
-                              *self.args, **self.kwds)
+                              *self.args, **self._transfer_kwds())
         self._verbose_message(node, "Pull done")
         return 0
 
+    async def co_run_local(self, localnode):
+        """
+        A local copy, the remote paths being relative to the home directory
+        """
+        self._verbose_message(
+            localnode,
+            f"Pull: remotepaths={self.remotepaths}, localpath={self.localpath}")
+        await localnode.copy_file_s(
+            _home_paths(self.remotepaths), self.localpath,
+            **self._prepare_local_transfer(self.localpath))
+        self._verbose_message(localnode, "Pull done")
+        return 0
+
 
 ####
-class Push(AbstractCommand):
+class Push(AbstractCommand, TransferTuningMixin):
     """
     Put local files onto target node
 
@@ -628,8 +855,23 @@ class Push(AbstractCommand):
       remotepath: the directory where to store copied on the remote end.
       label: if set, is used to describe the command in scheduler graphs.
       verbose (bool): be verbose.
+      block_size (int): the size of each SFTP write request.
+      max_requests (int): how many SFTP write requests can be outstanding
+        at the same time, for each file.
+      parallel (int): how many files can be transferred simultaneously
+        over the node's SFTP channel; default is one at a time.
+      transport (str): either ``'sftp'`` - the default - or ``'tar'``;
+        in the latter case, the files are streamed in tar format
+        through a single ssh channel, see
+        :meth:`~apssh.sshproxy.SshProxy.put_tar_stream()`;
+        this requires ``tar`` on both ends, and the remote path
+        is then always a directory; the SFTP-related settings are ignored.
+      compress (bool): with the tar transport, whether to gzip the stream.
       kwds: passed as-is to the SFTPClient put method.
 
+    On a :class:`~apssh.nodes.LocalNode`, the files are copied locally,
+    see :meth:`~apssh.nodes.LocalNode.copy_file_s`.
+
     See also:
     http://asyncssh.readthedocs.io/en/latest/api.html#asyncssh.SFTPClient.put
 
@@ -639,13 +881,18 @@ class Push(AbstractCommand):
                  *args,
                  label=None,
                  verbose=False,
+                 # TransferTuningMixin
+                 block_size=None, max_requests=None, parallel=None,
+                 transport='sftp', compress=False,
                  **kwds):
         self.localpaths = localpaths
         self.remotepath = remotepath
         self.verbose = verbose
         self.args = args
         self.kwds = kwds
-        super().__init__(label=label)
+        AbstractCommand.__init__(self, label=label)
+        TransferTuningMixin.__init__(self, block_size, max_requests, parallel,
+                                     transport, compress)
 
     def _local_path(self):
         paths = self.localpaths
@@ -663,8 +910,193 @@ class Push(AbstractCommand):
         self._verbose_message(
             node,
             f"Push: localpaths={self.localpaths}, remotepath={self.remotepath}")
+        if self.transport == 'tar':
+            retcod = await node.put_tar_stream(
+                self.localpaths, self.remotepath, compress=self.compress)
+            self._verbose_message(node, f"Push done ({retcod})")
+            return retcod
         await node.sftp_connect_lazy()
         await node.put_file_s(self.localpaths, self.remotepath,
-                              *self.args, **self.kwds)
+                              *self.args, **self._transfer_kwds())
         self._verbose_message(node, "Push done")
         return 0
+
+    async def co_run_local(self, localnode):
+        """
+        A local copy, the remote path being relative to the home directory
+        """
+        self._verbose_message(
+            localnode,
+            f"Push: localpaths={self.localpaths}, remotepath={self.remotepath}")
+        remotepath = _home_paths(self.remotepath)
+        await localnode.copy_file_s(
+            self.localpaths, remotepath,
+            **self._prepare_local_transfer(remotepath))
+        self._verbose_message(localnode, "Push done")
+        return 0
+
+
+class PurgeRemoteWorkdir(AbstractCommand):
+    """
+    Remove the files left behind by apssh in the remote work directory
+    - typically ``~/.apssh-remote`` - that are older than some age.
+
+    Each run of a :class:`RunScript` or :class:`RunString` command
+    leaves a randomly named copy of the script in there - unless
+    ``cleanup`` is set - as well as its ``includes`` if any,
+    so on long-lived nodes it is a good idea
+    to run this every now and then. All the files get removed
+    in a single remote ``find`` invocation.
+
+    Parameters:
+      max_age: in seconds, the files that were modified more recently
+        than that are preserved - with a granularity of one minute;
+        default is one day.
+      label: if set, is used to describe the command in scheduler graphs.
+      verbose (bool): if set, the removed files get listed.
+
+    Examples:
+
+      Remove the scripts that are more than a week old::
+
+        SshJob(node, command=PurgeRemoteWorkdir(max_age=7*24*3600))
+    """
+
+    def __init__(self, max_age=24*3600, *,
+                 label=None, verbose=False):
+        if max_age < 0:
+            raise ValueError(f"max_age must be non-negative, got {max_age}")
+        self.max_age = max_age
+        self.verbose = verbose
+        AbstractCommand.__init__(self, label=label)
+
+    def label_line(self):
+        return f"PurgeRemoteWorkdir: older than {self.max_age}s"
+
+    def _purge_command(self):
+        minutes = int(self.max_age // 60)
+        listing = "-print " if self.verbose else ""
+        return (f"test -d {default_remote_workdir} || exit 0; "
+                f"find {default_remote_workdir} -maxdepth 1 -type f"
+                f" -mmin +{minutes} {listing}-delete")
+
+    async def co_run_remote(self, node):
+        command = self._purge_command()
+        self._verbose_message(node, f"PurgeRemoteWorkdir: -> {command}")
+        if not await node.connect_lazy():
+            return
+        node_run = await node.run(command)
+        self._verbose_message(
+            node, f"PurgeRemoteWorkdir: {node_run} <- {command}")
+        return node_run
+
+    async def co_run_local(self, localnode):
+        command = self._purge_command()
+        self._verbose_message(localnode, f"PurgeRemoteWorkdir: -> {command}")
+        retcod = await localnode.run(command, cwd=Path.home())
+        self._verbose_message(
+            localnode, f"PurgeRemoteWorkdir: {retcod} <- {command}")
+        return retcod
+
+
+class Parallel(AbstractCommand):
+    """
+    A container for commands that run concurrently, for use inside
+    the ``commands`` of a :class:`~apssh.sshjob.SshJob`, where
+    commands otherwise run one after the other.
+
+    The children share the node's single ssh connection; each one
+    opens its own session, so at most ``max_sessions`` of them
+    run at the same time.
+
+    All the children are run to completion, no matter what;
+    the result is 0 if they all succeeded - according to their
+    respective ``allowed_exits`` - otherwise the result of the first
+    failing child, in the order they were given;
+    that result is then dealt with by the ``SshJob`` under its
+    usual critical/non-critical rules.
+    Likewise, if a child raises an exception, it is raised again
+    once all the children have completed.
+
+    Parameters:
+      commands: the commands to run concurrently; they can be any
+        command instances, including another ``Parallel``.
+      max_sessions: how many children can run simultaneously;
+        the default matches the ``MaxSessions`` default of OpenSSH's sshd,
+        use ``None`` for no limit.
+      label: if set, is used to describe the command in scheduler graphs.
+
+    Examples:
+      Probe a node in several ways at the same time, before
+      running a final command::
+
+        SshJob(node, commands=[
+            Parallel(Run("uname -a"), Run("lscpu"), Run("free -m")),
+            Run("echo all probes done"),
+        ])
+    """
+
+    def __init__(self, *commands, max_sessions=10, label=None):
+        if not commands:
+            raise ValueError("Parallel needs at least one command")
+        if max_sessions is not None and max_sessions < 1:
+            raise ValueError(
+                f"max_sessions must be positive, got {max_sessions}")
+        self.commands = commands
+        self.max_sessions = max_sessions
+        self._node = None
+        AbstractCommand.__init__(self, label=label)
+
+    # SshJob sets these attributes on its commands, children need them too
+    @property
+    def node(self):                                     # pylint: disable=c0116
+        return self._node
+
+    @node.setter
+    def node(self, node):
+        self._node = node                               # pylint: disable=w0201
+        for command in self.commands:
+            command.node = node
+
+    @property
+    def verbose(self):                                  # pylint: disable=c0116
+        return all(getattr(command, 'verbose', False)
+                   for command in self.commands)
+
+    @verbose.setter
+    def verbose(self, verbose):
+        for command in self.commands:
+            command.verbose = verbose
+
+    def label_line(self):
+        return "Parallel: " + " || ".join(
+            command.get_label_line() for command in self.commands)
+
+    async def _co_run_all(self, run_one):
+        semaphore = asyncio.Semaphore(self.max_sessions) \
+            if self.max_sessions else None
+
+        async def run_child(command):
+            if semaphore is None:
+                return await run_one(command)
+            async with semaphore:
+                return await run_one(command)
+
+        results = await asyncio.gather(
+            *(run_child(command) for command in self.commands),
+            return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        for command, result in zip(self.commands, results):
+            if result != 0 and result not in command.allowed_exits:
+                return result
+        return 0
+
+    async def co_run_remote(self, node):
+        return await self._co_run_all(
+            lambda command: command.co_run_remote(node))
+
+    async def co_run_local(self, localnode):
+        return await self._co_run_all(
+            lambda command: command.co_run_local(localnode))
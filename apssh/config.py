@@ -8,11 +8,14 @@ default config for apssh
 import os
 import pwd
 import time
+from functools import cache
 from pathlib import Path
 
 default_time_name = time.strftime("%Y-%m-%d@%H:%M")
-default_username = pwd.getpwuid(os.getuid())[0]
 default_timeout = 30
+# from that many targets, apssh uses a single FanoutJob
+# instead of one SshJob per target
+default_fanout_threshold = 1000
 default_private_keys = (
     Path.home() / ".ssh/id_rsa",
     Path.home() / ".ssh/id_dsa",
@@ -21,3 +24,22 @@ default_private_keys = (
 local_config_dir = Path.home() / ".apssh"
 # dont use expanduser as this is relative to a remote system
 default_remote_workdir = ".apssh-remote"
+
+# the outcome of a command that did not complete within its timeout
+COMMAND_TIMEOUT = "TIMEOUT"
+
+
+@cache
+def get_default_username():
+    """
+    the local user name; this is looked up upon first use only,
+    as the name service behind it may be slow
+    """
+    return pwd.getpwuid(os.getuid())[0]
+
+
+def __getattr__(name):
+    # default_username used to be computed at import-time
+    if name == 'default_username':
+        return get_default_username()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -18,8 +18,6 @@ code
 
 """
 
-from jinja2 import Template, DebugUndefined
-
 class Variables(dict):
     """
     think of this class as a regular namespace, i.e. a set of associations variable →
@@ -96,6 +94,8 @@ class Deferred:
         which is mostly done before the scenario gets run, and so no variable
         are known at that point
         """
+        # jinja2 is only loaded when some Deferred gets rendered
+        from jinja2 import Template, DebugUndefined     # pylint: disable=import-outside-toplevel
         template = Template(self.template, undefined=DebugUndefined)
         return template.render(**self.variables)
 
@@ -0,0 +1,293 @@
+"""
+Compact notations for sets of hostnames, as accepted by the
+``--target`` and ``--exclude`` options of ``apssh``.
+
+A host pattern is a hostname that contains
+
+* numeric ranges between square brackets, like ``fit[01-37,40]``; when the
+  first bound has a leading zero, all the numbers are padded to its width,
+  so this pattern stands for ``fit01`` to ``fit37``, and ``fit40``;
+* alternatives between curly braces, like ``node{a,b}``.
+
+These can be combined, so that ``node{a,b}-[1-64].example.org`` stands
+for 128 hostnames.
+"""
+
+import re
+from collections import defaultdict
+
+# the characters that denote a pattern
+PATTERN_CHARS = '[{'
+
+_CLOSING = {'[': ']', '{': '}'}
+_OPENING = re.compile(r"[\[{]")
+
+
+class _Literal:
+
+    def __init__(self, text):
+        self.text = text
+
+    def values(self):                                   # pylint: disable=c0116
+        yield self.text
+
+    def regex(self):                                    # pylint: disable=c0116
+        return re.escape(self.text)
+
+    def spans(self, text, start):                       # pylint: disable=c0116
+        if text.startswith(self.text, start):
+            yield len(self.text)
+
+
+class _Choices:
+
+    def __init__(self, choices):
+        self.choices = choices
+
+    def values(self):                                   # pylint: disable=c0116
+        yield from self.choices
+
+    def regex(self):                                    # pylint: disable=c0116
+        return "(?:" + "|".join(re.escape(c) for c in self.choices) + ")"
+
+    def spans(self, text, start):                       # pylint: disable=c0116
+        for choice in self.choices:
+            if text.startswith(choice, start):
+                yield len(choice)
+
+
+class _Ranges:
+
+    def __init__(self, ranges):
+        # a list of (start, end, width) tuples, width being 0 if not padded
+        self.ranges = ranges
+
+    def values(self):                                   # pylint: disable=c0116
+        for start, end, width in self.ranges:
+            for number in range(start, end+1):
+                yield str(number).zfill(width)
+
+    def regex(self):                                    # pylint: disable=c0116
+        widths = sorted({width for _, _, width in self.ranges})
+        # a padded number can be wider than the pad, like 100 in [01-100]
+        alternatives = [r"\d{%d,}" % width if width else r"0|[1-9]\d*"
+                        for width in widths]
+        return "(?:" + "|".join(alternatives) + ")"
+
+    def check(self, text):
+        """
+        whether text is one of the numbers in the ranges,
+        written like values() does
+        """
+        number = int(text)
+        return any(start <= number <= end and str(number).zfill(width) == text
+                   for start, end, width in self.ranges)
+
+    def spans(self, text, start):
+        """
+        the lengths of the numbers in the ranges that text has at start;
+        there may be several of them when 2 ranges are adjacent,
+        like in ``[1-2][10-30]``
+        """
+        end = start
+        while end < len(text) and text[end].isdigit():
+            end += 1
+        for length in range(1, end - start + 1):
+            if self.check(text[start:start+length]):
+                yield length
+
+
+def _parse_ranges(pattern, spec):
+    ranges = []
+    for item in spec.split(','):
+        start, dash, end = item.strip().partition('-')
+        if not dash:
+            end = start
+        if not (start.isdigit() and end.isdigit()):
+            raise ValueError(f"{pattern}: bad range [{spec}]"
+                             f" - expecting numbers like [1-10,12]")
+        if int(start) > int(end):
+            raise ValueError(f"{pattern}: empty range {item}")
+        width = len(start) if len(start) > 1 and start[0] == '0' else 0
+        ranges.append((int(start), int(end), width))
+    return _Ranges(ranges)
+
+
+def _parse(pattern):
+    """
+    returns a list of segments
+    """
+    segments = []
+    index = 0
+    while index < len(pattern):
+        found = _OPENING.search(pattern, index)
+        if not found:
+            segments.append(_Literal(pattern[index:]))
+            break
+        opening = found.start()
+        if opening > index:
+            segments.append(_Literal(pattern[index:opening]))
+        closing = pattern.find(_CLOSING[pattern[opening]], opening)
+        if closing < 0:
+            raise ValueError(f"{pattern}: unbalanced {pattern[opening]}")
+        spec = pattern[opening+1:closing]
+        if any(char in spec for char in '[]{}'):
+            raise ValueError(f"{pattern}: nested patterns are not supported")
+        if pattern[opening] == '[':
+            segments.append(_parse_ranges(pattern, spec))
+        else:
+            segments.append(_Choices(spec.split(',')))
+        index = closing + 1
+    return segments
+
+
+def is_pattern(text):
+    """
+    Returns:
+      bool: whether text is a pattern, or a plain hostname
+    """
+    return any(char in text for char in PATTERN_CHARS)
+
+
+def _expand(segments, prefix):
+    if not segments:
+        yield prefix
+        return
+    for value in segments[0].values():
+        yield from _expand(segments[1:], prefix + value)
+
+
+def expand_hostnames(pattern):
+    """
+    Parameters:
+      pattern: a host pattern, see the module documentation;
+        a plain hostname is fine too
+
+    Returns:
+      a generator over the hostnames that match the pattern;
+      they are produced lazily, in the order of the pattern
+
+    Raises:
+      ValueError: if the pattern cannot be parsed; this is
+        done right away, not when iterating
+    """
+    segments = _parse(pattern)
+    return _expand(segments, "")
+
+
+class HostPattern:
+    """
+    A compiled host pattern, for checking if a hostname matches it without
+    enumerating all the hostnames in the pattern; this is how ``apssh``
+    deals with patterns in ``--exclude``.
+
+    Parameters:
+      pattern: a host pattern, see the module documentation
+
+    Raises:
+      ValueError: if the pattern cannot be parsed
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self._segments = _parse(pattern)
+        self._regexp = re.compile("".join(segment.regex()
+                                          for segment in self._segments))
+
+    def __repr__(self):
+        return f"HostPattern({self.pattern!r})"
+
+    def match(self, hostname):
+        """
+        Returns:
+          bool: whether hostname is one of the hostnames in the pattern
+        """
+        # a cheap way to rule out most hostnames
+        if not self._regexp.fullmatch(hostname):
+            return False
+        return self._match(hostname, 0, 0)
+
+    def _match(self, hostname, index, start):
+        # segments[index:] against hostname[start:], trying all the ways
+        # to split the digits between adjacent ranges
+        if index == len(self._segments):
+            return start == len(hostname)
+        return any(self._match(hostname, index+1, start+length)
+                   for length in self._segments[index].spans(hostname, start))
+
+
+def _runs(numbers):
+    """
+    [1, 2, 3, 5] -> [(1, 3), (5, 5)]
+    """
+    runs = []
+    for number in sorted(numbers):
+        if runs and number == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], number)
+        else:
+            runs.append((number, number))
+    return runs
+
+
+def compress_hostnames(hostnames):
+    """
+    The reverse of :func:`expand_hostnames`: groups hostnames that differ
+    only by their last number, like ``fit01 fit02 fit03 fit05``
+    into ``fit[01-03,05]``.
+
+    Parameters:
+      hostnames: an iterable of hostnames
+
+    Returns:
+      list: a list of patterns and plain hostnames, that together
+      stand for the same set of hostnames, duplicates removed
+    """
+    # (prefix, suffix) -> width -> set of the numbers as strings
+    groups = defaultdict(lambda: defaultdict(set))
+    # used as an ordered set
+    plain = {}
+    for hostname in hostnames:
+        match = re.fullmatch(r"(.*?)(\d+)(\D*)", hostname)
+        if not match:
+            plain[hostname] = None
+            continue
+        prefix, digits, suffix = match.groups()
+        groups[(prefix, suffix)][len(digits)].add(digits)
+
+    result = []
+    for (prefix, suffix), widths in groups.items():
+        # a group with a leading zero is padded, and is rendered on its own;
+        # the others can all go together
+        subgroups = []
+        unpadded = set()
+        for width, digits_s in sorted(widths.items()):
+            numbers = {int(digits) for digits in digits_s}
+            if width > 1 and any(digits[0] == '0' for digits in digits_s):
+                subgroups.append((numbers, width))
+            else:
+                unpadded |= numbers
+        if unpadded:
+            subgroups.insert(0, (unpadded, 0))
+        for numbers, width in subgroups:
+            if len(numbers) == 1:
+                number, = numbers
+                result.append(f"{prefix}{str(number).zfill(width)}{suffix}")
+                continue
+            spec = ",".join(
+                str(start).zfill(width) if start == end
+                else f"{str(start).zfill(width)}-{str(end).zfill(width)}"
+                for start, end in _runs(numbers))
+            result.append(f"{prefix}[{spec}]{suffix}")
+    return result + list(plain)
+
+
+def split_targets(text):
+    """
+    Splits a list of targets along spaces or commas,
+    except for the commas inside a pattern
+
+    Returns:
+      list: the targets
+    """
+    # a lone bracket is kept, so that the pattern is reported as broken
+    return re.findall(r"(?:[^\s,\[{]|\[[^\]]*\]|\{[^}]*\}|[\[{])+", text)
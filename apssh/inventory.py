@@ -0,0 +1,153 @@
+"""
+Fast loading of the target files and directories used with ``--target``
+and ``--exclude``, that may contain tens of thousands of hosts.
+
+* a directory - typically created with ``--mark`` - is listed with
+  ``os.scandir()``, that does not need to stat each entry;
+* a target file is tokenized once; for large files, the result is kept in a
+  compiled inventory in ``~/.apssh/.inventory``, that is reused as long as the
+  file has the same path, modification time and size; so subsequent runs
+  only need to read the tokens back, one per line.
+
+In both cases the result is also cached in memory for the life of
+the process.
+"""
+
+import os
+import hashlib
+from pathlib import Path
+
+from .config import local_config_dir
+
+# where the compiled inventories are stored; this is a hidden directory
+# as targets are also searched for in local_config_dir
+inventory_dir = local_config_dir / ".inventory"
+
+# smaller files are not worth a compiled inventory
+INVENTORY_THRESHOLD = 64 * 1024
+
+_HEADER = "apssh-inventory 1"
+
+# (kind, resolved path) -> (mtime_ns, size, names)
+_memory_cache = {}
+
+
+def clear_inventory_cache(on_disk=False):
+    """
+    Forgets about the target files and directories loaded so far.
+
+    Parameters:
+      on_disk: if set, the compiled inventories are removed as well
+    """
+    _memory_cache.clear()
+    if on_disk and inventory_dir.is_dir():
+        for entry in os.scandir(inventory_dir):
+            if entry.name.endswith(".inv"):
+                os.unlink(entry.path)
+
+
+def _memoized(kind, path, loader):
+    resolved = str(Path(path).resolve())
+    stat = os.stat(resolved)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    key = (kind, resolved)
+    cached = _memory_cache.get(key)
+    if cached and cached[:2] == signature:
+        return cached[2]
+    names = loader(resolved, signature)
+    _memory_cache[key] = signature + (names,)
+    return names
+
+
+def scan_directory(path):
+    """
+    Parameters:
+      path: a directory
+
+    Returns:
+      list: the names of the regular files in that directory
+    """
+    def loader(resolved, _signature):
+        with os.scandir(resolved) as entries:
+            return [entry.name for entry in entries if entry.is_file()]
+    return _memoized('dir', path, loader)
+
+
+def tokenize(lines):
+    """
+    Parameters:
+      lines: the lines in a target file
+
+    Returns:
+      list: the targets mentioned in these lines,
+      once comments are removed
+    """
+    tokens = []
+    for line in lines:
+        line = line.strip()
+        if line.startswith('#'):
+            continue
+        tokens.extend(line.split())
+    return tokens
+
+
+def _inventory_path(resolved):
+    digest = hashlib.sha1(resolved.encode()).hexdigest()
+    return inventory_dir / f"{digest}.inv"
+
+
+def _header(resolved, signature):
+    mtime_ns, size = signature
+    return f"{_HEADER} {mtime_ns} {size} {resolved}"
+
+
+def _load_inventory(resolved, signature):
+    """
+    returns the tokens in the compiled inventory, or None if not up-to-date
+    """
+    try:
+        with _inventory_path(resolved).open(encoding='utf-8') as inventory:
+            contents = inventory.read()
+    except OSError:
+        return None
+    header, _, body = contents.partition("\n")
+    if header != _header(resolved, signature):
+        return None
+    return body.split("\n") if body else []
+
+
+def _store_inventory(resolved, signature, tokens):
+    path = _inventory_path(resolved)
+    temporary = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        inventory_dir.mkdir(parents=True, exist_ok=True)
+        with temporary.open('w', encoding='utf-8') as inventory:
+            inventory.write(_header(resolved, signature))
+            inventory.write("\n")
+            inventory.write("\n".join(tokens))
+        os.replace(temporary, path)
+    except OSError:
+        # e.g. a read-only home directory; the cache is just an optimization
+        temporary.unlink(missing_ok=True)
+
+
+def read_target_file(path):
+    """
+    Parameters:
+      path: a target file
+
+    Returns:
+      list: the targets mentioned in that file, see :func:`tokenize`
+    """
+    def loader(resolved, signature):
+        large = signature[1] >= INVENTORY_THRESHOLD
+        if large:
+            tokens = _load_inventory(resolved, signature)
+            if tokens is not None:
+                return tokens
+        with open(resolved, encoding='utf-8') as inputfile:
+            tokens = tokenize(inputfile)
+        if large:
+            _store_inventory(resolved, signature, tokens)
+        return tokens
+    return _memoized('file', path, loader)
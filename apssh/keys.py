@@ -7,6 +7,8 @@ Basic tools for loading ssh keys from the user space or the agent
 import os
 from pathlib import Path
 from getpass import getpass
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
 import asyncssh
 
@@ -54,6 +56,72 @@ def import_private_key(filename):
         return sshkey
 
 
+# the process-wide keys cache, see clear_keys_cache()
+# agent_path -> the list of keys offered by the agent
+_agent_keys_cache = {}
+# resolved filename -> SSHKey, or None if the key could not be imported
+_private_keys_cache = {}
+_cache_lock = threading.Lock()
+
+
+def clear_keys_cache():
+    """
+    The keys loaded from the agent, and from private key files, are cached
+    for the whole process, so that creating many
+    :class:`~apssh.nodes.SshNode` instances does not talk to the agent,
+    or prompt for the same passphrase, over and over again.
+
+    Call this function to forget about these keys, typically after
+    the set of keys in the agent has changed, e.g. with ``ssh-add``;
+    the next calls to :func:`load_agent_keys` or :func:`load_private_keys`
+    will then fetch the keys again.
+    """
+    with _cache_lock:
+        _agent_keys_cache.clear()
+        _private_keys_cache.clear()
+
+
+def _resolve_agent_path(agent_path):
+    return agent_path or os.environ.get('SSH_AUTH_SOCK', None)
+
+
+async def _fetch_agent_keys(agent_path):
+    # make sure to return an empty list when something goes wrong
+    try:
+        async with asyncssh.SSHAgentClient(agent_path) as agent_client:
+            keys = await agent_client.get_keys()
+            return keys
+    except Exception as exc:                        # pylint: disable=w0703
+        # not quite sure which exceptions to expect here
+        print(f"When fetching agent keys: "
+              f"ignored exception {type(exc)} - {exc}")
+        return []
+
+
+async def co_load_agent_keys(agent_path=None):
+    """
+    The async version of :func:`load_agent_keys`, for use from
+    within a running event loop; both share the same cache.
+
+    Parameters:
+      agent_path: how to locate the agent;
+        defaults to env. variable $SSH_AUTH_SOCK
+
+    Returns:
+      a list of SSHKey_ keys from the agent
+    """
+    agent_path = _resolve_agent_path(agent_path)
+    if agent_path is None:
+        return []
+    with _cache_lock:
+        if agent_path in _agent_keys_cache:
+            return list(_agent_keys_cache[agent_path])
+    keys = await _fetch_agent_keys(agent_path)
+    with _cache_lock:
+        _agent_keys_cache.setdefault(agent_path, keys)
+    return list(keys)
+
+
 def load_agent_keys(agent_path=None):
     """
     The ssh-agent is a convenience tool that aims at easying the use of
@@ -71,6 +139,11 @@ def load_agent_keys(agent_path=None):
     :class:`~apssh.nodes.SshNode` class if you do not explicit the set of
     keys that you plan to use.
 
+    The agent is reached only once per process, the keys are then
+    cached, see :func:`clear_keys_cache`. This function can be called
+    from within a running event loop, although :func:`co_load_agent_keys`
+    is preferable in that case.
+
     Parameters:
       agent_path: how to locate the agent;
         defaults to env. variable $SSH_AUTH_SOCK
@@ -83,24 +156,38 @@ def load_agent_keys(agent_path=None):
       currently present in your agent.
 
     """
-    # pylint: disable=c0111
-    async def co_load_agent_keys(agent_path):
-        # make sure to return an empty list when something goes wrong
-        try:
-            async with asyncssh.SSHAgentClient(agent_path) as agent_client:
-                keys = await agent_client.get_keys()
-                return keys
-        except Exception as exc:                        # pylint: disable=w0703
-            # not quite sure which exceptions to expect here
-            print(f"When fetching agent keys: "
-                  f"ignored exception {type(exc)} - {exc}")
-            return []
-
-    agent_path = agent_path or os.environ.get('SSH_AUTH_SOCK', None)
+    agent_path = _resolve_agent_path(agent_path)
     if agent_path is None:
         return []
-    with asyncio.Runner() as runner:
-        return runner.run(co_load_agent_keys(agent_path))
+    with _cache_lock:
+        if agent_path in _agent_keys_cache:
+            return list(_agent_keys_cache[agent_path])
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        with asyncio.Runner() as runner:
+            return runner.run(co_load_agent_keys(agent_path))
+    # a loop is running in this thread, and we cannot nest another one
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(
+            asyncio.run, co_load_agent_keys(agent_path)).result()
+
+
+def _load_private_key(filename):
+    """
+    same as import_private_key, but goes through the cache
+    """
+    path = Path(filename).expanduser()
+    if not path.exists():
+        return None
+    resolved = str(path.resolve())
+    with _cache_lock:
+        if resolved in _private_keys_cache:
+            return _private_keys_cache[resolved]
+    # prompting for a passphrase while holding the lock would be bad
+    sshkey = import_private_key(path)
+    with _cache_lock:
+        return _private_keys_cache.setdefault(resolved, sshkey)
 
 
 def load_private_keys(command_line_keys=None, verbose=False):
@@ -132,13 +219,30 @@ def load_private_keys(command_line_keys=None, verbose=False):
 
       - 2.c That exact list is used for loading private keys
 
+    Like with the agent, the keys imported from files are cached for
+    the whole process, so a passphrase is prompted for only once;
+    see :func:`clear_keys_cache`.
+
     .. note::
       Use ``ssh-add`` for managing the keys known to the agent.
 
     """
+    agent_keys = None if command_line_keys else load_agent_keys()
+    return _keys_policy(agent_keys, command_line_keys, verbose)
+
+
+async def co_load_private_keys(command_line_keys=None, verbose=False):
+    """
+    The async version of :func:`load_private_keys`; note that importing
+    a key from a file may still prompt for its passphrase.
+    """
+    agent_keys = None if command_line_keys else await co_load_agent_keys()
+    return _keys_policy(agent_keys, command_line_keys, verbose)
+
+
+def _keys_policy(agent_keys, command_line_keys, verbose):
     filenames = []
     if not command_line_keys:
-        agent_keys = load_agent_keys()
         # agent has stuff : let's use it
         if agent_keys:
             if verbose:
@@ -155,7 +259,7 @@ def load_private_keys(command_line_keys=None, verbose=False):
         filenames = command_line_keys
         if verbose:
             print(f"apssh will try to load {len(filenames)} keys from the command line")
-    keys = [import_private_key(filename) for filename in filenames]
+    keys = [_load_private_key(filename) for filename in filenames]
     valid_keys = [k for k in keys if k]
     if verbose:
         print(f"apssh has loaded {len(valid_keys)} keys")
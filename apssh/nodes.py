@@ -5,15 +5,28 @@ a ``node`` attribute to describe on which node to run commands.
 """
 
 import asyncio
+import contextlib
 import os
+import shlex
+import signal
 from subprocess import PIPE, DEVNULL
 from pathlib import Path
 
 from asyncssh import EXTENDED_DATA_STDERR
 
 from .formatters import HostFormatter
-from .sshproxy import SshProxy
-from .keys import load_private_keys, load_agent_keys
+from .sshproxy import SshProxy, COMMAND_TIMEOUT, COMMAND_TIMEOUT_GRACE
+from .keys import load_private_keys
+from .stdin import stdin_chunks
+from .localcopy import copy_paths
+from .records import current_byte_counts
+from .util import LineSplitter
+
+# the size of the chunks read from a local process's outputs
+READ_CHUNK_SIZE = 256 * 1024
+
+# the SFTP settings that make no sense for a local copy
+SFTP_TUNING = ('block_size', 'max_requests')
 
 
 class LocalNode:
@@ -26,6 +39,11 @@ class LocalNode:
       formatter: a formatter instance, default to an instance of
         ``HostFormatter``;
       verbose: if provided, passed to the formatter instance
+      max_processes: if set, at most that many local processes run
+        simultaneously on behalf of this node, the other commands wait
+        for their turn; default is no limit, which is required
+        if some processes - like port forwarders - need to run
+        for the whole duration of a scenario
 
     Examples:
       To create a job that runs 2 commands locally::
@@ -37,14 +55,25 @@ class LocalNode:
                ])
 
     .. note::
-      Not all command classes support running on a local node, essentially
-        this is only available for usual ``Run`` commands as of this writing.
+      Not all command classes support running on a local node; this is
+        available for ``Run``, ``RunScript``, ``RunString``, ``Push``
+        and ``Pull``; for the latter two, the paths on the "remote" side
+        are relative to the home directory, like they would be
+        with SFTP to localhost.
     """
 
-    def __init__(self, formatter=None, verbose=None):
+    def __init__(self, formatter=None, verbose=None, max_processes=None):
         self.formatter = formatter or HostFormatter()
         if verbose is not None:
             self.formatter.verbose = verbose
+        if max_processes is not None and max_processes <= 0:
+            raise ValueError(f"LocalNode: max_processes must be positive,"
+                             f" got {max_processes}")
+        self.max_processes = max_processes
+        # the semaphore is bound to an event loop, so we keep track of it
+        self._processes_loop, self._processes_semaphore = None, None
+        # bytes received so far, on all processes
+        self.stdout_bytes, self.stderr_bytes = 0, 0
         # could be improved
         self.hostname = "LOCALNODE"
         # some users reported issues with this so
@@ -57,52 +86,170 @@ class LocalNode:
 
     # pylint: disable=c0111
 
-    def lines(self, bytes_chunk, datatype):
+    def lines(self, bytes_chunk, datatype, formatter=None):
         # encoding should probably not be hard-wired
+        formatter = formatter or self.formatter
         str_chunk = bytes_chunk.decode("utf-8")
         if str_chunk:
             if str_chunk[-1] == "\n":
                 str_chunk = str_chunk[:-1]
             for line in str_chunk.split("\n"):
-                self.formatter.line(line + "\n", datatype, self.hostname)
+                formatter.line(line + "\n", datatype, self.hostname)
 
-    # from this clue here
-    # https://stackoverflow.com/questions/17190221/subprocess-popen\
-    # -cloning-stdout-and-stderr-both-to-terminal-and-variables/\
-    # 25960956#25960956
-    async def read_and_display(self, stream, datatype):
+    async def read_and_display(self, stream, datatype, formatter=None):
         """
-        read (process stdout or stderr) stream line by line
-        until EOF and dispatch lines in formatter
-        - using self.lines(... datatype)
+        read (process stdout or stderr) stream by large chunks until EOF,
+        and dispatch lines in formatter; lines are reassembled - and
+        decoded - incrementally, with the same engine as for ssh sessions,
+        so there is no limit on the length of a line
         """
+        formatter = formatter or self.formatter
+        byte_counts = current_byte_counts()
+        # unlike on ssh sessions, a last line with no newline gets one
+        channel = LineSplitter(
+            lambda line, datatype: formatter.line(line, datatype, self.hostname),
+            terminate=True)
         while True:
-            line = await stream.readline()
-            if not line:
+            chunk = await stream.read(READ_CHUNK_SIZE)
+            if not chunk:
+                channel.eof(datatype)
                 return
-            self.lines(line, datatype)
+            stderr = datatype == EXTENDED_DATA_STDERR
+            if byte_counts is not None:
+                byte_counts.count(len(chunk), stderr)
+            if stderr:
+                self.stderr_bytes += len(chunk)
+            else:
+                self.stdout_bytes += len(chunk)
+            channel.data_received(chunk, datatype)
+
+    @staticmethod
+    async def feed_stdin(process, chunks):
+        """
+        write chunks - if not None, as returned by
+        :func:`~apssh.stdin.stdin_chunks` - into the process's stdin;
+        the process's stdin is closed even if the source fails
+        """
+        if chunks is None:
+            return
+        try:
+            async for chunk in chunks:
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # the process does not read anymore
+            pass
+        finally:
+            process.stdin.close()
+
+    async def wait_process(self, process, work, timeout, formatter=None):
+        """
+        wait for the process and its companion coroutine ``work``
+        (reading outputs and/or feeding stdin) to complete;
+        if this takes more than timeout, the process gets terminated,
+        together with its own subprocesses
+
+        Returns:
+          bool: False if the timeout has expired
+        """
+        try:
+            await asyncio.wait_for(asyncio.gather(work, process.wait()),
+                                   timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.lines(f"command timed out after {timeout}s - terminating\n"
+                       .encode(), EXTENDED_DATA_STDERR, formatter)
+            # the process was started in its own session,
+            # so this reaches the whole process group
+            os.killpg(process.pid, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(process.wait(),
+                                       timeout=COMMAND_TIMEOUT_GRACE)
+            except asyncio.TimeoutError:
+                os.killpg(process.pid, signal.SIGKILL)
+                await process.wait()
+            return False
+
+    def _process_slot(self):
+        if not self.max_processes:
+            return contextlib.nullcontext()
+        loop = asyncio.get_running_loop()
+        if self._processes_loop is not loop:
+            self._processes_loop = loop
+            self._processes_semaphore = asyncio.Semaphore(self.max_processes)
+        return self._processes_semaphore
+
+    @staticmethod
+    async def _spawn(command, **kwds):
+        """
+        a command given as a list of strings is exec'ed directly,
+        a string goes through /bin/sh
+        """
+        if isinstance(command, str):
+            return await asyncio.create_subprocess_shell(command, **kwds)
+        return await asyncio.create_subprocess_exec(*command, **kwds)
+
+    async def run(self, command, *, ignore_outputs=False, cwd=None, stdin=None,
+                  timeout=None, formatter=None):
+        """
+        Runs a local command, and waits for it to complete, within the
+        limit of ``max_processes``.
+
+        Parameters:
+          command: either a string, that is run through ``/bin/sh``,
+            or a list of strings, that is executed as-is, with no shell,
+            which saves the cost of forking a shell for each command.
 
-    async def run(self, command, *, ignore_outputs=False, cwd=None):
+        Returns:
+          the command's exit code, or ``COMMAND_TIMEOUT``
+        """
+        async with self._process_slot():
+            return await self._run(command, ignore_outputs=ignore_outputs,
+                                   cwd=cwd, stdin=stdin, timeout=timeout,
+                                   formatter=formatter)
+
+    async def _run(self, command, *, ignore_outputs, cwd, stdin,
+                   timeout, formatter):
         # pass cwd= to create_subprocess_shell when cwd is provided
         kwds = {}
         if cwd is not None:
             kwds['cwd'] = cwd
+        chunks = None
+        if stdin is not None:
+            kwds['stdin'] = PIPE
+        if timeout is not None:
+            # so we can terminate all the subprocesses, see wait_process
+            kwds['start_new_session'] = True
         try:
+            # a broken source is reported before the command starts
+            if stdin is not None:
+                chunks = stdin_chunks(stdin)
             if not ignore_outputs:
-                process = await asyncio.create_subprocess_shell(
+                process = await self._spawn(
                     command, stdout=PIPE, stderr=PIPE, **kwds)
                 # multiplex stdout and stderr on the terminal
-                _, _ = await asyncio.gather(
-                    self.read_and_display(process.stdout, 0),
-                    self.read_and_display(process.stderr, EXTENDED_DATA_STDERR))
+                work = asyncio.gather(
+                    self.read_and_display(process.stdout, 0, formatter),
+                    self.read_and_display(process.stderr, EXTENDED_DATA_STDERR,
+                                          formatter),
+                    self.feed_stdin(process, chunks))
+                if not await self.wait_process(process, work, timeout,
+                                               formatter):
+                    return COMMAND_TIMEOUT
                 retcod = await process.wait()
                 return retcod
             else:
-                process = await asyncio.create_subprocess_shell(
+                process = await self._spawn(
                     command, stdout=DEVNULL, stderr=DEVNULL, **kwds)
                 # nothing to read
-                self.lines(f"IGNORING (ignore_outputs=True) with `{command}`".encode(),
-                           EXTENDED_DATA_STDERR)
+                shown = (command if isinstance(command, str)
+                         else shlex.join(command))
+                self.lines(f"IGNORING (ignore_outputs=True) with `{shown}`".encode(),
+                           EXTENDED_DATA_STDERR, formatter)
+                work = self.feed_stdin(process, chunks)
+                if not await self.wait_process(process, work, timeout,
+                                               formatter):
+                    return COMMAND_TIMEOUT
                 retcod = await process.wait()
                 print(f"retcod={retcod}")
                 return retcod
@@ -111,6 +258,52 @@ class LocalNode:
             line = f"LocalNode: Could not run local command {command} - {exc}"
             self.formatter.line(line, EXTENDED_DATA_STDERR, self.hostname)
 
+    async def copy_file_s(self, sources, destination, *, parallel=None,
+                          recurse=False, preserve=False,
+                          follow_symlinks=False, **kwds):
+        """
+        The local counterpart of :meth:`~apssh.sshproxy.SshProxy.put_file_s`
+        and :meth:`~apssh.sshproxy.SshProxy.get_file_s`; the copies are
+        made by the kernel - see :mod:`apssh.localcopy` - in a separate
+        thread, so as to not block the event loop.
+
+        Parameters:
+          sources: the files or directories to copy
+          destination: where to copy them
+          parallel: if set, how many sources can be copied simultaneously
+          recurse, preserve, follow_symlinks: like with SFTP
+          kwds: the SFTP tuning settings, i.e. ``block_size`` and
+            ``max_requests``, are accepted and ignored
+
+        Returns:
+          True if all went well, or raise exception
+
+        Raises:
+          TypeError: if ``kwds`` has any other setting
+        """
+        unsupported = set(kwds) - set(SFTP_TUNING)
+        if unsupported:
+            raise TypeError(f"LocalNode.copy_file_s: unsupported settings"
+                            f" {', '.join(sorted(unsupported))}")
+        settings = dict(recurse=recurse, preserve=preserve,
+                        follow_symlinks=follow_symlinks)
+        if (isinstance(sources, (str, bytes, os.PathLike))
+                or not parallel or parallel <= 1 or len(sources) <= 1):
+            await asyncio.to_thread(copy_paths, sources, destination,
+                                    **settings)
+            return True
+        if not Path(destination).is_dir():
+            raise NotADirectoryError(f"{destination} must be a directory"
+                                     f" when copying several files")
+        semaphore = asyncio.Semaphore(parallel)
+
+        async def copy_one(source):
+            async with semaphore:
+                await asyncio.to_thread(copy_paths, source, destination,
+                                        **settings)
+        await asyncio.gather(*(copy_one(source) for source in sources))
+        return True
+
     async def close(self):
         pass
 
@@ -159,7 +352,8 @@ class SshNode(SshProxy):
         the default policy implemented in this class is to first use the
         keys currently loaded in the ssh agent. If none can be found this
         way, `SshNode` will attempt to import the default ssh keys located
-        in ``~/.ssh/id_rsa`` and ``~/.ssh/id_dsa``.
+        in ``~/.ssh/id_rsa`` and ``~/.ssh/id_dsa``; these keys are
+        loaded once per process, see :func:`~apssh.keys.clear_keys_cache`.
       kwds: passed along to the :class:`~apssh.sshproxy.SshProxy` class.
 
     """
@@ -168,8 +362,7 @@ class SshNode(SshProxy):
         if username is None:
             username = "root"
         if not keys:
-            keys = load_agent_keys()
-        if not keys:
+            # agent keys first, then default keys; both are cached
             keys = load_private_keys()
         SshProxy.__init__(self, hostname, username=username, keys=keys, **kwds)
 
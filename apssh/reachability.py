@@ -0,0 +1,191 @@
+"""
+A record of which hosts could be reached in the previous runs of ``apssh``,
+so that the hosts known to be down can be skipped instead of waiting for
+their connection to time out; see the ``--skip-recently-failed`` option.
+
+The record is kept in ``~/.apssh/.reachability``, with one line per host,
+of the form ``key outcome timestamp``; the key is the hostname, prefixed
+with the gateways on the way if any, like ``gateway->hostname``; the
+outcomes older than :data:`MAX_AGE` are dropped.
+"""
+
+import os
+import time
+import asyncio
+from pathlib import Path
+
+from .config import local_config_dir
+
+# where the outcomes are stored; this is a hidden file
+# as targets are also searched for in local_config_dir
+reachability_path = local_config_dir / ".reachability"
+
+REACHABLE = "reachable"
+UNREACHABLE = "unreachable"
+
+# how many probes are run at the same time
+PROBE_WINDOW = 100
+
+# how long an outcome is kept in the record, in seconds
+MAX_AGE = 7 * 24 * 3600
+
+
+def reachability_key(proxy):
+    """
+    Parameters:
+      proxy: an :class:`~apssh.sshproxy.SshProxy` instance
+
+    Returns:
+      str: the key used for that node in the record
+    """
+    hostnames = []
+    while proxy is not None:
+        hostnames.append(proxy.hostname)
+        proxy = proxy.gateway
+    return "->".join(reversed(hostnames))
+
+
+class Reachability:
+    """
+    The outcomes of the previous connections, as a dictionary
+    key -> (outcome, timestamp), where outcome is either
+    :data:`REACHABLE` or :data:`UNREACHABLE`.
+
+    Parameters:
+      path: where the record is stored; default is ``~/.apssh/.reachability``
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else reachability_path
+        self.entries = {}
+        # what was recorded since loaded
+        self._updates = {}
+
+    def _read(self):
+        entries = {}
+        try:
+            with self.path.open(encoding='utf-8') as record:
+                for line in record:
+                    try:
+                        key, outcome, timestamp = line.split()
+                        entries[key] = (outcome, float(timestamp))
+                    except ValueError:
+                        # ignore broken lines
+                        pass
+        except OSError:
+            pass
+        return entries
+
+    def load(self):
+        """
+        Reads the record; a missing file is the same as an empty record.
+        """
+        self.entries = self._read()
+        self._updates = {}
+        return self
+
+    def record(self, key, reachable, timestamp=None):
+        """
+        Records an outcome for one node.
+
+        Parameters:
+          key: see :func:`reachability_key`
+          reachable: bool
+          timestamp: default is now
+        """
+        outcome = REACHABLE if reachable else UNREACHABLE
+        entry = (outcome, timestamp or time.time())
+        self.entries[key] = entry
+        self._updates[key] = entry
+
+    def failed_since(self, key, ttl):
+        """
+        Parameters:
+          key: see :func:`reachability_key`
+          ttl: how many seconds an outcome remains valid
+
+        Returns:
+          float: how many seconds ago the node was found unreachable,
+          or None if that was more than ``ttl`` seconds ago, or if
+          the node was reachable the last time
+        """
+        outcome, timestamp = self.entries.get(key, (None, None))
+        if outcome != UNREACHABLE:
+            return None
+        age = time.time() - timestamp
+        return age if age <= ttl else None
+
+    def save(self, max_age=MAX_AGE):
+        """
+        Writes the record, merged with what other processes may have
+        written in the meanwhile - the most recent outcome wins;
+        this is silently ignored if the record cannot be written.
+
+        Parameters:
+          max_age: the outcomes older than that, in seconds, are dropped
+        """
+        entries = self._read()
+        for key, (outcome, timestamp) in self._updates.items():
+            if key not in entries or entries[key][1] <= timestamp:
+                entries[key] = (outcome, timestamp)
+        oldest = time.time() - max_age
+        entries = {key: (outcome, timestamp)
+                   for key, (outcome, timestamp) in entries.items()
+                   if timestamp >= oldest}
+        temporary = self.path.with_name(
+            f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with temporary.open('w', encoding='utf-8') as record:
+                for key, (outcome, timestamp) in entries.items():
+                    record.write(f"{key} {outcome} {int(timestamp)}\n")
+            os.replace(temporary, self.path)
+        except OSError:
+            temporary.unlink(missing_ok=True)
+        self.entries = entries
+        self._updates = {}
+
+
+async def co_probe(hostname, port=22, timeout=5.):
+    """
+    A cheap check that a node is back: can a TCP connection be opened
+    to its ssh port
+
+    Returns:
+      bool: whether the connection could be opened within ``timeout``
+    """
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(hostname, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+
+async def co_reprobe(proxies, reachability, timeout=5.):
+    """
+    Probes the nodes that are not reached through a gateway
+    - the other ones cannot be probed from here - with :func:`co_probe`,
+    and records the outcomes in ``reachability``; so that the nodes
+    that are back get used again in the next run.
+
+    Parameters:
+      proxies: the :class:`~apssh.sshproxy.SshProxy` instances to probe
+      reachability: a :class:`Reachability` instance
+      timeout: passed to :func:`co_probe`
+
+    Returns:
+      list: the proxies that are reachable again
+    """
+    semaphore = asyncio.Semaphore(PROBE_WINDOW)
+    direct = [proxy for proxy in proxies if proxy.gateway is None]
+
+    async def reprobe(proxy):
+        async with semaphore:
+            reachable = await co_probe(proxy.hostname, proxy.port, timeout)
+        reachability.record(reachability_key(proxy), reachable)
+        return reachable
+
+    outcomes = await asyncio.gather(*(reprobe(proxy) for proxy in direct))
+    return [proxy for proxy, reachable in zip(direct, outcomes) if reachable]
@@ -0,0 +1,199 @@
+"""
+Compact records of what happened in a :class:`~apssh.sshjob.SshJob`,
+for reporting on large runs without rescanning the outputs;
+see the ``record`` attribute of :class:`~apssh.sshjob.SshJob`,
+and the ``records`` setting of :class:`~apssh.sshjob.FanoutJob`.
+"""
+
+import json
+import contextlib
+import contextvars
+from collections import namedtuple, defaultdict
+
+from .config import COMMAND_TIMEOUT
+from .hostrange import compress_hostnames
+
+CommandRecord = namedtuple('CommandRecord', [
+    # the command's label line
+    'label',
+    # an exit code, a signal name, COMMAND_TIMEOUT,
+    # or None if the command could not run
+    'result',
+    # the name of the exception class if the command raised one, else None
+    'exception',
+    # wall-clock duration in seconds, retries included
+    'duration',
+    # bytes received on stdout and stderr
+    'stdout_bytes', 'stderr_bytes',
+    # 1 unless the command was retried
+    'attempts',
+])
+
+class ByteCounts:                       # pylint: disable=too-few-public-methods
+    """
+    The bytes received by one command on its outputs
+    """
+
+    __slots__ = ('stdout', 'stderr')
+
+    def __init__(self):
+        self.stdout, self.stderr = 0, 0
+
+    def count(self, nbytes, stderr):
+        """
+        Records that nbytes were received, on stderr if set, else on stdout
+        """
+        if stderr:
+            self.stderr += nbytes
+        else:
+            self.stdout += nbytes
+
+
+# the counts of the command being recorded; this is a context variable,
+# so that the commands that run at the same time on the same node
+# - in several jobs, or in a Parallel - are told apart
+_byte_counts = contextvars.ContextVar('byte_counts', default=None)
+
+
+def current_byte_counts():
+    """
+    Returns:
+      ByteCounts: the counts of the command being recorded
+      in the current task, if any, else None
+    """
+    return _byte_counts.get()
+
+
+@contextlib.contextmanager
+def counting_bytes():
+    """
+    A context manager that counts the bytes received by the sessions
+    and processes started inside it, in the same asyncio task or in
+    the tasks that it spawns; it yields a :class:`ByteCounts` object
+    """
+    counts = ByteCounts()
+    token = _byte_counts.set(counts)
+    try:
+        yield counts
+    finally:
+        _byte_counts.reset(token)
+
+
+JobRecord = namedtuple('JobRecord', [
+    'hostname',
+    # what co_run() returned, or None if it raised an exception
+    'result',
+    # wall-clock duration in seconds
+    'duration',
+    # whether the node was already connected when the job started;
+    # None for a LocalNode
+    'reused_connection',
+    # the retries that occurred, as shown in repr_result()
+    'retries',
+    # a tuple of CommandRecord, one per command that was triggered
+    'commands',
+])
+
+
+def failure_class(record):
+    """
+    Parameters:
+      record: a :class:`JobRecord`, or None for a job that has not completed
+
+    Returns:
+      str: a short description of why the job has failed - e.g.
+      ``exit 2``, ``signal KILL``, ``TIMEOUT``, ``ConnectionRefusedError``
+      or ``abandoned`` - or None if the job has succeeded
+    """
+    if record is None:
+        return "abandoned"
+    for command in record.commands:
+        if command.exception:
+            return command.exception
+    if record.result == 0:
+        return None
+    if record.result is None:
+        return "no result"
+    if isinstance(record.result, int):
+        return f"exit {record.result}"
+    if record.result == COMMAND_TIMEOUT:
+        return COMMAND_TIMEOUT
+    # asyncssh reports signals by their name
+    return f"signal {record.result}"
+
+
+def _classify(records):
+    """
+    returns a dict failure class -> list of hostnames,
+    and the completed records, slowest first
+    """
+    failures = defaultdict(list)
+    for hostname, record in records:
+        klass = failure_class(record)
+        if klass:
+            failures[klass].append(hostname)
+    completed = sorted((record for _, record in records if record),
+                       key=lambda record: record.duration, reverse=True)
+    return failures, completed
+
+
+def summary_json(records, slowest=10):
+    """
+    Parameters:
+      records: an iterable of (hostname, :class:`JobRecord`) tuples,
+        the record being None for the hosts that have not completed
+      slowest: how many of the slowest hosts to single out
+
+    Returns:
+      str: a JSON document with the details on all hosts, the slowest
+      ones, and the hostnames for each failure class
+    """
+    records = list(records)
+    failures, completed = _classify(records)
+
+    def as_dict(hostname, record):
+        result = {'hostname': hostname, 'failure': failure_class(record)}
+        if record is not None:
+            result.update(record._asdict())
+            result['commands'] = [command._asdict()
+                                  for command in record.commands]
+        return result
+
+    return json.dumps({
+        'hosts': [as_dict(hostname, record) for hostname, record in records],
+        'slowest': [{'hostname': record.hostname, 'duration': record.duration}
+                    for record in completed[:slowest]],
+        'failures': failures,
+    }, indent=2)
+
+
+def summary_table(records, slowest=10):
+    """
+    Same as :func:`summary_json`, but returns a text rendering,
+    with the counts of each failure class, and the slowest hosts;
+    the failed hosts are shown as ranges, like ``fit[01-04,12]``
+    """
+    records = list(records)
+    failures, completed = _classify(records)
+    lines = []
+    nb_failed = sum(len(hostnames) for hostnames in failures.values())
+    lines.append(f"{len(records) - nb_failed} OK - {nb_failed} failed"
+                 f" out of {len(records)} hosts")
+    for klass, hostnames in sorted(failures.items(),
+                                   key=lambda item: -len(item[1])):
+        compressed = compress_hostnames(hostnames)
+        examples = " ".join(compressed[:3])
+        if len(compressed) > 3:
+            examples += " ..."
+        lines.append(f"{len(hostnames):>8} {klass:<24} {examples}")
+    if completed:
+        lines.append("slowest hosts:")
+    for record in completed[:slowest]:
+        received = sum(command.stdout_bytes + command.stderr_bytes
+                       for command in record.commands)
+        line = (f"{record.duration:>8.2f}s {record.hostname:<24}"
+                f" {received:>8} bytes")
+        if record.retries:
+            line += f" - {len(record.retries)} retries"
+        lines.append(line)
+    return "\n".join(lines)
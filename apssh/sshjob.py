@@ -12,12 +12,20 @@ en/latest/API.html#module-asynciojobs.scheduler
 .. _asynciojobs: http://asynciojobs.readthedocs.io/
 """
 
+import sys
+import array
+import asyncio
+import time
+from collections import deque
+
+import asyncssh
 from asynciojobs.job import AbstractJob
 
 from .util import check_arg_type
 from .sshproxy import SshProxy
 from .nodes import LocalNode
 from .deferred import Deferred
+from .records import CommandRecord, JobRecord, counting_bytes
 
 from .commands import AbstractCommand, Run
 
@@ -33,6 +41,93 @@ class CommandFailedError(Exception):
     pass
 
 
+class QuorumReached(Exception):
+    """
+    The exception raised by a :class:`QuorumJob` once enough nodes
+    have succeeded, so as to cut the surrounding scheduler short.
+    """
+
+    pass
+
+
+class _RetryJob(Exception):
+    """
+    Used internally to restart all the commands in a job
+    with ``retry_scope='job'``
+    """
+
+    def __init__(self, label, outcome):
+        self.label = label
+        self.outcome = outcome
+        super().__init__(label, outcome)
+
+
+# what is worth a retry by default: the command could not run at all,
+# or a connection-level issue
+DEFAULT_RETRY_ON = (None, OSError, asyncssh.Error, asyncio.TimeoutError)
+
+
+def _normalize_commands(command, commands):
+    """
+    Turn the command/commands arguments of a job into
+    a list of AbstractCommand instances, see SshJob
+    """
+    # use command or commands
+    if command is None and commands is None:
+        print("WARNING: SshJob requires either command or commands")
+        commands = [
+            Run("echo misformed SshJob - no commands nor commands")]
+    elif command and commands:
+        print(
+            "WARNING: SshJob created with command and commands"
+            " - keeping the latter only")
+        pass # commands = commands
+    elif command:
+        commands = command
+    else:
+        pass
+
+    # find out what really is meant here
+    if not commands:
+        # cannot tell which case in (1) (2) (3) (4)
+        print("WARNING: SshJob requires a meaningful commands")
+        result = [Run("echo misformed SshJob - empty commands")]
+    elif isinstance(commands, (str, Deferred)):
+        # print("case (4)")
+        result = [Run(commands)]
+    elif isinstance(commands, AbstractCommand):
+        # print("case (2)")
+        result = [commands]
+    elif isinstance(commands, (list, tuple)):
+        # allows to insert None as a command
+        commands = [c for c in commands if c]
+        if not commands:
+            result = [
+                Run("echo misformed SshJob"
+                    " - need at least one non-void command")]
+        elif isinstance(commands[0], AbstractCommand):
+            # print("case (1)")
+            # check the list is homogeneous
+            if not all(isinstance(c, AbstractCommand) for c in commands):
+                print("WARNING: commands must be"
+                      " a list of AbstractCommand objects")
+            result = commands
+        else:
+            # print("case (3)")
+            tokens = commands
+            command_args = (str(t) for t in tokens)
+            result = [Run(*command_args)]
+    else:
+        print("WARNING: SshJob could not make sense of commands")
+        result = [
+            Run("echo misformed SshJob"
+                " - could not make sense of commands")]
+
+    assert len(result) >= 1
+    assert all(isinstance(c, AbstractCommand) for c in result)
+    return result
+
+
 # a single kind of job
 # that can involve several sorts of commands
 # as defined in command.py
@@ -94,8 +189,26 @@ class SshJob(AbstractJob):
         from the one adopted in asynciojobs_.
       critical : passed to AbstractJob_; default is ``True``, which may differ
         from the one adopted in asynciojobs_.
+      retries: how many times a failed command - or the whole job,
+        see ``retry_scope`` - can be retried; default is 0, i.e. no retry.
+        Before a retry, the node gets reconnected if its connection was lost.
+      retry_on: what failures deserve a retry; a collection whose items
+        are either exception classes, that match the exceptions raised by
+        a command, or other values, that are compared with a command's result;
+        the default is ``DEFAULT_RETRY_ON``, i.e. a ``None`` result - the
+        command could not run at all - or a connection-level exception.
+      backoff: the delay in seconds before the first retry,
+        doubled for each subsequent retry.
+      retry_scope: with ``'command'`` - the default - only the failed
+        command is retried; with ``'job'`` all the commands in the job
+        are run again from the start.
       kwds: passed as-is to AbstractJob_; typically useful for setting
        ``required`` and ``scheduler`` at build-time.
+
+    Once the job has run, its ``record`` attribute holds a
+    :class:`~apssh.records.JobRecord`, that sums up the outcome,
+    duration, bytes received and retries of each command; this is
+    set even if the job has raised an exception.
     """
 
     def __init__(self, node, *,                         # pylint: disable=r0912
@@ -107,64 +220,25 @@ class SshJob(AbstractJob):
                  forever=None,
                  # set to True if not set explicitly here
                  critical=None,
+                 retries=0, retry_on=DEFAULT_RETRY_ON, backoff=1.,
+                 retry_scope='command',
                  **kwds):
         check_arg_type(node, (SshProxy, LocalNode), "SshJob.node")
         self.node = node
         self.keep_connection = keep_connection
-
-        # use command or commands
-        if command is None and commands is None:
-            print("WARNING: SshJob requires either command or commands")
-            commands = [
-                Run("echo misformed SshJob - no commands nor commands")]
-        elif command and commands:
-            print(
-                "WARNING: SshJob created with command and commands"
-                " - keeping the latter only")
-            pass # commands = commands
-        elif command:
-            commands = command
-        else:
-            pass
-
-        # find out what really is meant here
-        if not commands:
-            # cannot tell which case in (1) (2) (3) (4)
-            print("WARNING: SshJob requires a meaningful commands")
-            self.commands = [Run("echo misformed SshJob - empty commands")]
-        elif isinstance(commands, (str, Deferred)):
-            # print("case (4)")
-            self.commands = [Run(commands)]
-        elif isinstance(commands, AbstractCommand):
-            # print("case (2)")
-            self.commands = [commands]
-        elif isinstance(commands, (list, tuple)):
-            # allows to insert None as a command
-            commands = [c for c in commands if c]
-            if not commands:
-                commands = [
-                    Run("echo misformed SshJob"
-                        " - need at least one non-void command")]
-            elif isinstance(commands[0], AbstractCommand):
-                # print("case (1)")
-                # check the list is homogeneous
-                if not all(isinstance(c, AbstractCommand) for c in commands):
-                    print("WARNING: commands must be"
-                          " a list of AbstractCommand objects")
-                self.commands = commands
-            else:
-                # print("case (3)")
-                tokens = commands
-                command_args = (str(t) for t in tokens)
-                self.commands = [Run(*command_args)]
-        else:
-            print("WARNING: SshJob could not make sense of commands")
-            self.commands = [
-                Run("echo misformed SshJob"
-                    " - could not make sense of commands")]
-
-        assert len(self.commands) >= 1
-        assert all(isinstance(c, AbstractCommand) for c in self.commands)
+        if retries < 0:
+            raise ValueError(f"retries must be non-negative, got {retries}")
+        if retry_scope not in ('command', 'job'):
+            raise ValueError(f"retry_scope must be 'command' or 'job',"
+                             f" got {retry_scope!r}")
+        self.retries = retries
+        self.retry_on = tuple(retry_on)
+        self.backoff = backoff
+        self.retry_scope = retry_scope
+        # the retries that have occurred, for repr_result()
+        self._retried = []
+
+        self.commands = _normalize_commands(command, commands)
 
         # assign a back-reference from commands to node
         # for the capture mechanism
@@ -173,6 +247,9 @@ class SshJob(AbstractJob):
 
         # used in repr_result() to show which command has failed
         self._errors = []
+        # see apssh.records
+        self.record = None
+        self._command_records = []
         # propagate the verbose flag on all commands if set
         if verbose is not None:
             for propagate in self.commands:
@@ -199,6 +276,13 @@ class SshJob(AbstractJob):
             that in turn will cause the surrounding scheduler execution to
             abort immediately.
 
+        This happens once all retries - if any - have been attempted,
+        see the ``retries`` parameter.
+
+        When the node, or one of its gateways, has a ``window`` setting,
+        the job first waits for a slot, see
+        :meth:`~apssh.sshproxy.SshProxy.window_slot`.
+
         Returns:
           int: 0 if everything runs fine, the faulty return code otherwise.
 
@@ -208,16 +292,104 @@ class SshJob(AbstractJob):
             raised, which leads the running scheduler to aborting abruptly.
 
         """
+        if isinstance(self.node, SshProxy):
+            async with self.node.window_slot():
+                return await self._co_run_attempts()
+        return await self._co_run_attempts()
+
+    async def _co_run_attempts(self):
+        beg = time.monotonic()
+        reused = self.node.is_connected() \
+            if isinstance(self.node, SshProxy) else None
+        result = None
+        attempt = 0
+        try:
+            while True:
+                try:
+                    result = await self._co_run_commands()
+                    return result
+                except _RetryJob as retry:
+                    attempt += 1
+                    await self._retry_pause(attempt, retry.label, retry.outcome)
+                    # a fresh start
+                    self._errors = []
+                    self._command_records = []
+        finally:
+            self.record = JobRecord(
+                self.node.hostname, result, time.monotonic() - beg, reused,
+                tuple(self._retried), tuple(self._command_records))
+
+    def _deserves_retry(self, command, outcome):
+        if isinstance(outcome, BaseException):
+            return any(isinstance(item, type) and isinstance(outcome, item)
+                       for item in self.retry_on)
+        if outcome == 0 or outcome in command.allowed_exits:
+            return False
+        return any(not isinstance(item, type) and outcome == item
+                   for item in self.retry_on)
+
+    async def _retry_pause(self, attempt, label, outcome):
+        reason = type(outcome).__name__ \
+            if isinstance(outcome, BaseException) else outcome
+        self._retried.append(f"Retry#{attempt}:{label}->{reason}")
+        delay = self.backoff * 2 ** (attempt - 1)
+        self.node.formatter.line(
+            f"{label} failed ({reason}) - retrying in {delay}s\n",
+            asyncssh.EXTENDED_DATA_STDERR, self.node.hostname)
+        await asyncio.sleep(delay)
+
+    async def _co_run_one(self, command, attempts_left):
+        """
+        run one command, and retry it if needed and possible
+
+        Returns:
+          the command's result
+        """
+        beg = time.monotonic()
+        attempt = 0
+        with counting_bytes() as byte_counts:
+            while True:
+                try:
+                    # trigger
+                    if isinstance(self.node, LocalNode):
+                        outcome = await command.co_run_local(self.node)
+                    else:
+                        outcome = await command.co_run_remote(self.node)
+                except Exception as exc:                # pylint: disable=w0703
+                    outcome = exc
+                if attempts_left > 0 and self._deserves_retry(command, outcome):
+                    label = command.get_label_line()
+                    if self.retry_scope == 'job':
+                        raise _RetryJob(label, outcome)
+                    attempt += 1
+                    attempts_left -= 1
+                    await self._retry_pause(attempt, label, outcome)
+                    continue
+                break
+        failed = isinstance(outcome, BaseException)
+        self._command_records.append(CommandRecord(
+            command.get_label_line(),
+            None if failed else outcome,
+            type(outcome).__name__ if failed else None,
+            time.monotonic() - beg,
+            byte_counts.stdout,
+            byte_counts.stderr,
+            attempt + 1))
+        if failed:
+            raise outcome
+        return outcome
+
+    async def _co_run_commands(self):
+        # with the command scope, each command can be retried
+        # that many times; with the job scope, the whole job can
+        attempts_left = self.retries if self.retry_scope == 'command' \
+            else self.retries - len(self._retried)
         # the commands are of course sequential,
         # so we wait for one before we run the next
         overall = 0
         for i, command in enumerate(self.commands, 1):
 
-            # trigger
-            if isinstance(self.node, LocalNode):
-                result = await command.co_run_local(self.node)
-            else:
-                result = await command.co_run_remote(self.node)
+            result = await self._co_run_one(command, attempts_left)
 
             # has the command failed ?
             if result == 0 or result in command.allowed_exits:
@@ -301,6 +473,428 @@ class SshJob(AbstractJob):
     def repr_result(self):                              # pylint: disable=c0111
         if not self.is_running():
             return ""
-        if not self._errors:
-            return "OK"
-        return " - ".join(self._errors)
+        outcome = " - ".join(self._errors) if self._errors else "OK"
+        if self._retried:
+            outcome += " - " + " - ".join(self._retried)
+        return outcome
+
+
+class FanoutJob(AbstractJob):                           # pylint: disable=r0902
+    """
+    A job that runs the same commands on many nodes, much like
+    one :class:`SshJob` per node would, but in a much more compact way,
+    which makes a difference with many thousands of nodes.
+
+    The scheduler sees a single job, and the per-node state - status,
+    result and timings - is kept in flat arrays; the nodes are dealt with
+    by at most ``window`` workers, each of which creates a transient
+    :class:`SshJob` for the node at hand, and closes the node's connection
+    as soon as it is done with it - unless ``keep_connection`` is set.
+
+    The commands are shared between all nodes, so a command with a
+    ``capture`` would see its variable overwritten by each node in turn.
+
+    Parameters:
+      nodes: a collection of :class:`~apssh.nodes.SshNode`
+        or :class:`~apssh.nodes.LocalNode` instances.
+      command: an alias for ``commands``.
+      commands: the commands to run on each node, in any of the forms
+        accepted by :class:`SshJob`.
+      window: how many nodes are dealt with simultaneously;
+        default is 0, i.e. no limit.
+      records: if set, the :class:`~apssh.records.JobRecord` of each node
+        is kept in :attr:`records`, in the same order as ``nodes``,
+        and None for the nodes that have not completed;
+        default is ``False``, so as to keep the memory footprint minimal.
+      keep_connection, verbose, retries, retry_on, backoff, retry_scope:
+        used for each node, see :class:`SshJob`; note that the nodes
+        are run as non-critical jobs, i.e. all the commands are triggered
+        no matter what.
+      forever: passed to AbstractJob_; default is ``False``.
+      critical: passed to AbstractJob_; default is ``True``;
+        in that case, if any node fails, a :class:`CommandFailedError`
+        is raised once all the nodes are done.
+      kwds: passed as-is to AbstractJob_.
+
+    Once the job is done, its result is the number of nodes that
+    have failed; the per-node outcomes are available through
+    :attr:`results` and :attr:`durations`, in the same order as ``nodes``.
+
+    Examples:
+      Run ``uname -a`` on 20,000 nodes, with at most 500 connections
+      at any time::
+
+        nodes = [SshNode(hostname) for hostname in hostnames]
+        fanout = FanoutJob(nodes, command="uname -a", window=500,
+                           critical=False)
+        Scheduler(fanout).run()
+        for node, result in zip(nodes, fanout.results):
+            ...
+    """
+
+    # the values in the status array
+    PENDING, RUNNING, DONE = range(3)
+
+    def __init__(self, nodes, *,                        # pylint: disable=r0913
+                 command=None, commands=None,
+                 window=0, records=False,
+                 keep_connection=False, verbose=None,
+                 retries=0, retry_on=DEFAULT_RETRY_ON, backoff=1.,
+                 retry_scope='command',
+                 forever=None, critical=None,
+                 **kwds):
+        self.nodes = list(nodes)
+        for node in self.nodes:
+            check_arg_type(node, (SshProxy, LocalNode), "FanoutJob.nodes")
+        if window < 0:
+            raise ValueError(f"window must be non-negative, got {window}")
+        self.commands = _normalize_commands(command, commands)
+        self.window = window
+        self.keep_connection = keep_connection
+        self.verbose = verbose
+        self.retry_kwds = dict(retries=retries, retry_on=retry_on,
+                               backoff=backoff, retry_scope=retry_scope)
+        nb_nodes = len(self.nodes)
+        # compact per-node state
+        self.status = bytearray(nb_nodes)
+        self.results = [None] * nb_nodes
+        self.durations = array.array('d', bytes(8 * nb_nodes))
+        # only the nodes that raised an exception show up here
+        self.exceptions = {}
+        self.records = [None] * nb_nodes if records else None
+        forever = forever if forever is not None else False
+        critical = critical if critical is not None else True
+        AbstractJob.__init__(self, forever=forever,
+                             critical=critical, **kwds)
+
+    def _succeeded(self, index):
+        return self.results[index] == 0
+
+    def failed_nodes(self):
+        """
+        Returns:
+          list: the nodes that are done, and have not returned 0
+        """
+        return [node for index, node in enumerate(self.nodes)
+                if self.status[index] == self.DONE
+                and not self._succeeded(index)]
+
+    async def _co_run_node(self, index):
+        node = self.nodes[index]
+        job = SshJob(node, commands=self.commands, critical=False,
+                     keep_connection=True, verbose=self.verbose,
+                     **self.retry_kwds)
+        self.status[index] = self.RUNNING
+        beg = time.monotonic()
+        try:
+            self.results[index] = await job.co_run()
+        except Exception as exc:                        # pylint: disable=w0703
+            self.exceptions[index] = exc
+        self.durations[index] = time.monotonic() - beg
+        if self.records is not None:
+            self.records[index] = job.record
+        self.status[index] = self.DONE
+        if not self.keep_connection:
+            try:
+                await node.close()
+            except Exception:                           # pylint: disable=w0703
+                pass
+
+    async def co_run(self):
+        """
+        Runs the commands on all nodes, with at most ``window``
+        of them at any given time.
+
+        Returns:
+          int: the number of nodes that have failed, so 0 if all went fine
+
+        Raises:
+          CommandFailedError: if the job is ``critical``
+            and at least one node has failed
+        """
+        indexes = iter(range(len(self.nodes)))
+
+        async def worker():
+            for index in indexes:
+                await self._co_run_node(index)
+
+        nb_workers = min(self.window or len(self.nodes), len(self.nodes))
+        await asyncio.gather(*(worker() for _ in range(nb_workers)))
+        failed = len(self.failed_nodes())
+        if failed and self.critical:
+            raise CommandFailedError(
+                f"{failed} nodes out of {len(self.nodes)} have failed")
+        return failed
+
+    async def close(self):
+        """
+        Implemented as part of the AbstractJob_ protocol; closes the
+        connections that are still open, if ``keep_connection`` was set.
+        """
+        if self.keep_connection:
+            await asyncio.gather(*(node.close() for node in self.nodes))
+
+    async def co_shutdown(self):
+        """
+        Implemented as part of the AbstractJob_ protocol; nothing to do
+        as connections are closed as soon as each node is done.
+        """
+
+    def text_label(self):                               # pylint: disable=c0111
+        first_label = self.commands[0].get_label_line()
+        if len(self.commands) > 1:
+            first_label += f".. + {len(self.commands) - 1}"
+        return f"{first_label} on {len(self.nodes)} nodes"
+
+    def graph_label(self):                              # pylint: disable=c0111
+        lines = [f"{self.repr_id()}: fanout on {len(self.nodes)} nodes"]
+        lines += [command.get_label_line() for command in self.commands]
+        return "\n".join(lines)
+
+    def details(self):                                  # pylint: disable=c0111
+        return self.graph_label()
+
+    def repr_result(self):                              # pylint: disable=c0111
+        if not self.is_running():
+            return ""
+        done = self.status.count(self.DONE)
+        failed = len(self.failed_nodes())
+        return f"{done - failed} OK - {failed} failed" \
+               f" - {len(self.nodes) - done} not done"
+
+
+class QuorumJob(AbstractJob):
+    """
+    A job that watches a collection of :class:`SshJob` and :class:`FanoutJob`
+    instances, and that cuts the surrounding scheduler short as soon as
+    ``quorum`` nodes have succeeded, i.e. have returned 0; the jobs that
+    are still running at that point get cancelled.
+
+    This job is critical and runs forever, so that it does not delay
+    the scheduler when the quorum cannot be reached; once the quorum is
+    reached it raises :class:`QuorumReached`, so the scheduler's ``run()``
+    returns ``False``, and :attr:`reached` tells it from a genuine failure.
+
+    Parameters:
+      jobs: the jobs to watch.
+      quorum: how many successful nodes are enough.
+      period: how often, in seconds, the jobs are checked.
+      kwds: passed as-is to AbstractJob_.
+
+    Examples:
+      Stop as soon as 3 nodes out of 10 have answered::
+
+        jobs = [SshJob(node, command="uptime", critical=False)
+                for node in nodes]
+        quorum = QuorumJob(jobs, 3)
+        Scheduler(*jobs, quorum).run()
+        if quorum.reached:
+            ...
+    """
+
+    def __init__(self, jobs, quorum, *, period=0.1, **kwds):
+        self.jobs = list(jobs)
+        for job in self.jobs:
+            check_arg_type(job, (SshJob, FanoutJob), "QuorumJob.jobs")
+        if quorum <= 0:
+            raise ValueError(f"quorum must be positive, got {quorum}")
+        self.quorum = quorum
+        self.period = period
+        self.reached = False
+        kwds.setdefault('label', f"quorum {quorum}")
+        AbstractJob.__init__(self, forever=True, critical=True, **kwds)
+
+    def successes(self):
+        """
+        Returns:
+          int: how many of the watched nodes have succeeded so far
+        """
+        count = 0
+        for job in self.jobs:
+            if isinstance(job, FanoutJob):
+                count += job.results.count(0)
+            elif job.is_done() and not job.raised_exception() \
+                    and job.result() == 0:
+                count += 1
+        return count
+
+    async def co_run(self):
+        """
+        Checks the watched jobs every ``period`` seconds.
+
+        Raises:
+          QuorumReached: once ``quorum`` nodes have succeeded
+        """
+        while self.successes() < self.quorum:
+            await asyncio.sleep(self.period)
+        self.reached = True
+        raise QuorumReached(f"{self.quorum} nodes have succeeded")
+
+    async def co_shutdown(self):
+        """
+        Implemented as part of the AbstractJob_ protocol; nothing to do.
+        """
+
+    def text_label(self):                               # pylint: disable=c0111
+        return f"quorum {self.quorum} out of {len(self.jobs)} jobs"
+
+    def graph_label(self):                              # pylint: disable=c0111
+        return self.text_label()
+
+    def details(self):                                  # pylint: disable=c0111
+        return self.text_label()
+
+
+class ProgressJob(AbstractJob):                         # pylint: disable=r0902
+    """
+    A job that watches a collection of :class:`SshJob` and :class:`FanoutJob`
+    instances, and displays a one-line overview of where they are: how many
+    nodes are pending, running - and among them, connected - succeeded
+    or failed, together with the throughput and the estimated time left.
+
+    The display is redrawn at a fixed rate, from the state that the jobs
+    maintain anyway, so the cost does not depend on the amount of output,
+    nor on the number of events. On a terminal, the line is redrawn in place;
+    otherwise - e.g. when redirected to a file - a plain line is written
+    every ``period`` seconds, so that the file remains readable.
+
+    This job is not critical and runs forever, so it does not delay
+    the scheduler; a last line is written once it gets cancelled.
+
+    Parameters:
+      jobs: the jobs to watch.
+      period: how often, in seconds, the display is refreshed; the default
+        is 0.5s on a terminal, and 10s otherwise.
+      stream: where to write; default is ``sys.stderr``.
+      kwds: passed as-is to AbstractJob_.
+    """
+
+    # how many seconds of history are used to compute the throughput
+    RATE_SPAN = 10.
+
+    def __init__(self, jobs, *, period=None, stream=None, **kwds):
+        self.jobs = list(jobs)
+        for job in self.jobs:
+            check_arg_type(job, (SshJob, FanoutJob), "ProgressJob.jobs")
+        self.stream = stream or sys.stderr
+        self.tty = self.stream.isatty()
+        if period is None:
+            period = 0.5 if self.tty else 10.
+        self.period = period
+        # (time, number of nodes done) samples, for the throughput
+        self._samples = deque()
+        self._started = None
+        kwds.setdefault('label', "progress")
+        AbstractJob.__init__(self, forever=True, critical=False, **kwds)
+
+    def counters(self):
+        """
+        Returns:
+          dict: the number of watched nodes that are ``pending``,
+          ``running``, ``connected`` - a subset of running -
+          ``succeeded`` and ``failed``, plus the ``total``
+        """
+        counts = dict.fromkeys(
+            ('total', 'pending', 'running', 'connected',
+             'succeeded', 'failed'), 0)
+        for job in self.jobs:
+            if isinstance(job, FanoutJob):
+                self._count_fanout(job, counts)
+                continue
+            counts['total'] += 1
+            if job.is_done():
+                ok = not job.raised_exception() and job.result() == 0
+                counts['succeeded' if ok else 'failed'] += 1
+            elif job.is_running():
+                counts['running'] += 1
+                counts['connected'] += self._is_connected(job.node)
+            else:
+                counts['pending'] += 1
+        return counts
+
+    @staticmethod
+    def _is_connected(node):
+        return not isinstance(node, SshProxy) or node.is_connected()
+
+    def _count_fanout(self, fanout, counts):
+        # the status array is a bytearray, and results a list,
+        # so all this is done at C speed
+        status = fanout.status
+        counts['total'] += len(status)
+        counts['pending'] += status.count(FanoutJob.PENDING)
+        running = status.count(FanoutJob.RUNNING)
+        counts['running'] += running
+        succeeded = fanout.results.count(0)
+        counts['succeeded'] += succeeded
+        counts['failed'] += status.count(FanoutJob.DONE) - succeeded
+        index = status.find(FanoutJob.RUNNING)
+        while index >= 0:
+            counts['connected'] += self._is_connected(fanout.nodes[index])
+            index = status.find(FanoutJob.RUNNING, index + 1)
+
+    def text(self):
+        """
+        Returns:
+          str: the overview line, without a newline
+        """
+        now = time.monotonic()
+        counts = self.counters()
+        done = counts['succeeded'] + counts['failed']
+        self._samples.append((now, done))
+        while now - self._samples[0][0] > self.RATE_SPAN:
+            self._samples.popleft()
+        then, done_then = self._samples[0]
+        rate = (done - done_then) / (now - then) if now > then else 0.
+        left = counts['total'] - done
+        if not left:
+            eta = "done"
+        elif rate:
+            eta = f"ETA {left / rate:.0f}s"
+        else:
+            eta = "ETA ?"
+        elapsed = now - (self._started or now)
+        return (f"{done}/{counts['total']} done"
+                f" ({counts['succeeded']} ok, {counts['failed']} failed)"
+                f" - {counts['running']} running"
+                f" ({counts['connected']} connected)"
+                f" - {counts['pending']} pending"
+                f" - {rate:.1f}/s - {elapsed:.0f}s - {eta}")
+
+    def display(self, last=False):
+        """
+        Writes the overview line on the stream
+        """
+        if self.tty:
+            # back to the beginning of the line, and clear what remains
+            self.stream.write(f"\r{self.text()}\x1b[K")
+            if last:
+                self.stream.write("\n")
+        else:
+            self.stream.write(f"{self.text()}\n")
+        self.stream.flush()
+
+    async def co_run(self):
+        """
+        Refreshes the display every ``period`` seconds.
+        """
+        self._started = time.monotonic()
+        try:
+            while True:
+                self.display()
+                await asyncio.sleep(self.period)
+        finally:
+            self.display(last=True)
+
+    async def co_shutdown(self):
+        """
+        Implemented as part of the AbstractJob_ protocol; nothing to do.
+        """
+
+    def text_label(self):                               # pylint: disable=c0111
+        return f"progress of {len(self.jobs)} jobs"
+
+    def graph_label(self):                              # pylint: disable=c0111
+        return self.text_label()
+
+    def details(self):                                  # pylint: disable=c0111
+        return self.text_label()
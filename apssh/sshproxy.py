@@ -7,97 +7,143 @@ The SshProxy class models an ssh connection, and is mainly in charge
 """
 
 import asyncio
+import collections
+import contextlib
+import posixpath
+import secrets
+import shlex
+from pathlib import Path, PurePath
+from subprocess import PIPE, DEVNULL
 
 import asyncssh
 
-from .util import print_stderr, check_arg_type
+from .util import print_stderr, check_arg_type, LineSplitter
+from .stdin import stdin_chunks
 # a dummy formatter
 from .formatters import HostFormatter
+from .records import current_byte_counts
+# the outcome of a command that did not complete within its timeout
+from .config import COMMAND_TIMEOUT
+
+# once the timeout has expired, how long to wait for the command
+# to terminate after we have sent it a signal
+COMMAND_TIMEOUT_GRACE = 2
+
+
+def _tar_operand(name):
+    """
+    a file name as passed to tar: a name that starts with a dash is made
+    relative, so it is not taken for an option; '--' cannot be used here,
+    as the operands are interleaved with -C options
+    """
+    return f"./{name}" if name.startswith("-") else name
 
 
 class _LineBasedSession(asyncssh.SSHClientSession):
     """
     A session that records both outputs (out and err)
     in its internal attributes.
-    It also may have an associated formatter (through its proxy reference)
-    and in that case the formatter receives a line() call
-    each time a line is received.
+    It also has an associated formatter - by default the one
+    attached to its proxy, unless one is specified for that session only -
+    and the formatter receives a line() call each time a line is received.
     """
 
     ##########
-    class Channel:
+    class Channel(LineSplitter):
         """
-        typically a session will have one Channel for stdout and one for stderr
-
-        aggregates text as it comes in
-        .buffer: gathers the full contents
-        .line: the current line
+        typically a session will have one Channel for stdout and one for stderr;
+        the session runs in binary mode, and lines are reassembled
+        and decoded by :class:`~apssh.util.LineSplitter`
         """
 
-        def __init__(self, name, proxy):
+        def __init__(self, name, proxy, sink):
+            super().__init__(sink)
             self.name = name
             self.proxy = proxy
-            # buffering
-            self.buffer = ""
-            self.line = ""
 
         # pylint: disable=c0111
-        def data_received(self, data, datatype):
-            # preserve it before any postprocessing occurs
-            self.buffer += data
+        def text_received(self, text, datatype):
             # not adding a \n since it's already in there
             if self.proxy.debug:
                 print_stderr(
-                    f'BS {self.proxy.hostname} DR: -> {data} [[of type {self.name}]]')
-            chunks = list(data.split("\n"))
-            # len(chunks) cannot be 0
-            assert chunks, "unexpected data received"
-            # what goes in the current line, if any
-            current_line = chunks.pop(0)
-            self.line += current_line
-            for chunk in chunks:
-                # restore the \n that we removed by calling split
-                self.flush(datatype, newline=True)
-                self.line = chunk
-
-        def flush(self, datatype, newline):
-            # add newline to current line f requested
-            if newline:
-                self.line += "\n"
-            # actually write line, if there's anything to write
-            # (EOF calls flush too)
-            if self.line:
-                self.proxy.formatter.line(self.line, datatype,
-                                          self.proxy.hostname)
-                self.line = ""
+                    f'BS {self.proxy.hostname} DR: -> {text} [[of type {self.name}]]')
 
     ##########
-    def __init__(self, proxy, command, *args, **kwds):
+    def __init__(self, proxy, command, *args, formatter=None, **kwds):
         # self.proxy is expected to be set already by the closure/subclass
         self.proxy = proxy
         self.command = command
-        self.stdout = self.Channel("stdout", proxy)
-        self.stderr = self.Channel("stderr", proxy)
+        self.formatter = formatter or proxy.formatter
+        self.stdout = self.Channel("stdout", proxy, self.line_received)
+        self.stderr = self.Channel("stderr", proxy, self.line_received)
         self._exit = None
+        self._chan = None
+        # for flow control when writing on stdin
+        self._writable = asyncio.Event()
+        self._writable.set()
+        # the bytes received by this command only, if it is being recorded
+        self.byte_counts = current_byte_counts()
         super().__init__(*args, **kwds)
 
+    def line_received(self, line, datatype):
+        """
+        Called for each complete line; default is to send it to the formatter
+        """
+        self.formatter.line(line, datatype, self.proxy.hostname)
+
     # this seems right only for text streams...
     def data_received(self, data, datatype):
-        channel = self.stderr if datatype == asyncssh.EXTENDED_DATA_STDERR \
-            else self.stdout
-        channel.data_received(data, datatype)
-
-    def connection_made(self, chan):               # pylint:disable=w0221,w0613
-        self.proxy.formatter.session_start(self.proxy.hostname, self.command)
+        stderr = datatype == asyncssh.EXTENDED_DATA_STDERR
+        if self.byte_counts is not None:
+            self.byte_counts.count(len(data), stderr)
+        if stderr:
+            self.proxy.stderr_bytes += len(data)
+            self.stderr.data_received(data, datatype)
+        else:
+            self.proxy.stdout_bytes += len(data)
+            self.stdout.data_received(data, datatype)
+
+    def connection_made(self, chan):               # pylint:disable=w0221
+        self._chan = chan
+        self.formatter.session_start(self.proxy.hostname, self.command)
 
     def connection_lost(self, exc):
-        self.proxy.formatter.session_stop(self.proxy.hostname, self.command)
+        # in case the channel gets closed without an EOF;
+        # this is a no-op if eof_received has already been called
+        self.stdout.eof(None)
+        self.stderr.eof(asyncssh.EXTENDED_DATA_STDERR)
+        self.formatter.session_stop(self.proxy.hostname, self.command)
 
     def eof_received(self):
-        self.stdout.flush(None, newline=False)
-        self.stderr.flush(asyncssh.EXTENDED_DATA_STDERR, newline=False)
+        self.stdout.eof(None)
+        self.stderr.eof(asyncssh.EXTENDED_DATA_STDERR)
         self.proxy.debug_line("EOF")
 
+    def pause_writing(self):
+        self._writable.clear()
+
+    def resume_writing(self):
+        self._writable.set()
+
+    async def feed_stdin(self, chunks):
+        """
+        Write chunks - as returned by :func:`~apssh.stdin.stdin_chunks` -
+        into the channel, honouring ssh flow control, and then send EOF;
+        if the source fails midway, the channel is closed rather than
+        having the remote command take a truncated input for a complete one
+        """
+        try:
+            async for chunk in chunks:
+                await self._writable.wait()
+                self._chan.write(chunk)
+            self._chan.write_eof()
+        except (BrokenPipeError, ConnectionResetError):
+            # the remote process does not read anymore
+            self.proxy.debug_line("stdin: remote end is gone")
+        except Exception:
+            self._chan.close()
+            raise
+
     def exit_status_received(self, status):
         self._exit = status
         self.proxy.debug_line(f"STATUS = {status}\n")
@@ -110,6 +156,261 @@ class _LineBasedSession(asyncssh.SSHClientSession):
         self._exit = signal
         self.proxy.debug_line(f"SIGNAL = {signal}--{msg}\n")
 
+
+class _StreamSession(_LineBasedSession):
+    """
+    A session whose lines are queued into a :class:`RemoteLineStream`
+    instead of being sent to the formatter
+    """
+
+    def __init__(self, proxy, command, stream, *args, **kwds):
+        self.stream = stream
+        super().__init__(proxy, command, *args, **kwds)
+
+    def connection_made(self, chan):               # pylint:disable=w0221
+        super().connection_made(chan)
+        self.stream._chan = chan                    # pylint: disable=w0212
+
+    def line_received(self, line, datatype):
+        if datatype == asyncssh.EXTENDED_DATA_STDERR and not self.stream.stderr:
+            super().line_received(line, datatype)
+        else:
+            self.stream._push(line)                 # pylint: disable=w0212
+
+    def connection_lost(self, exc):
+        # this flushes any pending partial line
+        super().connection_lost(exc)
+        self.stream._push(None)                     # pylint: disable=w0212
+
+
+class _ShellSession(_LineBasedSession):
+    """
+    The session for a long-lived remote shell, see ``persistent_shell``
+    in :class:`SshProxy`; commands are written, one at a time, on the
+    shell's stdin, each followed with a unique marker on both outputs,
+    that tells the end of the command and carries its exit status.
+
+    This relies on POSIX syntax, so it is /bin/sh that gets started,
+    and not the user's login shell, that could be e.g. fish or tcsh.
+    """
+
+    SHELL_COMMAND = 'exec /bin/sh'
+
+    def __init__(self, proxy, *args, **kwds):
+        super().__init__(proxy, self.SHELL_COMMAND, *args, **kwds)
+        # the command currently running
+        self.command = None
+        self.marker = None
+        self.status = None
+        self.stderr_done = False
+        self.done = None
+
+    def connection_made(self, chan):               # pylint:disable=w0221
+        # no session_start here, it is sent for each command
+        self._chan = chan
+
+    def submit(self, command, formatter=None):
+        """
+        Send a command to the shell; formatter, if set,
+        is used for this command only
+
+        Returns:
+          a future that receives the command's exit status,
+          or None if the shell goes away in the meanwhile
+        """
+        self.formatter = formatter or self.proxy.formatter
+        # the shell outlives the commands, that are counted separately
+        self.byte_counts = current_byte_counts()
+        self.formatter.session_start(self.proxy.hostname, command)
+        # the subshell isolates the shell from e.g. exit or cd, and eval
+        # makes sure a syntax error is the command's problem, not ours
+        return self._send(command,
+                          f"( eval {shlex.quote(command)} ) </dev/null")
+
+    def handshake(self):
+        """
+        Send a no-op to the shell, to check that it answers
+        before any command gets sent
+
+        Returns:
+          a future like with :meth:`submit`, that receives 0
+        """
+        self.formatter = self.proxy.formatter
+        self.byte_counts = None
+        return self._send(None, ":")
+
+    def _send(self, command, shell_line):
+        self.command = command
+        self.marker = f"__apssh_{secrets.token_hex(8)}__"
+        self.status = None
+        self.stderr_done = False
+        self.done = asyncio.get_running_loop().create_future()
+        self._chan.write(
+            f"{shell_line}; "
+            f"printf '%s %d\\n' {self.marker} $?; "
+            f"printf '%s\\n' {self.marker} >&2\n".encode())
+        return self.done
+
+    def line_received(self, line, datatype):
+        index = -1 if self.marker is None else line.find(self.marker)
+        if index < 0:
+            super().line_received(line, datatype)
+            return
+        # the output may not end with a newline
+        if index > 0:
+            super().line_received(line[:index], datatype)
+        if datatype == asyncssh.EXTENDED_DATA_STDERR:
+            self.stderr_done = True
+        else:
+            self.status = int(line[index+len(self.marker):])
+        if self.status is not None and self.stderr_done:
+            self._command_done(self.status)
+
+    def _command_done(self, status):
+        if self.command is not None:
+            self.formatter.session_stop(self.proxy.hostname, self.command)
+        self.formatter = self.proxy.formatter
+        self.marker = None
+        if not self.done.done():
+            self.done.set_result(status)
+
+    def connection_lost(self, exc):
+        self.stdout.eof(None)
+        self.stderr.eof(asyncssh.EXTENDED_DATA_STDERR)
+        if self.marker is not None:
+            self._command_done(None)
+
+
+class RemoteLineStream:                                 # pylint: disable=r0902
+    """
+    An async iterator over the output lines of a remote command,
+    as returned by :meth:`SshProxy.stream`; lines come with their
+    trailing newline, if any.
+
+    At most ``maxlines`` lines are buffered; once that
+    many lines are pending, reading from the ssh channel gets
+    paused until the consumer has caught up with half of them,
+    so that the remote output gets throttled by ssh flow control,
+    and memory usage remains bounded - by ``maxlines`` plus the
+    contents of one ssh packet.
+
+    Once the iteration is over, the ``exit_status`` attribute
+    holds the remote command exit status - or the signal name
+    if it was killed by a signal.
+
+    When the iteration is abandoned midway, the channel remains open
+    until :meth:`aclose` is called, which can be achieved by using
+    the object as an asynchronous context manager::
+
+      async with node.stream("journalctl -f") as lines:
+          async for line in lines:
+              if "error" in line:
+                  break
+    """
+
+    def __init__(self, proxy, command, *,
+                 maxlines=1000, stderr=False, stdin=None):
+        if maxlines < 1:
+            raise ValueError(f"maxlines must be positive, got {maxlines}")
+        self.proxy = proxy
+        self.command = command
+        self.maxlines = maxlines
+        self.stderr = stderr
+        self.stdin = stdin
+        self.exit_status = None
+        self._lines = collections.deque()
+        self._available = asyncio.Event()
+        self._chan = None
+        self._session = None
+        self._feeder = None
+        self._paused = False
+        self._started = False
+        self._finished = False
+
+    def __repr__(self):
+        return f"<RemoteLineStream {self.command} on {self.proxy}>"
+
+    def _push(self, line):
+        # None is the end marker
+        self._lines.append(line)
+        self._available.set()
+        if (line is not None and not self._paused
+                and len(self._lines) >= self.maxlines):
+            self._chan.pause_reading()
+            self._paused = True
+
+    async def _start(self):
+        self._started = True
+        await self.proxy.connect_lazy()
+        proxy, command, stream = self.proxy, self.command, self
+
+        # pylint: disable=c0111
+        class SessionClosure(_StreamSession):
+            def __init__(session_self, *args, **kwds):  # pylint: disable=e0213
+                _StreamSession.__init__(
+                    session_self, proxy, command, stream, *args, **kwds)
+
+        chunks = None if self.stdin is None else stdin_chunks(self.stdin)
+        _, self._session = \
+            await asyncio.wait_for(
+                proxy.conn.create_session(SessionClosure, command,
+                                          encoding=None),
+                timeout=proxy.timeout)
+        if chunks is not None:
+            self._feeder = asyncio.ensure_future(
+                self._session.feed_stdin(chunks))
+
+    async def _finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        if self._chan is None:
+            return
+        await self._chan.wait_closed()
+        if self._feeder is not None:
+            if not self._feeder.done():
+                self._feeder.cancel()
+            try:
+                await self._feeder
+            except asyncio.CancelledError:
+                pass
+        self.exit_status = self._session._exit      # pylint: disable=w0212
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._started:
+            await self._start()
+        while not self._lines:
+            self._available.clear()
+            await self._available.wait()
+        # leave the end marker in place, in case we get called again
+        if self._lines[0] is None:
+            await self._finish()
+            raise StopAsyncIteration
+        line = self._lines.popleft()
+        if self._paused and len(self._lines) <= self.maxlines // 2:
+            self._paused = False
+            self._chan.resume_reading()
+        return line
+
+    async def aclose(self):
+        """
+        Closes the channel if the command is still running,
+        and waits for it to terminate
+        """
+        if self._chan is not None and not self._finished:
+            self._chan.close()
+        await self._finish()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+
 # _VerboseClient is created through factories attached to each proxy
 
 class _VerboseClient(asyncssh.SSHClient):
@@ -166,6 +467,23 @@ class SshProxy:                                         # pylint: disable=r0902
         negociation. `Permission denied` messages and similar won't show up
         unless verbose is set.
 
+      persistent_shell: if set, :meth:`run` sends commands to a long-lived
+        remote shell, instead of opening a new session each time;
+        this saves the cost of spawning a login shell on the remote end,
+        which pays off for jobs that run many short commands in sequence;
+        the commands are then interpreted by ``/bin/sh``, whatever the
+        remote user's login shell. See :meth:`run` for details.
+
+      window: if set, at most that many jobs can use this node
+        simultaneously, either directly or as a gateway to other nodes;
+        this is useful for protecting a gateway that can only sustain
+        a limited number of tunnels, without limiting the jobs that
+        go elsewhere; see :meth:`window_slot`.
+
+      connect_window: an :class:`~apssh.adaptive.AdaptiveWindow` instance,
+        typically shared by many nodes, that limits how many of them
+        can be establishing their connection at the same time.
+
     """
 
     def __init__(self, hostname, *, username=None,
@@ -174,7 +492,8 @@ class SshProxy:                                         # pylint: disable=r0902
                  keys=None,     # this class has no smart way to guess for keys
                  known_hosts=None, port=22,
                  formatter=None, verbose=None,
-                 debug=False, timeout=30):
+                 debug=False, timeout=30, persistent_shell=False,
+                 window=None, connect_window=None):
         # early type verifications
         check_arg_type(hostname, str, "SshProxy.hostname")
         self.hostname = hostname
@@ -198,9 +517,50 @@ class SshProxy:                                         # pylint: disable=r0902
         #
         self.conn, self.sftp_client = None, None
         self.client = None
+        # bytes received so far, on all sessions
+        self.stdout_bytes, self.stderr_bytes = 0, 0
+        self.persistent_shell = persistent_shell
+        self._shell = None
+        if window is not None and window <= 0:
+            raise ValueError(f"SshProxy: window must be positive, got {window}")
+        self.window = window
+        # the semaphore is bound to an event loop, so we keep track of it
+        self._window_loop, self._window_semaphore = None, None
+        self.connect_window = connect_window
         # critical sections require mutual exclusions
         self._connect_lock = asyncio.Lock()
         self._disconnect_lock = asyncio.Lock()
+        self._shell_lock = asyncio.Lock()
+
+    @contextlib.asynccontextmanager
+    async def window_slot(self):
+        """
+        An asynchronous context manager that waits until this node,
+        and all the gateways on the way to it, are within their ``window``,
+        and holds the corresponding slots until exiting;
+        :class:`~apssh.sshjob.SshJob` uses it around its commands::
+
+          async with node.window_slot():
+              await node.run("hostname")
+        """
+        hops = []
+        proxy = self
+        while proxy is not None:
+            hops.append(proxy)
+            proxy = proxy.gateway
+        async with contextlib.AsyncExitStack() as stack:
+            # always outermost first, so that jobs can't deadlock
+            for hop in reversed(hops):
+                if hop.window:
+                    await stack.enter_async_context(hop._get_window_semaphore())
+            yield
+
+    def _get_window_semaphore(self):
+        loop = asyncio.get_running_loop()
+        if self._window_loop is not loop:
+            self._window_loop = loop
+            self._window_semaphore = asyncio.Semaphore(self.window)
+        return self._window_semaphore
 
     # make this an asynchroneous context manager
     # async with SshProxy(...) as ssh:
@@ -258,22 +618,43 @@ class SshProxy:                                         # pylint: disable=r0902
         """
         Connects if needed - uses a lock to make it safe for several coroutines
         to simultaneously try to run commands on the same SshProxy instance.
+        A connection that was lost in the meanwhile gets re-created.
 
         Returns:
           connection object
         """
         async with self._connect_lock:
+            self._forget_lost_connection()
             if self.conn is None:
                 await self._connect()
         return self.conn
 
+    def _forget_lost_connection(self):
+        """
+        If the connection has gone away, e.g. reset by the remote end,
+        drop it together with what depends on it,
+        so that it gets re-created when needed
+        """
+        if self.conn is not None and self.conn.is_closed():
+            self.debug_line("connection lost - forgetting it")
+            self.conn = None
+            self.sftp_client = None
+            self._shell = None
+
     async def _connect(self):
         """
         Unconditionnaly attemps to connect and raise an exception otherwise
         """
         if self.gateway:
-            return await self._connect_tunnel()
-        return await self._connect_direct()
+            # before taking a slot in connect_window, as the gateway
+            # may need one as well
+            await self.gateway.connect_lazy()
+        connect = self._connect_tunnel if self.gateway \
+            else self._connect_direct
+        if self.connect_window is None:
+            return await connect()
+        async with self.connect_window.attempt():
+            return await connect()
 
     async def _connect_direct(self):
         """
@@ -391,6 +772,8 @@ class SshProxy:                                         # pylint: disable=r0902
         if self.conn is not None:
             preserve = self.conn
             self.conn = None
+            # the shell goes away with the connection
+            self._shell = None
             try:
                 preserve.close()
             # xxx harsh here too
@@ -416,21 +799,48 @@ class SshProxy:                                         # pylint: disable=r0902
             await self._close_ssh()
 
     ##############################
-    async def run(self, command, **x11_kwds):
+    async def run(self, command, *, stdin=None, timeout=None, formatter=None,
+                  **x11_kwds):
         """
         Run a command, and write its output on the fly
         according to instance's formatter.
 
         Parameters:
           command: remote command to run
+          stdin: if set, the contents to write on the command's standard
+            input, see :mod:`apssh.stdin` for the supported sources;
+            default is to send nothing, not even EOF
+          timeout: if set, the maximal duration in seconds for the command;
+            when it expires the remote process is sent a ``TERM`` signal,
+            and the channel gets closed if the process is still there
+            after ``COMMAND_TIMEOUT_GRACE`` seconds
+          formatter: if set, the formatter to use for this command only,
+            instead of the proxy's; this is how e.g. a command's output
+            gets captured, without interfering with other commands that
+            run at the same time on the same proxy
           x11_kwds: optional keyword args that will be passed
             to create_session, like typically ``x11_forwarding=True``
 
         Returns:
-          remote command exit status - or None if nothing could be run at all
-
+          remote command exit status - or None if nothing could be run at all,
+          or ``COMMAND_TIMEOUT`` if the command did not complete in time
+
+        With ``persistent_shell`` set, the command is sent to the proxy's
+        long-lived shell if that one is idle, and if neither ``stdin``
+        nor X11 forwarding are required; in that case the command
+        runs in a subshell, with its stdin redirected from ``/dev/null``;
+        it is considered complete once both its outputs are done,
+        even if it has left background processes behind, and a command
+        killed by a signal shows up as a regular exit status above 128.
+        When the timeout expires, the whole shell gets closed, and a new
+        one is created for the next command.
         """
 
+        if (self.persistent_shell and stdin is None
+                and not any(x11_kwds.values())
+                and not self._shell_lock.locked()):
+            return await self._run_in_shell(command, timeout, formatter)
+
         # pylint: disable=c0111
         # this closure is a _LineBasedSession
         # with a .proxy attribute that points back here
@@ -438,15 +848,135 @@ class SshProxy:                                         # pylint: disable=r0902
             # not using 'self' because 'self' is the SshProxy instance already
             def __init__(session_self, *args, **kwds):  # pylint: disable=e0213
                 _LineBasedSession.__init__(
-                    session_self, self, command, *args, **kwds)
+                    session_self, self, command, *args,
+                    formatter=formatter, **kwds)
 
+        # a broken source is reported before the command starts
+        chunks = None if stdin is None else stdin_chunks(stdin)
         chan, session = \
             await asyncio.wait_for(
-                self.conn.create_session(SessionClosure, command, **x11_kwds),
+                self.conn.create_session(SessionClosure, command,
+                                         encoding=None, **x11_kwds),
                 timeout=self.timeout)
-        await chan.wait_closed()
+        feeder = None if chunks is None \
+            else asyncio.ensure_future(session.feed_stdin(chunks))
+        timed_out = False
+        try:
+            await asyncio.wait_for(chan.wait_closed(), timeout=timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            await self._terminate(chan, command, timeout, session.formatter)
+        if feeder is not None:
+            if not feeder.done():
+                # the command has exited without reading all its input
+                feeder.cancel()
+            try:
+                await feeder
+            except asyncio.CancelledError:
+                pass
+        if timed_out:
+            return COMMAND_TIMEOUT
         return session._exit                          # pylint: disable=w0212
 
+    async def _run_in_shell(self, command, timeout, formatter):
+        """
+        Run a command in the persistent shell, that gets created if needed
+        """
+        async with self._shell_lock:
+            if self._shell is None:
+                proxy = self
+
+                # pylint: disable=c0111
+                class ShellClosure(_ShellSession):
+                    def __init__(session_self, *args, **kwds):  # pylint: disable=e0213
+                        _ShellSession.__init__(session_self, proxy,
+                                               *args, **kwds)
+
+                _, shell = \
+                    await asyncio.wait_for(
+                        self.conn.create_session(
+                            ShellClosure, ShellClosure.SHELL_COMMAND,
+                            encoding=None),
+                        timeout=self.timeout)
+                # a shell that does not answer would hang all commands
+                try:
+                    status = await asyncio.wait_for(shell.handshake(),
+                                                    timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    status = None
+                if status != 0:
+                    shell._chan.close()             # pylint: disable=w0212
+                    await shell._chan.wait_closed() # pylint: disable=w0212
+                    raise ConnectionError(
+                        f"{self}: the persistent shell does not answer")
+                self._shell = shell
+            shell = self._shell
+            try:
+                status = await asyncio.wait_for(
+                    asyncio.shield(shell.submit(command, formatter)),
+                    timeout=timeout)
+            except asyncio.TimeoutError:
+                shell.formatter.line(
+                    f"command timed out after {timeout}s"
+                    f" - closing shell: {command}\n",
+                    asyncssh.EXTENDED_DATA_STDERR, self.hostname)
+                self._shell = None
+                shell._chan.close()                 # pylint: disable=w0212
+                await shell._chan.wait_closed()     # pylint: disable=w0212
+                return COMMAND_TIMEOUT
+            if status is None:
+                # the shell is gone, let the next command create a new one
+                self._shell = None
+            return status
+
+    async def _terminate(self, chan, command, timeout, formatter):
+        """
+        Get rid of a command that has not completed in time
+        """
+        formatter.line(
+            f"command timed out after {timeout}s - terminating: {command}\n",
+            asyncssh.EXTENDED_DATA_STDERR, self.hostname)
+        try:
+            chan.send_signal("TERM")
+            await asyncio.wait_for(chan.wait_closed(),
+                                   timeout=COMMAND_TIMEOUT_GRACE)
+            return
+        except asyncio.TimeoutError:
+            # signals are not honoured by all ssh servers
+            self.debug_line("TERM signal ignored, closing channel")
+        except (OSError, asyncssh.Error) as exc:
+            self.debug_line(f"could not send TERM signal - {exc}")
+        chan.close()
+        try:
+            await asyncio.wait_for(chan.wait_closed(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.debug_line("channel would not close")
+
+    def stream(self, command, *, maxlines=1000, stderr=False, stdin=None):
+        """
+        Run a command, and iterate over its output lines
+        instead of sending them to the formatter::
+
+          async for line in node.stream("journalctl -f"):
+              ...
+
+        The connection is established lazily if needed.
+
+        Parameters:
+          command: remote command to run
+          maxlines: the maximal number of lines that can be pending,
+            beyond which the remote command gets throttled
+          stderr: if set, stderr lines are merged in the stream;
+            default is to send them to the formatter as usual
+          stdin: same as in :meth:`run`
+
+        Returns:
+          RemoteLineStream: an async iterator; when the iteration is over,
+          its ``exit_status`` attribute holds the command's exit status
+        """
+        return RemoteLineStream(self, command, maxlines=maxlines,
+                                stderr=stderr, stdin=stdin)
+
     async def mkdir(self, remotedir):
         """
         Create a remote directory if needed.
@@ -478,8 +1008,34 @@ class SshProxy:                                         # pylint: disable=r0902
                 f"Could not create {remotedir} on {self}\n{exc}")
             raise exc
 
+    async def _sftp_transfer(self, method, sources, destination,
+                             parallel, kwds, isdir):
+        """
+        Run one of the SFTP client's ``get`` or ``put`` methods on sources;
+        when ``parallel`` is set and sources is a collection, the sources
+        are transferred individually, with at most ``parallel`` of them
+        in flight at any given time on our single SFTP channel.
+
+        ``isdir`` is a coroutine that tells if destination is a directory,
+        on the receiving side; like with a single call, several sources
+        can only go into a directory.
+        """
+        if (isinstance(sources, (str, bytes, PurePath))
+                or not parallel or parallel <= 1 or len(sources) <= 1):
+            return await method(sources, destination, **kwds)
+        if destination is not None and not await isdir(destination):
+            raise asyncssh.sftp.SFTPFailure(
+                f"{destination} must be a directory")
+        semaphore = asyncio.Semaphore(parallel)
+
+        async def transfer_one(source):
+            async with semaphore:
+                await method(source, destination, **kwds)
+        await asyncio.gather(*(transfer_one(source) for source in sources))
+
     # shows up first in doc
-    async def get_file_s(self, remotepaths, localpath, **kwds):
+    async def get_file_s(self, remotepaths, localpath, *,
+                         parallel=None, **kwds):
         """
         Retrieve a collection of remote files locally into the same directory.
         The ssh connection and SFTP subsystem are created and set up if needed.
@@ -487,10 +1043,15 @@ class SshProxy:                                         # pylint: disable=r0902
         Parameters:
           remotepaths(list): remote files to retrieve
           localpath: where to store them
+          parallel(int): if set, how many files can be transferred
+            simultaneously over the SFTP channel; default is to
+            transfer them one after the other
           kwds: passed along to the underlying asyncssh's sftp client,
             typically: ``preserve``, ``recurse`` and ``follow_symlinks``
             are honored like in
             http://asyncssh.readthedocs.io/en/latest/api.html#asyncssh.SFTPClient.get
+            and so are ``block_size`` and ``max_requests``, that let you
+            tune the size and number of outstanding read requests
 
         Returns:
           True if all went well, or raise exception
@@ -499,7 +1060,11 @@ class SshProxy:                                         # pylint: disable=r0902
         try:
             self.debug_line(
                 f"doing SFTP get with {remotepaths} -> {localpath}")
-            await self.sftp_client.get(remotepaths, localpath, **kwds)
+            async def local_isdir(path):
+                return Path(path).is_dir()
+            await self._sftp_transfer(self.sftp_client.get,
+                                      remotepaths, localpath, parallel, kwds,
+                                      local_isdir)
         except asyncssh.sftp.SFTPError as exc:
             self.debug_line(
                 f"Could not SFTP GET remotes {remotepaths} to local {localpath}"
@@ -507,7 +1072,8 @@ class SshProxy:                                         # pylint: disable=r0902
             raise exc
         return True
 
-    async def put_file_s(self, localpaths, remotepath, **kwds):
+    async def put_file_s(self, localpaths, remotepath, *,
+                         parallel=None, **kwds):
 
         """
         Copy a collection of local files remotely into the same directory.
@@ -516,10 +1082,15 @@ class SshProxy:                                         # pylint: disable=r0902
         Parameters:
           localpaths (list): files to copy
           remotepath (str): where to copy
+          parallel(int): if set, how many files can be transferred
+            simultaneously over the SFTP channel; default is to
+            transfer them one after the other
           kwds: passed along to the underlying asyncssh's sftp client,
             typically: ``preserve``, ``recurse`` and ``follow_symlinks``
             are honored like in
             http://asyncssh.readthedocs.io/en/latest/api.html#asyncssh.SFTPClient.put
+            and so are ``block_size`` and ``max_requests``, that let you
+            tune the size and number of outstanding write requests
 
         Returns:
           True if all went well, or raise exception
@@ -528,7 +1099,9 @@ class SshProxy:                                         # pylint: disable=r0902
         try:
             self.debug_line(
                 f"doing SFTP put with {localpaths} -> {remotepath}")
-            await self.sftp_client.put(localpaths, remotepath, **kwds)
+            await self._sftp_transfer(self.sftp_client.put,
+                                      localpaths, remotepath, parallel, kwds,
+                                      self.sftp_client.isdir)
         except asyncssh.sftp.SFTPError as exc:
             self.debug_line(
                 f"Could not SFTP PUT local {localpaths} to remote {remotepath}"
@@ -536,6 +1109,157 @@ class SshProxy:                                         # pylint: disable=r0902
             raise exc
         return True
 
+    # the size of the chunks when streaming data through a channel
+    STREAM_CHUNK = 256 * 1024
+
+    @classmethod
+    async def _stream_between(cls, reader, writer):
+        """
+        Forward everything from reader to writer, honouring the writer's
+        flow control, and send EOF at the end.
+
+        Returns:
+          bool: False if the writer went away before the end
+        """
+        try:
+            while True:
+                data = await reader.read(cls.STREAM_CHUNK)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+            writer.write_eof()
+            return True
+        except (BrokenPipeError, ConnectionResetError):
+            return False
+
+    async def _forward_stderr(self, reader):
+        """
+        Send the lines found in a (bytes) stream onto our formatter
+        """
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            self.formatter.line(line.decode(errors='replace'),
+                                asyncssh.EXTENDED_DATA_STDERR, self.hostname)
+
+    @staticmethod
+    def _process_exit(process):
+        """
+        The exit status of a SSHClientProcess, or its signal name;
+        this is consistent with what run() returns
+        """
+        if process.exit_status is not None:
+            return process.exit_status
+        if process.exit_signal:
+            return process.exit_signal[0]
+        return None
+
+    async def _tar_transfer(self, local_argv, remote_command, push):
+        """
+        Run a local and a remote tar process, and stream
+        the output of one into the input of the other, i.e. from local
+        to remote if push is set, the other way around otherwise.
+
+        Returns:
+          the exit code of the remote tar if it failed, the one
+          of the local tar otherwise
+        """
+        await self.connect_lazy()
+        self.debug_line(f"tar streaming {local_argv} <-> {remote_command}")
+        local = await asyncio.create_subprocess_exec(
+            *local_argv,
+            stdin=DEVNULL if push else PIPE,
+            stdout=PIPE if push else DEVNULL,
+            stderr=PIPE)
+        try:
+            self.formatter.session_start(self.hostname, remote_command)
+            remote = await self.conn.create_process(remote_command,
+                                                    encoding=None)
+
+            if push:
+                reader, writer = local.stdout, remote.stdin
+                abort_producer = local.kill
+            else:
+                reader, writer = remote.stdout, local.stdin
+                abort_producer = remote.close
+
+            async def stream():
+                if not await self._stream_between(reader, writer):
+                    # the consumer has gone, make sure the producer does not hang
+                    abort_producer()
+
+            await asyncio.gather(stream(),
+                                 self._forward_stderr(local.stderr),
+                                 self._forward_stderr(remote.stderr))
+            local_retcod = await local.wait()
+            await remote.wait()
+        finally:
+            # not to leave a local tar behind if anything went wrong
+            if local.returncode is None:
+                local.kill()
+                await local.wait()
+        self.formatter.session_stop(self.hostname, remote_command)
+        remote_retcod = self._process_exit(remote)
+        return remote_retcod if remote_retcod != 0 else local_retcod
+
+    async def put_tar_stream(self, localpaths, remotepath, *, compress=False):
+        """
+        Copy a collection of local files or directories remotely into
+        a remote directory, that is created if needed.
+        Rather than using SFTP, this packs them locally into a tar stream,
+        that gets unpacked on the fly by a remote ``tar`` process,
+        through a single channel and without any temporary archive;
+        this is much faster on trees with many small files.
+
+        Parameters:
+          localpaths (list): files or directories to copy
+          remotepath (str): the remote directory where to unpack them
+          compress (bool): if set, the stream is gzip-compressed
+
+        Returns:
+          0 if all went well, or the failing tar exit code
+        """
+        if isinstance(localpaths, (str, PurePath)):
+            localpaths = [localpaths]
+        flag = "z" if compress else ""
+        local_argv = ["tar", f"-c{flag}f", "-"]
+        for localpath in localpaths:
+            path = Path(localpath).absolute()
+            local_argv += ["-C", str(path.parent), _tar_operand(path.name)]
+        remotedir = shlex.quote(str(remotepath))
+        remote_command = (f"mkdir -p {remotedir}"
+                          f" && tar -x{flag}f - -C {remotedir}")
+        return await self._tar_transfer(local_argv, remote_command, push=True)
+
+    async def get_tar_stream(self, remotepaths, localpath, *, compress=False):
+        """
+        The counterpart of :meth:`put_tar_stream()`: a remote ``tar`` process
+        packs the remote files or directories, and the stream gets unpacked
+        on the fly into a local directory, which is created if needed.
+
+        Parameters:
+          remotepaths (list): remote files or directories to retrieve
+          localpath: the local directory where to unpack them
+          compress (bool): if set, the stream is gzip-compressed
+
+        Returns:
+          0 if all went well, or the failing tar exit code
+        """
+        if isinstance(remotepaths, (str, PurePath)):
+            remotepaths = [remotepaths]
+        flag = "z" if compress else ""
+        remote_command = f"tar -c{flag}f -"
+        for remotepath in remotepaths:
+            remotepath = str(remotepath).rstrip("/") or "/"
+            dirname, basename = posixpath.split(remotepath)
+            remote_command += (f" -C {shlex.quote(dirname or '.')}"
+                               f" {shlex.quote(_tar_operand(basename or '.'))}")
+        Path(localpath).mkdir(parents=True, exist_ok=True)
+        local_argv = ["tar", f"-x{flag}f", "-", "-C", str(localpath)]
+        return await self._tar_transfer(local_argv, remote_command, push=False)
+
     async def put_string_script(self, script_body, remotefile, **kwds):
         """
         A convenience for copying over a local script before remote execution.
@@ -0,0 +1,288 @@
+"""
+The tools for feeding data into the standard input of remote commands,
+see the ``stdin`` parameter of :class:`~apssh.commands.Run`.
+
+A source for stdin can be either
+
+* a ``bytes`` object (a ``str`` object is not accepted, as it would be
+  ambiguous with a filename),
+* a local filename, as a ``Path`` object,
+* an async iterable of ``bytes`` chunks,
+* a :class:`StdinBroadcast` object, for sending the same contents to many nodes.
+"""
+
+import os
+import sys
+import stat
+import asyncio
+import contextlib
+from pathlib import Path
+
+# the size of the chunks read from a local file
+CHUNK_SIZE = 256 * 1024
+
+
+async def _bytes_chunks(data):
+    view = memoryview(data)
+    for start in range(0, len(view), CHUNK_SIZE):
+        yield view[start:start+CHUNK_SIZE]
+
+
+async def _file_chunks(path):
+    # a regular file won't block significantly, so plain reads are fine
+    with Path(path).open('rb') as feed:
+        async for chunk in _fileobj_chunks(feed):
+            yield chunk
+
+
+async def _fileobj_chunks(feed):
+    while True:
+        chunk = feed.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def _pipe_chunks(fileobj):
+    # a pipe or a terminal needs to be read asynchronously
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), fileobj)
+    try:
+        while True:
+            chunk = await reader.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        transport.close()
+
+
+def check_stdin(source):
+    """
+    Checks that source can be used as a stdin source; this is done
+    when creating a command, so that a mistake shows up right away,
+    and not once the remote command is waiting for its input.
+
+    Parameters:
+      source: see :func:`stdin_chunks`
+
+    Raises:
+      ValueError: if the source cannot be understood
+    """
+    if isinstance(source, (StdinBroadcast, _BroadcastConsumer,
+                           bytes, bytearray, memoryview, Path)):
+        return
+    if isinstance(source, str) and source == "-":
+        return
+    if hasattr(source, '__aiter__'):
+        return
+    raise ValueError(f"cannot use {type(source).__name__} as a stdin source"
+                     f" - expecting bytes, a Path, or an async iterable")
+
+
+def stdin_chunks(source):
+    """
+    Normalizes a stdin source into an async iterator of bytes chunks;
+    this is meant to be called before the command is started.
+
+    Parameters:
+      source: see the module documentation; in addition, the string ``"-"``
+        means the standard input of the current process.
+
+    Raises:
+      ValueError: if the source cannot be understood
+      FileNotFoundError: if the source is a ``Path`` that does not exist
+    """
+    check_stdin(source)
+    if isinstance(source, StdinBroadcast):
+        return source.chunks()
+    if isinstance(source, _BroadcastConsumer):
+        return source.chunks()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return _bytes_chunks(source)
+    if isinstance(source, Path):
+        if not source.exists():
+            raise FileNotFoundError(f"stdin source {source} not found")
+        return _file_chunks(source)
+    if isinstance(source, str):
+        feed = os.fdopen(sys.stdin.fileno(), 'rb', closefd=False)
+        if stat.S_ISREG(os.fstat(feed.fileno()).st_mode):
+            return _fileobj_chunks(feed)
+        return _pipe_chunks(feed)
+    return source.__aiter__()
+
+
+class StdinBroadcast:
+    """
+    A stdin source that is meant to be sent to many nodes: the underlying
+    source is read only once, as the fastest node requires it, and the
+    very same chunks are then replayed to all the other nodes, without
+    any copy.
+
+    Parameters:
+      source: any acceptable stdin source, see :func:`stdin_chunks`;
+        this is typically a ``Path``, or ``"-"`` for the current
+        process's standard input
+      consumers: if set, how many nodes are going to read the contents;
+        a chunk is then forgotten as soon as they all have read it -
+        or have given up reading; a command that could not even start,
+        e.g. because its node is unreachable, gives up too, see
+        :func:`stdin_consumer`; each consumer can read the contents
+        only once, so this is not suitable for a command that is retried
+
+    .. note::
+      without ``consumers``, the chunks are kept in memory until the
+      broadcast object is garbage-collected, so that nodes can start
+      at different times; even with ``consumers``, the chunks are kept
+      as long as the slowest node - or one that has not started yet -
+      needs them; so for very large contents, it is better to pass a
+      ``Path`` directly to each command, and to let the OS page cache
+      do the job.
+
+    Example:
+      Send the same SQL dump to a database on many nodes::
+
+        dump = StdinBroadcast(Path("dump.sql"))
+        for node in nodes:
+            SshJob(node, command=Run("psql", stdin=dump),
+                   scheduler=scheduler)
+    """
+
+    def __init__(self, source, consumers=None):
+        check_stdin(source)
+        if consumers is not None and consumers < 1:
+            raise ValueError(f"StdinBroadcast: consumers must be positive,"
+                             f" got {consumers}")
+        self.source = source
+        self.consumers = consumers
+        self._upstream = None
+        # the chunks that are still needed, _chunks[0] being chunk #_first
+        self._chunks = []
+        self._first = 0
+        self._eof = False
+        self._lock = asyncio.Lock()
+        # the consumers so far, and the index of the next chunk they need
+        self._started = 0
+        self._positions = {}
+
+    def __repr__(self):
+        return f"<StdinBroadcast {self.source!r}>"
+
+    async def _fetch(self, index):
+        """
+        makes sure chunk #index is available, unless we're at EOF
+        """
+        async with self._lock:
+            # someone else may have done the work while we were waiting
+            if index < self._first + len(self._chunks) or self._eof:
+                return
+            if self._upstream is None:
+                self._upstream = stdin_chunks(self.source)
+            try:
+                self._chunks.append(await self._upstream.__anext__())
+            except StopAsyncIteration:
+                self._eof = True
+
+    def _forget(self):
+        """
+        drops the chunks that all the consumers have read
+        """
+        if self.consumers is None or self._started < self.consumers:
+            return
+        needed = min(self._positions.values(),
+                     default=self._first + len(self._chunks))
+        if needed > self._first:
+            del self._chunks[:needed - self._first]
+            self._first = needed
+
+    def chunks(self):
+        """
+        Returns:
+          an async iterator over the source's chunks, one for each node
+
+        Raises:
+          ValueError: when iterating, if there are more consumers than
+            announced
+        """
+        return _BroadcastConsumer(self).chunks()
+
+    def _release(self):
+        """
+        a consumer gives up without having read anything
+        """
+        if self.consumers is not None and self._started < self.consumers:
+            self._started += 1
+            self._forget()
+
+    async def _replay(self, consumer):
+        if self.consumers is not None and self._started >= self.consumers:
+            raise ValueError(f"{self} has already {self.consumers} consumers")
+        self._started += 1
+        consumer.started = True
+        index = 0
+        self._positions[consumer] = index
+        try:
+            while True:
+                if index >= self._first + len(self._chunks):
+                    await self._fetch(index)
+                    if index >= self._first + len(self._chunks):
+                        return
+                chunk = self._chunks[index - self._first]
+                index += 1
+                self._positions[consumer] = index
+                self._forget()
+                yield chunk
+        finally:
+            del self._positions[consumer]
+            self._forget()
+
+
+class _BroadcastConsumer:
+    """
+    the view of a :class:`StdinBroadcast` for one command on one node,
+    that keeps track of whether the contents have started to be read
+    """
+
+    def __init__(self, broadcast):
+        self.broadcast = broadcast
+        self.started = False
+        self.released = False
+
+    def __repr__(self):
+        return repr(self.broadcast)
+
+    def chunks(self):                                   # pylint: disable=c0116
+        return self.broadcast._replay(self)             # pylint: disable=w0212
+
+    def release(self):
+        """
+        gives up reading, unless this has started already
+        """
+        if self.started or self.released:
+            return
+        self.released = True
+        self.broadcast._release()                       # pylint: disable=w0212
+
+
+@contextlib.contextmanager
+def stdin_consumer(source):
+    """
+    To be used around the run of a command on one node: a
+    :class:`StdinBroadcast` is replaced with a consumer of its own,
+    that gives up reading if the command did not get to read it,
+    e.g. because the node could not be reached; this way the other
+    nodes' chunks can still be forgotten. Other sources are left alone.
+
+    Parameters:
+      source: a stdin source, or None
+    """
+    if not isinstance(source, StdinBroadcast):
+        yield source
+        return
+    consumer = _BroadcastConsumer(source)
+    try:
+        yield consumer
+    finally:
+        consumer.release()
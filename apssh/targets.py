@@ -7,15 +7,18 @@ the Targets class
 # so it's kind of a 2-step init
 # pylint: disable=attribute-defined-outside-init
 
+import re
 import sys
 from pathlib import Path
 from collections import namedtuple
 
-from .config import default_username
+from .config import get_default_username
 
 from .util import print_stderr
-from .sshproxy import SshProxy
 from .config import local_config_dir
+from .hostrange import (
+    is_pattern, expand_hostnames, split_targets, HostPattern)
+from .inventory import scan_directory, read_target_file
 
 # note explicit-direct
 # if we call apssh -t None->box -g gateway it means we want to
@@ -25,6 +28,9 @@ from .config import local_config_dir
 Endpoint = namedtuple('Endpoint', ['hostname', 'username'])
 Hop2 = namedtuple('Hop2', ['final', 'gateway'])
 
+# a target that is neither a plain hostname nor a pattern
+_COMPLEX_TARGET = re.compile(r"[@\[{→]|->|^None$")
+
 
 class Targets:                   # pylint: disable=too-many-instance-attributes
     """
@@ -36,6 +42,9 @@ class Targets:                   # pylint: disable=too-many-instance-attributes
 
     * in its most simple form, a target is just a hostname
 
+    * a hostname can also be a pattern, like ``fit[01-37,40]`` or
+    ``node{a,b}-[1-64]``, see :mod:`apssh.hostrange`
+
     * when needed it can also be extended and use a syntax like this one
     gwuser@gateway->user@hostname
     which means reach account user on host hostname but in 2 hops, passing through
@@ -70,6 +79,9 @@ class Targets:                   # pylint: disable=too-many-instance-attributes
             * username@hostname
             * gwuser@gwhost->username@hostname
 
+            where hostname can be a pattern with numeric ranges
+            and alternatives, like fit[01-37,40] or node{a,b}-[1-64]
+
             complex targets can be
             * a space- or comma- separated list of targets
             * the name of a file containing targets
@@ -77,19 +89,27 @@ class Targets:                   # pylint: disable=too-many-instance-attributes
             see e.g. the --mark option
             """)
         parser.add_argument(
-            "-l", "--login", default=default_username,
-            help=f"remote user name - default is {default_username}")
+            "-l", "--login", default=None,
+            help="remote user name - default is the local user name")
         parser.add_argument(
             "-g", "--gateway", default=None,
             help="""
             specify a gateway for 2-hops ssh
             - either hostname or username@hostname
             """)
+        parser.add_argument(
+            "--gateway-window", type=int, default=None, metavar="N",
+            help="""
+            run at most N hosts at a time through each gateway;
+            unlike --window, this does not slow down the hosts
+            that are reached directly or through other gateways
+            """)
         parser.add_argument(
             "-x", "--exclude", dest='excludes', action='append', default=[],
             help="""
             like --target, but for specifying exclusions;
-            for now no wildcard mechanism is supported here;
+            patterns like fit[01-10] are matched against the targets
+            without being expanded;
             also the order in which --target and --exclude options
             are mentioned does not matter;
             use --dry-run to only check for the list of applicable hosts
@@ -107,6 +127,9 @@ class Targets:                   # pylint: disable=too-many-instance-attributes
         self.timeout = args.timeout
         self.debug = args.debug
         self.dry_run = args.dry_run
+        # looked up only now, as this may be slow
+        if args.login is None:
+            args.login = get_default_username()
         #
 
         self.gateway_endpoint = None
@@ -123,11 +146,10 @@ class Targets:                   # pylint: disable=too-many-instance-attributes
             # this is how we mark that there is an explicit choice
             # to go direct
             return Endpoint(None, None)
-        try:
-            username, hostname = target.split('@')
+        if target.count('@') == 1:
+            username, _, hostname = target.partition('@')
             return Endpoint(hostname, username)
-        except ValueError:
-            return Endpoint(target, self.args.login)
+        return Endpoint(target, self.args.login)
 
     # create a Hop2 (parse something like [[gwuser@]gwhostname->][username@]hostname)
     def parse_hop2(self, target):                       # pylint: disable=C0111
@@ -143,9 +165,22 @@ class Targets:                   # pylint: disable=too-many-instance-attributes
     @staticmethod
     def split(text):
         """
-        split along spaces or commas
+        split along spaces or commas, except inside patterns
+        """
+        return split_targets(text)
+
+
+    @staticmethod
+    def expand_hop2(hop2):
+        """
+        a generator over the Hop2 tuples for each hostname in the pattern
         """
-        return [x for commas in text.split() for x in commas.split(',')]
+        if not is_pattern(hop2.final.hostname or ""):
+            yield hop2
+            return
+        username = hop2.final.username
+        for hostname in expand_hostnames(hop2.final.hostname):
+            yield Hop2(Endpoint(hostname, username), hop2.gateway)
 
 
     # returns a valid Path object, or None
@@ -162,13 +197,15 @@ class Targets:                   # pylint: disable=too-many-instance-attributes
         return None
 
 
-    def analyze_target(self, target):
+    def analyze_target(self, target, expand=True):
         """
         This function is used to guess the meaning of all the targets passed
         to the ``apssh`` command through its ``-t/--target`` option.
 
         Parameters:
           target: a string passed to ``--target``
+          expand: if not set, the hostnames that are patterns
+            are returned as-is
 
         Returns:
           a list of Hop2 tuples
@@ -179,28 +216,18 @@ class Targets:                   # pylint: disable=too-many-instance-attributes
           but cannot be parsed - in which case it is probably not a hostname.
 
         """
-        targets = []
         # located is a Path object - or None
         located = self.locate_file(target)
         if located:
             if located.is_dir():
                 # directory
-                onlyfiles = [str(f.name) for f in located.iterdir() if f.is_file()]
-                return [Hop2(Endpoint(filename, self.args.login),
-                             self.gateway_endpoint)
-                        for filename in onlyfiles]
+                login, gateway = self.args.login, self.gateway_endpoint
+                return [Hop2(Endpoint(filename, login), gateway)
+                        for filename in scan_directory(located)]
             else:
                 # file
                 try:
-                    with located.open() as inputfile: # pylint: disable=unspecified-encoding
-                        for line in inputfile:
-                            line = line.strip()
-                            if line.startswith('#'):
-                                continue
-                            line = line.split()
-                            for token in line:
-                                targets += token.split()
-                    return [self.parse_hop2(target) for target in targets]
+                    return self._hop2_s(read_target_file(located), expand)
                 except FileNotFoundError:
                     return []
                 except Exception as exc:                     # pylint: disable=broad-except
@@ -211,22 +238,73 @@ class Targets:                   # pylint: disable=too-many-instance-attributes
                     return []
         else:
             # string
-            return [self.parse_hop2(x) for x in self.split(target)]
+            try:
+                return self._hop2_s(self.split(target), expand)
+            except ValueError as exc:
+                print_stderr(f"Could not parse target {target}, {exc}")
+                return []
 
 
-    def create_proxies(self):               # pylint: disable=too-many-branches
+    def _hop2_s(self, tokens, expand):
+        """
+        the list of Hop2 tuples for these tokens; the patterns are
+        expanded into that list - and not lazily - because a proxy gets
+        created for each hostname anyway, and because a parsing error
+        must show up here, see analyze_target
+        """
+        login = self.args.login
+        complex_target = _COMPLEX_TARGET.search
+        hop2_s = []
+        for token in tokens:
+            # a plain hostname is by far the most frequent case
+            if not complex_target(token):
+                hop2_s.append(Hop2(Endpoint(token, login), None))
+                continue
+            hop2 = self.parse_hop2(token)
+            if expand:
+                hop2_s.extend(self.expand_hop2(hop2))
+            else:
+                hop2_s.append(hop2)
+        return hop2_s
+
+
+    def create_proxies(self, connect_window=None): # pylint: disable=too-many-branches
         """
         build the proxies associated with that set of targets
+
+        Parameters:
+          connect_window: passed to all the proxies, gateways included
         """
+        # not needed for e.g. --dry-run, and loads asyncssh
+        from .sshproxy import SshProxy    # pylint: disable=import-outside-toplevel
         # a set of endpoints (disregard gateways in the exclusion lists)
         excludes = set()
+        # and a list of (HostPattern, username) - that we do not expand
+        exclude_patterns = []
         for exclude in self.args.excludes:
-            excluded_endpoints = {hop2.final for hop2 in self.analyze_target(exclude)}
-            excludes.update(excluded_endpoints)
+            for hop2 in self.analyze_target(exclude, expand=False):
+                hostname, username = hop2.final
+                if hostname and is_pattern(hostname):
+                    try:
+                        exclude_patterns.append((HostPattern(hostname), username))
+                    except ValueError as exc:
+                        print(f"WARNING: ignoring exclude {exclude}, {exc}")
+                else:
+                    excludes.add(hop2.final)
         if self.dry_run:
-            print(f"========== {len(excludes)} excludes found:")
+            print(f"========== {len(excludes)} excludes"
+                  f" and {len(exclude_patterns)} exclude patterns found:")
             for exclude in excludes:
                 print(exclude)
+            for pattern, username in exclude_patterns:
+                print(f"{username}@{pattern.pattern}")
+
+        def is_excluded(endpoint):
+            if endpoint in excludes:
+                return True
+            return any(username == endpoint.username
+                       and pattern.match(endpoint.hostname or "")
+                       for pattern, username in exclude_patterns)
 
         # gather targets as mentioned in -t -x args
         hop2_s = []
@@ -238,7 +316,7 @@ class Targets:                   # pylint: disable=too-many-instance-attributes
                 print(f"WARNING: ignoring target {target}")
                 continue
             for hop2 in target_hop2_s:
-                if hop2.final not in excludes:
+                if not is_excluded(hop2.final):
                     hop2_s.append(hop2)
                 else:
                     actually_excluded += 1
@@ -267,7 +345,9 @@ class Targets:                   # pylint: disable=too-many-instance-attributes
             gateway = SshProxy(
                 hostname=hostname, username=username,
                 keys=self.private_keys, formatter=self.formatter,
-                timeout=self.timeout, debug=self.debug)
+                timeout=self.timeout, debug=self.debug,
+                window=self.args.gateway_window,
+                connect_window=connect_window)
             cache[(hostname, username)] = gateway
             return gateway
 
@@ -290,6 +370,7 @@ class Targets:                   # pylint: disable=too-many-instance-attributes
                          gateway=gateway,
                          formatter=self.formatter,
                          timeout=self.timeout,
-                         debug=self.debug))
+                         debug=self.debug,
+                         connect_window=connect_window))
 
         return self.proxies
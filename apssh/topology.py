@@ -5,32 +5,44 @@ import asyncio
 
 from collections import defaultdict
 
-from .sshjob import SshJob
+import asyncssh
+from asynciojobs import Job
+
+from .sshjob import SshJob, FanoutJob
 from .nodes import SshNode
 
 
-def _distances_dict(scheduler, manage_gateways):
+def _distances_dict(scheduler, manage_gateways, fanout_nodes=True):
     """
     Return a dictionary distance -> [nodes]
+
+    with fanout_nodes set to False, the nodes of a FanoutJob are left out,
+    but their gateways are still considered if manage_gateways is set
     """
-    # gather all relevant instances of SshJob
-    nodes_set = {
-        job.node for job in scheduler.iterate_jobs()
-        if isinstance(job, SshJob)
-        and isinstance(job.node, SshNode)
-    }
+    # gather all relevant instances of SshJob and FanoutJob
+    nodes_set = set()
+    fanout_set = set()
+    for job in scheduler.iterate_jobs():
+        if isinstance(job, SshJob):
+            nodes_set.add(job.node)
+        elif isinstance(job, FanoutJob):
+            fanout_set.update(job.nodes)
+    nodes_set = {node for node in nodes_set if isinstance(node, SshNode)}
+    fanout_set = {node for node in fanout_set if isinstance(node, SshNode)}
     # transitive closure to gather gateways as well
     # can't modify the subject of a for loop
     gateways_set = set()
     if manage_gateways:
         def recursive_scan(node):
             gateway = node.gateway
-            if gateway:
+            if gateway and gateway not in gateways_set:
                 gateways_set.add(gateway)
                 recursive_scan(gateway)
-        for node in nodes_set:
+        for node in nodes_set | fanout_set:
             recursive_scan(node)
         nodes_set |= gateways_set
+    if fanout_nodes:
+        nodes_set |= fanout_set
 
     # gather nodes by distance
     dist_dict = defaultdict(list)
@@ -81,6 +93,87 @@ async def co_close_ssh_in_scheduler(scheduler, manage_gateways=True):
     return
 
 
+async def co_prewarm(scheduler, window=0):
+    """
+    This utility function allows to establish all the ssh connections
+    involved in a scheduler, before any of its jobs gets to run.
+
+    Nodes are found like in :py:obj:`co_close_ssh_in_scheduler()`,
+    gateways included - except for the nodes of a
+    :class:`~apssh.sshjob.FanoutJob`, whose point is to connect and close
+    each node in turn, within its own window; only their gateways are
+    prewarmed. They are then connected by increasing distance,
+    so that a gateway is always up before the nodes behind it get tried;
+    nodes at the same distance are connected concurrently.
+    A node whose gateway is unreachable is not even tried.
+
+    Unreachable nodes are reported through their formatter.
+
+    Parameters:
+      window (int): how many connections can be attempted simultaneously;
+        default is no limit
+
+    Returns:
+      dict: a dictionary node -> exception, for the unreachable nodes;
+      so an empty dictionary means all connections are warm
+
+    .. note::
+      connections are tied to the asyncio event loop where they were
+      created; as ``Scheduler.run()`` creates its own loop, this coroutine
+      must either be awaited in the same loop as ``Scheduler.co_run()``,
+      or be inserted in the scheduler with :py:obj:`prewarm()`.
+    """
+    dist_dict = _distances_dict(scheduler, manage_gateways=True,
+                                fanout_nodes=False)
+    semaphore = asyncio.Semaphore(window) if window else None
+    unreachable = {}
+
+    async def connect(node):
+        if node.gateway in unreachable:
+            unreachable[node] = unreachable[node.gateway]
+            return
+        try:
+            if semaphore:
+                async with semaphore:
+                    await node.connect_lazy()
+            else:
+                await node.connect_lazy()
+        except (OSError, asyncssh.Error, asyncio.TimeoutError) as exc:
+            unreachable[node] = exc
+            node.formatter.line(
+                f"unreachable ({type(exc).__name__}: {exc})\n",
+                asyncssh.EXTENDED_DATA_STDERR, node.hostname)
+
+    # sort them, closest first
+    for distance in sorted(dist_dict.keys()):
+        await asyncio.gather(*(connect(node) for node in dist_dict[distance]))
+
+    return unreachable
+
+
+def prewarm(scheduler, window=0):
+    """
+    Inserts in the scheduler a job that runs :py:obj:`co_prewarm()`,
+    and that all the entry jobs of the scheduler then require;
+    this way all the ssh connections are established - in the same
+    event loop as the rest of the scheduler - before any other job starts.
+
+    Parameters:
+      window (int): passed as-is to :py:obj:`co_prewarm()`
+
+    Returns:
+      Job: the inserted job, whose ``result()`` is the dictionary
+      of unreachable nodes, once the scheduler has run
+    """
+    entry_jobs = scheduler.entry_jobs()
+    job = Job(co_prewarm(scheduler, window),
+              label="prewarm ssh connections", critical=False)
+    scheduler.add(job)
+    for entry_job in entry_jobs:
+        entry_job.requires(job)
+    return job
+
+
 ############################## topologies / graphical output
 def topology_dot(scheduler):
     """
@@ -3,6 +3,7 @@ A set of helper functions for the apssh package
 """
 
 import sys
+import codecs
 
 def print_stderr(*args, **kwds):
     """
@@ -50,3 +51,68 @@ def check_arg_type(instance, types, message):
     msg_complete = (f"{message} is expected to be an instance of {msg_expected},"
                     f" got a {msg_received} instead")
     raise ValueError(msg_complete)
+
+
+class LineSplitter:
+    """
+    Reassembles lines from the chunks of bytes read on a process output,
+    either local or remote; only the current line is kept in memory,
+    so that unbounded outputs can be dealt with.
+
+    Decoding happens here, in an incremental way, so that a multi-byte
+    character can be split between 2 chunks.
+
+    Parameters:
+      sink: a callable, that is passed each complete line
+        - with its trailing newline - and the datatype
+      terminate: if set, a last line with no trailing newline
+        gets one at EOF; default is to pass it as-is
+    """
+
+    def __init__(self, sink, *, terminate=False):
+        self.sink = sink
+        self.terminate = terminate
+        self.decoder = codecs.getincrementaldecoder("utf-8")(
+            errors='replace')
+        # the current line
+        self.line = ""
+
+    def data_received(self, data, datatype):
+        """
+        Called with each chunk of bytes
+        """
+        text = self.decoder.decode(data)
+        if not text:
+            return
+        self.text_received(text, datatype)
+        chunks = text.split("\n")
+        # what goes in the current line, if any
+        self.line += chunks.pop(0)
+        for chunk in chunks:
+            # restore the \n that we removed by calling split
+            self.flush(datatype, newline=True)
+            self.line = chunk
+
+    def text_received(self, text, datatype):
+        """
+        Called with each decoded chunk; does nothing by default
+        """
+
+    def eof(self, datatype):
+        """
+        Called once the output is over
+        """
+        # there might be a pending incomplete character
+        self.line += self.decoder.decode(b"", final=True)
+        self.flush(datatype, newline=self.terminate and bool(self.line))
+
+    def flush(self, datatype, newline):
+        """
+        Sends the current line, if any, to the sink
+        """
+        if newline:
+            self.line += "\n"
+        # EOF calls flush too
+        if self.line:
+            self.sink(self.line, datatype)
+            self.line = ""
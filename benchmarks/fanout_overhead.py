@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+"""
+Compare the bookkeeping overhead of one SshJob per node
+with a single FanoutJob, on many nodes
+
+no connection is actually made: the command is a no-op,
+so what gets measured is the cost of the job machinery itself
+
+usage:
+  python benchmarks/fanout_overhead.py
+  python benchmarks/fanout_overhead.py --nodes 20000 --window 500
+"""
+
+# pylint: disable=missing-function-docstring
+
+import argparse
+import time
+import tracemalloc
+
+from asynciojobs import Scheduler
+
+from apssh import SshNode, SshJob, FanoutJob, RawFormatter
+from apssh.commands import AbstractCommand
+
+
+class NoOp(AbstractCommand):
+    async def co_run_remote(self, node):
+        return 0
+
+    def label_line(self):
+        return "no-op"
+
+
+def create_nodes(nb_nodes):
+    formatter = RawFormatter(verbose=False)
+    return [SshNode(f"node{index:05d}", keys=["dummy"], formatter=formatter)
+            for index in range(nb_nodes)]
+
+
+def with_sshjobs(nodes, window):
+    scheduler = Scheduler(jobs_window=window)
+    for node in nodes:
+        scheduler.add(SshJob(node, command=NoOp(), critical=False,
+                             keep_connection=True))
+    return scheduler
+
+
+def with_fanout(nodes, window):
+    return Scheduler(FanoutJob(nodes, command=NoOp(), window=window,
+                               critical=False, keep_connection=True))
+
+
+def measure(build, nodes, window):
+    tracemalloc.start()
+    beg = time.perf_counter()
+    scheduler = build(nodes, window)
+    built = time.perf_counter()
+    assert scheduler.run()
+    done = time.perf_counter()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return built - beg, done - built, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, nargs='+',
+                        default=[1000, 5000, 20000])
+    parser.add_argument("--window", type=int, default=500)
+    args = parser.parse_args()
+    print(f"{'nodes':>6} {'mode':<8} {'build s':>8} {'run s':>8} {'peak MiB':>9}")
+    for nb_nodes in args.nodes:
+        nodes = create_nodes(nb_nodes)
+        for name, build in (('sshjobs', with_sshjobs),
+                            ('fanout', with_fanout)):
+            build_time, run_time, peak = measure(build, nodes, args.window)
+            print(f"{nb_nodes:>6} {name:<8} {build_time:>8.2f}"
+                  f" {run_time:>8.2f} {peak/2**20:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
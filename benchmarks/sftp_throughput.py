@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+"""
+Measure the throughput of Push/Pull-style SFTP transfers, and how it
+scales with the file size, the round-trip time, and the transfer tuning
+knobs (block size, outstanding requests, files in parallel)
+
+everything runs locally, see standin.py
+
+usage:
+  python benchmarks/sftp_throughput.py
+  python benchmarks/sftp_throughput.py --rtt 0 20 --sizes 1 64
+"""
+
+# pylint: disable=missing-function-docstring
+
+import asyncio
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import asyncssh
+
+from standin import start_server, start_relay, client_proxy
+
+MiB = 2**20
+
+
+def create_files(directory, count, size):
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for index in range(count):
+        path = directory / f"file-{index}"
+        with path.open('wb') as output:
+            output.write(os.urandom(size))
+        paths.append(str(path))
+    return paths
+
+
+async def one_run(port, client_key, localpaths, tuning):
+    proxy = client_proxy(port, client_key)
+    await proxy.sftp_connect_lazy()
+    beg = time.perf_counter()
+    await proxy.put_file_s(localpaths, ".", **tuning)
+    put_time = time.perf_counter() - beg
+    with tempfile.TemporaryDirectory() as pulled:
+        beg = time.perf_counter()
+        await proxy.get_file_s([Path(p).name for p in localpaths],
+                               pulled, **tuning)
+        get_time = time.perf_counter() - beg
+    await proxy.close()
+    return put_time, get_time
+
+
+TUNINGS = {
+    'default': {},
+    'bs=16k,req=16': dict(block_size=16 * 1024, max_requests=16),
+    'bs=256k,req=128': dict(block_size=256 * 1024, max_requests=128),
+    'bs=256k,req=128,par=8': dict(block_size=256 * 1024, max_requests=128,
+                                  parallel=8),
+}
+
+
+async def main(rtts, sizes, count):
+    client_key = asyncssh.generate_private_key('ssh-ed25519')
+    with tempfile.TemporaryDirectory() as workdir:
+        rootdir = Path(workdir) / "remote"
+        rootdir.mkdir()
+        server, server_port = await start_server(str(rootdir))
+        print(f"{'rtt':>6} {'size':>8} {'files':>5} {'tuning':<24}"
+              f" {'put MiB/s':>10} {'get MiB/s':>10}")
+        for rtt in rtts:
+            relay, port = await start_relay(server_port, rtt / 1000)
+            for size in sizes:
+                nbytes = int(size * MiB)
+                localpaths = create_files(
+                    Path(workdir) / f"local-{size}", count, nbytes)
+                for name, tuning in TUNINGS.items():
+                    put_time, get_time = await one_run(
+                        port, client_key, localpaths, tuning)
+                    total = count * nbytes / MiB
+                    print(f"{rtt:>4}ms {size:>6}Mi {count:>5} {name:<24}"
+                          f" {total/put_time:>10.1f} {total/get_time:>10.1f}")
+            relay.close()
+        server.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rtt", nargs='+', type=float, default=[0, 10, 50],
+                        help="emulated round-trip times, in ms")
+    parser.add_argument("--sizes", nargs='+', type=float, default=[1, 16],
+                        help="file sizes, in MiB")
+    parser.add_argument("--count", type=int, default=8,
+                        help="how many files in each transfer")
+    args = parser.parse_args()
+    asyncio.run(main(args.rtt, args.sizes, args.count))
@@ -0,0 +1,127 @@
+"""
+A local stand-in for a remote ssh server, for benchmarking purposes
+
+* an in-process asyncssh server, rooted in a local directory,
+  that serves SFTP and runs commands through /bin/sh
+* a TCP relay that delays every chunk by half the RTT in each direction,
+  which emulates latency without capping bandwidth
+"""
+
+# pylint: disable=missing-function-docstring
+
+import asyncio
+from subprocess import PIPE
+
+import asyncssh
+
+from apssh import SshProxy, RawFormatter
+
+
+class _Server(asyncssh.SSHServer):
+    # accept anyone, this is a local stand-in
+    def begin_auth(self, username):
+        return True
+
+    def public_key_auth_supported(self):
+        return True
+
+    def validate_public_key(self, username, key):
+        return True
+
+
+async def _copy(reader, writer, close):
+    while True:
+        data = await reader.read(256 * 1024)
+        if not data:
+            break
+        writer.write(data)
+        await writer.drain()
+    close()
+
+
+def _process_factory(rootdir):
+    async def handle(process):
+        local = await asyncio.create_subprocess_shell(
+            process.command, cwd=rootdir,
+            stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        feeder = asyncio.create_task(
+            _copy(process.stdin, local.stdin, local.stdin.close))
+        await asyncio.gather(
+            _copy(local.stdout, process.stdout, lambda: None),
+            _copy(local.stderr, process.stderr, lambda: None))
+        process.exit(await local.wait())
+        feeder.cancel()
+    return handle
+
+
+async def start_server(rootdir):
+    """
+    returns the server and the port it listens on
+    """
+    host_key = asyncssh.generate_private_key('ssh-ed25519')
+    server = await asyncssh.listen(
+        '127.0.0.1', 0, server_host_keys=[host_key],
+        server_factory=_Server, encoding=None,
+        process_factory=_process_factory(rootdir),
+        sftp_factory=lambda chan: asyncssh.SFTPServer(chan, chroot=rootdir))
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def _delayed_pump(reader, writer, delay):
+    """
+    forward data from reader to writer, each chunk being
+    delivered ``delay`` seconds after it was received
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    async def deliver():
+        while True:
+            due, data = await queue.get()
+            if data is None:
+                writer.close()
+                return
+            wait = due - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            writer.write(data)
+            await writer.drain()
+
+    deliverer = asyncio.create_task(deliver())
+    while True:
+        data = await reader.read(256 * 1024)
+        queue.put_nowait((loop.time() + delay, data or None))
+        if not data:
+            break
+    await deliverer
+
+
+async def start_relay(upstream_port, rtt):
+    """
+    a TCP relay on a random local port, that adds rtt/2 in each direction
+
+    returns the relay server and the port it listens on
+    """
+    async def handle(client_reader, client_writer):
+        server_reader, server_writer = \
+            await asyncio.open_connection('127.0.0.1', upstream_port)
+        try:
+            await asyncio.gather(
+                _delayed_pump(client_reader, server_writer, rtt / 2),
+                _delayed_pump(server_reader, client_writer, rtt / 2),
+                return_exceptions=True)
+        except asyncio.CancelledError:
+            # the relay is being torn down
+            pass
+
+    relay = await asyncio.start_server(handle, '127.0.0.1', 0)
+    return relay, relay.sockets[0].getsockname()[1]
+
+
+def client_proxy(port, client_key):
+    """
+    an SshProxy suitable to talk to the stand-in
+    """
+    return SshProxy('127.0.0.1', port=port, username='bench',
+                    keys=[client_key], known_hosts=None,
+                    formatter=RawFormatter(verbose=False))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+"""
+Measure the startup time of the apssh command, for the invocations
+that are expected to return right away
+
+each invocation is run several times in a fresh interpreter, with
+python -X importtime; the report shows the best wall-clock time, the
+overall import time as reported by -X importtime, and which of the
+heavy dependencies got loaded
+
+usage:
+  python benchmarks/startup.py
+  python benchmarks/startup.py --runs 20 --details
+"""
+
+# pylint: disable=missing-function-docstring
+
+import argparse
+import subprocess
+import sys
+import time
+
+# the invocations that are measured; -L is run against a plain hostname,
+# and with --ok-if-no-key so it does not depend on the local keys
+INVOCATIONS = {
+    "import": None,
+    "-V": ["-V"],
+    "--help": ["--help"],
+    "-L": ["-L", "--ok-if-no-key", "-t", "localhost", "true"],
+}
+
+HEAVY = ("asyncssh", "asynciojobs", "jinja2", "yaml", "importlib.metadata")
+
+SCRIPT = """
+import sys
+sys.argv = ['apssh'] + sys.argv[1:]
+from apssh.__main__ import apssh
+apssh()
+"""
+
+
+def run(argv):
+    """
+    returns the wall-clock time, the overall import time in microseconds,
+    and a dict module -> cumulated microseconds
+    """
+    if argv is None:
+        command = [sys.executable, "-X", "importtime", "-c", "import apssh"]
+    else:
+        command = [sys.executable, "-X", "importtime", "-c", SCRIPT, *argv]
+    beg = time.perf_counter()
+    completed = subprocess.run(command, capture_output=True, text=True,
+                               check=False)
+    elapsed = time.perf_counter() - beg
+    overall, cumulated = 0, {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        try:
+            _, cumulative, module = line.split("|")
+            cumulated[module.strip()] = int(cumulative)
+        except ValueError:
+            # the header line
+            continue
+        # nested imports are indented, and already counted in their parent
+        if not module.startswith("  "):
+            overall += int(cumulative)
+    return elapsed, overall, cumulated
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--details", default=False, action='store_true',
+                        help="show the 10 most expensive imports")
+    args = parser.parse_args()
+    print(f"{'invocation':<10} {'best ms':>8} {'imports ms':>11}  loaded")
+    for name, argv in INVOCATIONS.items():
+        best = None
+        for _ in range(args.runs):
+            elapsed, overall, cumulated = run(argv)
+            if best is None or elapsed < best:
+                best, best_overall, best_cumulated = elapsed, overall, cumulated
+        loaded = [heavy for heavy in HEAVY if heavy in best_cumulated]
+        print(f"{name:<10} {best*1000:>8.1f} {best_overall/1000:>11.1f}"
+              f"  {' '.join(loaded) or '-'}")
+        if args.details:
+            expensive = sorted(best_cumulated.items(),
+                               key=lambda item: item[1], reverse=True)
+            for module, micros in expensive[:10]:
+                print(f"{'':<10} {micros/1000:>8.1f} {module}")
+
+
+if __name__ == '__main__':
+    main()
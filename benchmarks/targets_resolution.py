@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+"""
+Measure how long it takes to resolve --target options
+that point at a large target file, or at a large --mark directory
+
+the compiled inventories are stored in a temporary directory,
+so ~/.apssh is left untouched
+
+usage:
+  python benchmarks/targets_resolution.py
+  python benchmarks/targets_resolution.py --hosts 10000 100000
+"""
+
+# pylint: disable=missing-function-docstring
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from apssh import inventory
+from apssh.targets import Targets
+
+
+def create_sources(tmpdir, nb_hosts):
+    hostnames = [f"host{index:06d}.example.org" for index in range(nb_hosts)]
+    hostfile = Path(tmpdir) / f"hosts-{nb_hosts}"
+    with hostfile.open('w') as output:
+        for index, hostname in enumerate(hostnames):
+            if index % 100 == 0:
+                output.write("# a comment\n")
+            output.write(f"{hostname}\n")
+    markdir = Path(tmpdir) / f"marks-{nb_hosts}"
+    markdir.mkdir()
+    for hostname in hostnames:
+        (markdir / hostname).touch()
+    return hostfile, markdir
+
+
+def create_targets():
+    parser = argparse.ArgumentParser()
+    targets = Targets()
+    targets.add_target_options(parser)
+    args = parser.parse_args([])
+    args.timeout, args.debug, args.dry_run = 5, False, False
+    targets.init_from_args(args, [], None)
+    return targets
+
+
+def measure(targets, source):
+    beg = time.perf_counter()
+    hop2_s = targets.analyze_target(str(source))
+    return len(hop2_s), time.perf_counter() - beg
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hosts", type=int, nargs='+',
+                        default=[1000, 10000, 100000])
+    args = parser.parse_args()
+    targets = create_targets()
+    print(f"{'hosts':>7} {'source':<6} {'cold ms':>8} {'compiled ms':>12}"
+          f" {'memory ms':>10}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        inventory.inventory_dir = Path(tmpdir) / "inventory"
+        for nb_hosts in args.hosts:
+            for name, source in zip(('file', 'dir'),
+                                    create_sources(tmpdir, nb_hosts)):
+                inventory.clear_inventory_cache(on_disk=True)
+                _, cold = measure(targets, source)
+                # as in a subsequent run
+                inventory.clear_inventory_cache()
+                _, compiled = measure(targets, source)
+                _, memory = measure(targets, source)
+                print(f"{nb_hosts:>7} {name:<6} {cold*1000:>8.1f}"
+                      f" {compiled*1000:>12.1f} {memory*1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+"""
+Compare the SFTP and tar transports of Push/Pull on a tree
+with many small files, like e.g. a Python virtualenv
+
+everything runs locally, see standin.py
+
+usage:
+  python benchmarks/tree_transfers.py
+  python benchmarks/tree_transfers.py --tree .venv --rtt 10
+"""
+
+# pylint: disable=missing-function-docstring
+
+import asyncio
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import asyncssh
+
+from standin import start_server, start_relay, client_proxy
+
+
+def create_tree(root, nb_dirs, nb_files, size):
+    for dir_index in range(nb_dirs):
+        subdir = root / f"dir-{dir_index}"
+        subdir.mkdir(parents=True)
+        for file_index in range(nb_files):
+            (subdir / f"file-{file_index}").write_bytes(os.urandom(size))
+
+
+def tree_stats(root):
+    files = [path for path in Path(root).rglob("*") if path.is_file()]
+    return len(files), sum(path.stat().st_size for path in files)
+
+
+async def one_run(port, client_key, tree, transport, compress, workdir):
+    remote_dir = f"pushed-{transport}-{compress}"
+    pulled_dir = Path(workdir) / f"pulled-{transport}-{compress}"
+    proxy = client_proxy(port, client_key)
+    await proxy.connect_lazy()
+    beg = time.perf_counter()
+    if transport == 'tar':
+        await proxy.put_tar_stream(tree, remote_dir, compress=compress)
+    else:
+        await proxy.mkdir(remote_dir)
+        await proxy.put_file_s(tree, remote_dir, recurse=True)
+    put_time = time.perf_counter() - beg
+    beg = time.perf_counter()
+    remote_tree = f"{remote_dir}/{Path(tree).name}"
+    if transport == 'tar':
+        await proxy.get_tar_stream(remote_tree, pulled_dir, compress=compress)
+    else:
+        pulled_dir.mkdir()
+        await proxy.get_file_s(remote_tree, pulled_dir, recurse=True)
+    get_time = time.perf_counter() - beg
+    await proxy.close()
+    shutil.rmtree(pulled_dir)
+    return put_time, get_time
+
+
+async def main(tree, rtts):
+    client_key = asyncssh.generate_private_key('ssh-ed25519')
+    with tempfile.TemporaryDirectory() as workdir:
+        rootdir = Path(workdir) / "remote"
+        rootdir.mkdir()
+        if tree is None:
+            tree = Path(workdir) / "tree"
+            create_tree(tree, nb_dirs=20, nb_files=100, size=1024)
+        nb_files, nb_bytes = tree_stats(tree)
+        print(f"tree {tree}: {nb_files} files, {nb_bytes/2**20:.1f} MiB")
+        server, server_port = await start_server(str(rootdir))
+        print(f"{'rtt':>6} {'transport':<10} {'put s':>8} {'get s':>8}")
+        for rtt in rtts:
+            relay, port = await start_relay(server_port, rtt / 1000)
+            for transport, compress in (('sftp', False),
+                                        ('tar', False), ('tar', True)):
+                put_time, get_time = await one_run(
+                    port, client_key, str(tree), transport, compress, workdir)
+                name = transport + ("+gz" if compress else "")
+                print(f"{rtt:>4}ms {name:<10} {put_time:>8.2f} {get_time:>8.2f}")
+            relay.close()
+        server.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tree", default=None,
+                        help="the local tree to transfer;"
+                             " default is to create 2000 files of 1KiB")
+    parser.add_argument("--rtt", nargs='+', type=float, default=[0, 10],
+                        help="emulated round-trip times, in ms")
+    args = parser.parse_args()
+    asyncio.run(main(args.tree, args.rtt))
@@ -5,20 +5,38 @@ the bulk of the tests for apssh
 # pylint: disable=c0111,c0103,r0904,w0106, unspecified-encoding
 
 import unittest
+import unittest.mock
+import asyncio
+import json
 
 from pathlib import Path
+import tempfile
+import os
+from collections import Counter
 import string
+import time
 import random
+import io
+import subprocess
+import sys
 
-from asynciojobs import Scheduler, Sequence
+import asyncssh
+from asynciojobs import Scheduler, Sequence, Job
 
-from apssh import SshNode, SshJob, LocalNode
-from apssh import Run, RunScript, RunString, Push, Pull
-from apssh import load_private_keys
+from apssh import SshNode, SshJob, FanoutJob, QuorumJob, LocalNode
+from apssh import ProgressJob
+from apssh import Run, RunScript, RunString, Push, Pull, StdinBroadcast
+from apssh import PurgeRemoteWorkdir, Parallel
+from apssh import load_private_keys, COMMAND_TIMEOUT
 
-from apssh import HostFormatter, CaptureFormatter
+from apssh import HostFormatter, CaptureFormatter, Variables, Capture
+from apssh import prewarm, close_ssh_in_scheduler, AdaptiveWindow
 
+from apssh.records import failure_class, summary_json, summary_table
 from apssh.cli import Apssh
+from apssh.sshproxy import _ShellSession
+from apssh.stdin import stdin_consumer
+from apssh import reachability
 
 from .util import localuser, localhostname
 
@@ -181,6 +199,420 @@ class Tests(unittest.TestCase):
         self.assertEqual(node.formatter.get_capture(),
                          f"{localhostname()}\n")
 
+    def test_stream(self):
+        node = self.localnode()
+
+        async def consume():
+            lines = node.stream("seq 1 50000; exit 2", maxlines=10)
+            count = 0
+            async for line in lines:
+                count += 1
+                self.assertEqual(line, f"{count}\n")
+                self.assertLessEqual(len(lines._lines), 10000)
+            self.assertEqual(count, 50000)
+            self.assertEqual(lines.exit_status, 2)
+            # abandon an endless stream
+            async with node.stream("yes") as lines:
+                async for line in lines:
+                    self.assertEqual(line, "y\n")
+                    break
+            await node.close()
+
+        asyncio.run(consume())
+
+    def test_command_timeout(self):
+        scheduler = Scheduler(critical=False)
+        slow = SshJob(node=self.localnode(), scheduler=scheduler,
+                      critical=False, command=Run("sleep 30", timeout=1))
+        fast = SshJob(node=self.localnode(), scheduler=scheduler,
+                      command=Run("true", timeout=10))
+        local = SshJob(node=LocalNode(), scheduler=scheduler,
+                       critical=False, command=Run("sleep 30", timeout=1))
+        allowed = SshJob(node=self.localnode(), scheduler=scheduler,
+                         command=Run("sleep 30", timeout=1,
+                                     allowed_exits=[COMMAND_TIMEOUT]))
+        self.assertTrue(scheduler.run())
+        self.assertEqual(slow.result(), COMMAND_TIMEOUT)
+        self.assertEqual(fast.result(), 0)
+        self.assertEqual(local.result(), COMMAND_TIMEOUT)
+        self.assertEqual(allowed.result(), 0)
+
+    def test_purge_remote_workdir(self):
+        self.run_one_job(
+            SshJob(node=self.localnode(),
+                   commands=[
+                       Run("mkdir -p .apssh-remote;"
+                           " touch -d '2 hours ago' .apssh-remote/purge-old;"
+                           " touch .apssh-remote/purge-new"),
+                       PurgeRemoteWorkdir(max_age=3600),
+                       Run("test ! -f .apssh-remote/purge-old"
+                           " && test -f .apssh-remote/purge-new"),
+                       RunString("#!/bin/sh\ntrue\n", cleanup=True,
+                                 remote_name="purge-cleanup.sh"),
+                       Run("! ls .apssh-remote | grep -q purge-cleanup.sh"),
+                       Run("rm .apssh-remote/purge-new"),
+                   ],
+                   label="purge"))
+
+    def test_persistent_shell(self):
+        node = SshNode(hostname='localhost', username=localuser(),
+                       keys=load_private_keys(), formatter=HostFormatter(),
+                       persistent_shell=True)
+        variables = Variables()
+        self.run_one_job(
+            SshJob(node=node,
+                   commands=[
+                       Run(f"echo {i}") for i in range(10)
+                   ] + [
+                       # no trailing newline, and stderr
+                       Run("printf no-newline; echo oops >&2"),
+                       Run("exit 3", allowed_exits=[3]),
+                       # cd and exit must not affect the shell
+                       Run("cd /tmp; exit 0"),
+                       Run("pwd", capture=Capture("cwd", variables)),
+                       Run("sleep 10", timeout=1,
+                           allowed_exits=[COMMAND_TIMEOUT]),
+                       # a new shell gets created
+                       Run("true"),
+                   ],
+                   label="persistent"))
+        self.assertNotEqual(variables['cwd'], "/tmp")
+
+        # a shell that does not answer is reported right away
+        node = SshNode(hostname='localhost', username=localuser(),
+                       keys=load_private_keys(), formatter=HostFormatter(),
+                       persistent_shell=True, timeout=2)
+        async def mute_shell():
+            await node.connect_lazy()
+            try:
+                await node.run("true")
+            finally:
+                await node.close()
+        with unittest.mock.patch.object(_ShellSession, 'SHELL_COMMAND',
+                                        'exec cat >/dev/null'):
+            with self.assertRaises(ConnectionError):
+                asyncio.run(mute_shell())
+
+    def test_parallel(self):
+        scheduler = Scheduler(critical=False)
+        concurrent = SshJob(
+            node=self.localnode(), scheduler=scheduler,
+            commands=[
+                Parallel(*(Run("sleep 1") for _ in range(4))),
+                Run("echo after parallel"),
+            ])
+        failing = SshJob(
+            node=self.localnode(), scheduler=scheduler, critical=False,
+            commands=Parallel(Run("true"), Run("exit 5"), Run("exit 6"),
+                              Run("exit 7", allowed_exits=[7])))
+        local = SshJob(
+            node=LocalNode(), scheduler=scheduler,
+            commands=Parallel(Run("true"), Run("true"), max_sessions=1))
+        beg = time.time()
+        self.assertTrue(scheduler.run())
+        self.assertLess(time.time() - beg, 3)
+        self.assertEqual(concurrent.result(), 0)
+        self.assertEqual(failing.result(), 5)
+        self.assertEqual(local.result(), 0)
+
+    def test_concurrent_captures(self):
+        node = self.localnode()
+        variables = Variables()
+        scheduler = Scheduler()
+        SshJob(node=node, scheduler=scheduler,
+               commands=Parallel(*(
+                   Run(f"for i in 1 2 3; do echo {name}; sleep 0.1; done",
+                       capture=Capture(name, variables))
+                   for name in ("foo", "bar", "tutu"))))
+        # some uncaptured output on the same connection at the same time
+        SshJob(node=node, scheduler=scheduler,
+               command="for i in 1 2 3; do echo noise; sleep 0.1; done")
+        self.assertTrue(scheduler.run())
+        for name in ("foo", "bar", "tutu"):
+            self.assertEqual(variables[name], f"{name}\n{name}\n{name}")
+
+    def test_retries(self):
+        flag = Path("tests/retry-flag").resolve()
+        for scope in ('command', 'job'):
+            flag.unlink(missing_ok=True)
+            # fails the first time only
+            job = SshJob(node=self.localnode(), critical=False,
+                         retries=2, retry_on=[42], backoff=0.1,
+                         retry_scope=scope,
+                         commands=[
+                             Run("true"),
+                             Run(f"test -f {flag} || {{ touch {flag}; exit 42; }}"),
+                         ])
+            self.run_one_job(job)
+            self.assertIn("Retry#1", job.repr_result())
+        flag.unlink()
+        # a lost connection gets re-created
+        node = self.localnode()
+
+        async def reconnect():
+            await node.connect_lazy()
+            node.conn.close()
+            await node.conn.wait_closed()
+            await node.connect_lazy()
+            self.assertEqual(await node.run("true"), 0)
+            await node.close()
+        asyncio.run(reconnect())
+
+    def test_fanout(self):
+        nodes = [self.localnode() for _ in range(12)]
+        # an unreachable one
+        nodes.append(SshNode(hostname='localhost', port=1, username=localuser(),
+                             keys=load_private_keys(), formatter=HostFormatter()))
+        fanout = FanoutJob(nodes, window=4, critical=False,
+                           commands=[Run("true"), Run("hostname")])
+        self.assertTrue(Scheduler(fanout).run())
+        self.assertEqual(fanout.result(), 1)
+        self.assertEqual(fanout.results[:-1], [0] * 12)
+        self.assertIsNone(fanout.results[-1])
+        self.assertEqual(fanout.failed_nodes(), nodes[-1:])
+        self.assertIn(len(nodes) - 1, fanout.exceptions)
+        self.assertTrue(all(duration > 0 for duration in fanout.durations))
+        # connections get closed as we go
+        self.assertTrue(all(node.conn is None for node in nodes))
+
+    def test_prewarm(self):
+        good = [self.localnode() for _ in range(3)]
+        bad = SshNode(hostname='localhost', port=1, username=localuser(),
+                      keys=load_private_keys(), formatter=HostFormatter())
+        # not even tried, as its gateway is unreachable
+        behind = SshNode(gateway=bad, hostname='localhost',
+                         username=localuser(), keys=load_private_keys(),
+                         formatter=HostFormatter())
+        scheduler = Scheduler(critical=False)
+        jobs = [SshJob(node, command=Run("true"), critical=False,
+                       scheduler=scheduler)
+                for node in good + [bad, behind]]
+        warmup = prewarm(scheduler, window=2)
+        self.assertTrue(all(warmup in job.required for job in jobs))
+        scheduler.run()
+        self.assertEqual(set(warmup.result()), {bad, behind})
+        self.assertIs(warmup.result()[behind], warmup.result()[bad])
+        self.assertEqual([job.result() for job in jobs[:3]], [0, 0, 0])
+        self.assertTrue(all(node.conn is not None for node in good))
+        close_ssh_in_scheduler(scheduler)
+
+        # the nodes of a fanout job are not prewarmed, their gateways are
+        gateway = self.localnode()
+        behind = [SshNode(gateway=gateway, hostname='localhost',
+                          username=localuser(), keys=load_private_keys(),
+                          formatter=HostFormatter())
+                  for _ in range(3)]
+        scheduler = Scheduler(critical=False)
+        FanoutJob(behind, commands=[Run("true")], scheduler=scheduler)
+        warmup = prewarm(scheduler)
+        connected = {}
+        async def check():
+            connected['gateway'] = gateway.conn is not None
+            connected['behind'] = [node.conn is not None for node in behind]
+        Job(check(), scheduler=scheduler, required=warmup)
+        scheduler.run()
+        self.assertEqual(warmup.result(), {})
+        self.assertEqual(connected, {'gateway': True,
+                                     'behind': [False, False, False]})
+        close_ssh_in_scheduler(scheduler)
+
+    def test_window_slots(self):
+        gateway = self.localnode()
+        gateway.window = 2
+        behind = [SshNode(gateway=gateway, hostname='localhost',
+                          username=localuser(), keys=load_private_keys(),
+                          formatter=HostFormatter(), timeout=1)
+                  for _ in range(4)]
+        direct = [self.localnode() for _ in range(4)]
+        scheduler = Scheduler()
+        for node in behind + direct:
+            SshJob(node, command=Run("sleep 0.5"), scheduler=scheduler)
+        beg = time.time()
+        self.assertTrue(scheduler.run())
+        # 2 waves behind the gateway, the direct ones are not slowed down
+        self.assertGreaterEqual(time.time() - beg, 1.)
+        close_ssh_in_scheduler(scheduler)
+
+        # nested windows: at most 1 slot at a time on host, 3 on gateway
+        host = SshNode(gateway=gateway, hostname='localhost', window=1,
+                       username=localuser(), keys=load_private_keys(),
+                       formatter=HostFormatter())
+        gateway.window = 3
+        counts, peaks = Counter(), Counter()
+        async def probe(node):
+            hops = [host, gateway] if node is host else [gateway]
+            async with node.window_slot():
+                for hop in hops:
+                    counts[hop] += 1
+                    peaks[hop] = max(peaks[hop], counts[hop])
+                await asyncio.sleep(0.05)
+                for hop in hops:
+                    counts[hop] -= 1
+        async def main():
+            await asyncio.gather(*(probe(host) for _ in range(4)),
+                                 *(probe(gateway) for _ in range(4)))
+        asyncio.run(main())
+        self.assertEqual(peaks[host], 1)
+        self.assertEqual(peaks[gateway], 3)
+
+    def test_quorum(self):
+        jobs = [SshJob(self.localnode(), command=Run("true"), critical=False),
+                SshJob(self.localnode(), command=Run("true"), critical=False),
+                SshJob(self.localnode(), command=Run("false"), critical=False),
+                SshJob(self.localnode(), command=Run("sleep 10"),
+                       critical=False)]
+        quorum = QuorumJob(jobs, 2)
+        beg = time.time()
+        self.assertFalse(Scheduler(*jobs, quorum, critical=False).run())
+        self.assertLess(time.time() - beg, 5)
+        self.assertTrue(quorum.reached)
+        self.assertEqual(quorum.successes(), 2)
+        self.assertFalse(jobs[-1].is_done())
+        # cannot be reached
+        quorum = QuorumJob(jobs[:3], 3)
+        self.assertTrue(Scheduler(*jobs[:3], quorum, critical=False).run())
+        self.assertFalse(quorum.reached)
+
+    def test_records(self):
+        node = self.localnode()
+        job = SshJob(node, critical=False,
+                     commands=[Run("echo hello"),
+                               Run("echo oops >&2; exit 3")])
+        self.assertTrue(Scheduler(job).run())
+        record = job.record
+        self.assertEqual(record.result, 3)
+        self.assertFalse(record.reused_connection)
+        self.assertEqual([command.result for command in record.commands],
+                         [0, 3])
+        self.assertEqual(record.commands[0].stdout_bytes, len("hello\n"))
+        self.assertEqual(record.commands[1].stderr_bytes, len("oops\n"))
+        self.assertEqual(failure_class(record), "exit 3")
+
+        # commands that run at the same time on the same node
+        # are counted separately
+        for shared in (self.localnode(), LocalNode()):
+            scheduler = Scheduler()
+            jobs = [SshJob(shared, scheduler=scheduler,
+                           command=Run(f"for i in $(seq {size}); do"
+                                       f" echo 123456789; sleep 0.01; done"))
+                    for size in (10, 30)]
+            self.assertTrue(scheduler.run())
+            self.assertEqual([job.record.commands[0].stdout_bytes
+                              for job in jobs], [100, 300])
+
+        nodes = [self.localnode(), self.localnode()]
+        nodes.append(SshNode(hostname='localhost', port=1, username=localuser(),
+                             keys=load_private_keys(), formatter=HostFormatter()))
+        fanout = FanoutJob(nodes, command=Run("true"), critical=False,
+                           records=True)
+        Scheduler(fanout).run()
+        self.assertEqual([failure_class(record) for record in fanout.records],
+                         [None, None, "ConnectionRefusedError"])
+        pairs = list(zip(["a", "b", "c", "d"], fanout.records + [None]))
+        summary = json.loads(summary_json(pairs))
+        self.assertEqual(summary['failures'],
+                         {"ConnectionRefusedError": ["c"], "abandoned": ["d"]})
+        self.assertIn("2 OK - 2 failed out of 4 hosts", summary_table(pairs))
+
+    def test_local_long_lines(self):
+        # way beyond the 64KiB limit of readline(), and with
+        # multi-byte characters that get split between chunks
+        node = LocalNode(formatter=CaptureFormatter())
+        line = "é" * 300_000
+        retcod = asyncio.run(node.run(
+            f"python3 -c 'print(\"{line[:1]}\" * {len(line)}); print(\"end\")'"))
+        self.assertEqual(retcod, 0)
+        self.assertEqual(node.formatter.get_capture(), line + "\nend\n")
+        self.assertEqual(node.stdout_bytes, 2 * len(line) + 5)
+
+    def test_local_last_line(self):
+        # a last line with no newline gets one, like it used to
+        node = LocalNode(formatter=CaptureFormatter())
+        retcod = asyncio.run(node.run("printf 'first\\nno-newline'"))
+        self.assertEqual(retcod, 0)
+        self.assertEqual(node.formatter.get_capture(), "first\nno-newline\n")
+
+    def test_local_exec(self):
+        # these can be exec'ed with no shell
+        self.assertEqual(Run("cat", "/etc/hostname")._local_command(),
+                         ["cat", "/etc/hostname"])
+        self.assertEqual(Run("sleep", 1)._local_command(), ["sleep", "1"])
+        # but not these ones
+        for argv in (("echo", "$HOME"), ("tail -n", 1, "/etc/passwd"),
+                     ("cd", "/tmp"), ("FOO=1", "env"), ("ls", "*.py"),
+                     ("echo", ""), ("echo", "hello"), ("time", "sleep", 1),
+                     ("kill", "-0", 1), ("[", "-d", "/tmp", "]"),
+                     ("ls", ">/dev/null")):
+            self.assertIsInstance(Run(*argv)._local_command(), str)
+        node = LocalNode(formatter=CaptureFormatter())
+        self.run_one_job(SshJob(node, command=Run("expr", 1, "+", 1)))
+        self.assertEqual(node.formatter.get_capture(), "2\n")
+        # an exec'ed command is shown like a shell command
+        node = LocalNode(formatter=CaptureFormatter())
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                unittest.mock.patch('sys.stderr', new_callable=io.StringIO) as err:
+            asyncio.run(node.run(["touch", "a b"], ignore_outputs=True,
+                                 cwd=tmpdir))
+        self.assertIn("`touch 'a b'`", err.getvalue())
+
+    def test_local_max_processes(self):
+        node = LocalNode(max_processes=2)
+        scheduler = Scheduler()
+        for _ in range(6):
+            SshJob(node, command=Run("sleep", 0.3), scheduler=scheduler)
+        beg = time.time()
+        self.assertTrue(scheduler.run())
+        self.assertGreaterEqual(time.time() - beg, 0.9)
+        with self.assertRaises(ValueError):
+            LocalNode(max_processes=0)
+
+    def test_local_transfers(self):
+        node = LocalNode()
+        with tempfile.TemporaryDirectory() as tmp:
+            tree = Path(tmp) / "tree"
+            (tree / "sub").mkdir(parents=True)
+            (tree / "sub" / "data").write_bytes(os.urandom(3 * 2**20))
+            (tree / "link").symlink_to("sub/data")
+            script = tree / "script.sh"
+            script.write_text("#!/bin/sh\necho hello\n")
+            script.chmod(0o755)
+            pushed, pulled = Path(tmp) / "pushed", Path(tmp) / "pulled"
+            pushed.mkdir()
+            self.run_one_job(SshJob(node, commands=[
+                Push([str(tree)], str(pushed), recurse=True, preserve=True),
+                Pull(str(pushed / "tree" / "script.sh"), str(pulled)),
+                Push([str(script)], str(Path(tmp) / "tarred"),
+                     transport='tar'),
+            ]))
+            self.assertEqual((pushed / "tree" / "sub" / "data").read_bytes(),
+                             (tree / "sub" / "data").read_bytes())
+            self.assertEqual(os.readlink(pushed / "tree" / "link"), "sub/data")
+            self.assertTrue(os.access(pushed / "tree" / "script.sh", os.X_OK))
+            self.assertEqual(pulled.read_text(), script.read_text())
+            self.assertTrue((Path(tmp) / "tarred" / "script.sh").exists())
+            # not recursive
+            self.run_one_job(SshJob(node, critical=False,
+                                    command=Push([str(tree)], str(pushed))),
+                             expected=False)
+            # relative remote paths are in the home directory
+            remote = Path.home() / "apssh-local-push"
+            self.run_one_job(SshJob(node, command=Push(
+                [str(script)], "apssh-local-push")))
+            self.assertEqual(remote.read_text(), script.read_text())
+            remote.unlink()
+            # the times of a link are preserved, even a dangling one
+            dangling = Path(tmp) / "dangling"
+            dangling.symlink_to("nowhere")
+            os.utime(dangling, ns=(10**18, 10**18), follow_symlinks=False)
+            asyncio.run(node.copy_file_s(str(dangling), str(pulled) + ".link",
+                                         preserve=True, block_size=2**16))
+            self.assertEqual(
+                os.lstat(str(pulled) + ".link").st_mtime_ns, 10**18)
+            # the settings that cannot be honoured are not silently ignored
+            with self.assertRaises(TypeError):
+                asyncio.run(node.copy_file_s(str(script), str(pulled),
+                                             progress_handler=print))
+
     def test_logic1(self):
         self.run_one_job(
             SshJob(node=self.localnode(),
@@ -242,6 +674,184 @@ class Tests(unittest.TestCase):
             s3 = f3.read()
             self.assertEqual(s1, s3)
 
+    def test_file_loopback_tuned(self, size=16, nb_files=4):
+        # same but with several files, and the transfer tuning knobs
+        basenames = [f"tuned-{size}-{i}" for i in range(nb_files)]
+        for basename in basenames:
+            self.random_file("tests/" + basename, size)
+        Path("tests/tuned-back").mkdir(exist_ok=True)
+
+        tuning = dict(block_size=4096, max_requests=8, parallel=3)
+        self.run_one_job(
+            SshJob(node=self.localnode(),
+                   commands=[
+                       Run("mkdir -p apssh-tests"),
+                       Push(localpaths=["tests/" + b for b in basenames],
+                            remotepath="apssh-tests", **tuning),
+                       Pull(remotepaths=["apssh-tests/" + b for b in basenames],
+                            localpath="tests/tuned-back", **tuning),
+                   ]))
+
+        for basename in basenames:
+            with open("tests/" + basename) as f1, \
+                 open("tests/tuned-back/" + basename) as f2:
+                self.assertEqual(f1.read(), f2.read())
+
+        # several files can only go into a directory, even when parallel
+        node = self.localnode()
+        async def pull_into_file():
+            try:
+                await node.get_file_s(
+                    ["apssh-tests/" + b for b in basenames],
+                    "tests/" + basenames[0], parallel=3)
+            finally:
+                await node.close()
+        with self.assertRaises(asyncssh.sftp.SFTPError):
+            asyncio.run(pull_into_file())
+
+    def test_tree_loopback_tar(self):
+        # a small tree, pushed and pulled back with the tar transport
+        tree = Path("tests/tar-tree")
+        (tree / "sub").mkdir(parents=True, exist_ok=True)
+        for i in range(10):
+            self.random_file(str(tree / f"file-{i}"), 8)
+            self.random_file(str(tree / "sub" / f"file-{i}"), 8)
+
+        for compress in (False, True):
+            back = f"tests/tar-back-{compress}"
+            self.run_one_job(
+                SshJob(node=self.localnode(),
+                       commands=[
+                           Run("rm -rf apssh-tests/tar-tree"),
+                           Push(localpaths=str(tree), remotepath="apssh-tests",
+                                transport='tar', compress=compress),
+                           Pull(remotepaths="apssh-tests/tar-tree",
+                                localpath=back,
+                                transport='tar', compress=compress),
+                       ]))
+            self.run_one_job(
+                SshJob(node=LocalNode(),
+                       command=Run(f"diff -r {tree} {back}/tar-tree")))
+
+        # names that start with a dash are not taken for tar options
+        dashed = Path("tests/-tar-dashed")
+        self.random_file(str(dashed), 8)
+        self.run_one_job(
+            SshJob(node=self.localnode(),
+                   commands=[
+                       Push(localpaths=str(dashed), remotepath="apssh-tests",
+                            transport='tar'),
+                       Pull(remotepaths="apssh-tests/-tar-dashed",
+                            localpath="tests/tar-back-dashed",
+                            transport='tar'),
+                   ]))
+        self.assertEqual(dashed.read_bytes(),
+                         Path("tests/tar-back-dashed/-tar-dashed").read_bytes())
+
+    def test_stdin(self):
+        # the same contents through all the possible sources
+        random_path = "tests/stdin-random"
+        self.random_file(random_path, 18)
+        contents = Path(random_path).read_bytes()
+        # remote commands run in the home directory
+        full_path = Path(random_path).resolve()
+
+        async def chunks():
+            for start in range(0, len(contents), 10000):
+                yield contents[start:start+10000]
+
+        def check(source):
+            return f"cmp - {full_path}", source
+
+        scheduler = Scheduler()
+        broadcast = StdinBroadcast(Path(random_path))
+        for command, source in (
+                check(contents), check(Path(random_path)),
+                check(chunks()), check(broadcast), check(broadcast)):
+            SshJob(node=self.localnode(), scheduler=scheduler,
+                   command=Run(command, stdin=source))
+        SshJob(node=LocalNode(), scheduler=scheduler,
+               command=Run(f"cmp - {full_path}", stdin=broadcast))
+        # a command that does not read its input
+        SshJob(node=self.localnode(), scheduler=scheduler,
+               command=Run("true", stdin=Path(random_path)))
+        self.assertTrue(scheduler.run())
+        for job in scheduler.jobs:
+            self.assertEqual(job.result(), 0)
+
+    def test_stdin_broadcast_consumers(self):
+        # with consumers, the chunks are forgotten once all have read them
+        contents = bytes(range(256)) * 4096
+        broadcast = StdinBroadcast(contents, consumers=2)
+
+        async def consume():
+            first, second = broadcast.chunks(), broadcast.chunks()
+            read1, read2 = [], []
+            read1.append(await first.__anext__())
+            # the second consumer has not read anything yet
+            self.assertEqual(len(broadcast._chunks), 1)
+            read2.append(await second.__anext__())
+            self.assertEqual(len(broadcast._chunks), 0)
+            read1 += [chunk async for chunk in first]
+            read2 += [chunk async for chunk in second]
+            self.assertEqual(b"".join(read1), contents)
+            self.assertEqual(b"".join(read2), contents)
+            self.assertEqual(len(broadcast._chunks), 0)
+            with self.assertRaises(ValueError):
+                await broadcast.chunks().__anext__()
+        asyncio.run(consume())
+
+    def test_stdin_broadcast_unreachable(self):
+        # a node that cannot be reached does not hold the chunks
+        contents = bytes(range(256)) * 4096
+        broadcast = StdinBroadcast(contents, consumers=3)
+        reader = LocalNode(formatter=CaptureFormatter())
+        dead = SshNode("nosuchhost.invalid", username=localuser(),
+                       formatter=CaptureFormatter())
+        scheduler = Scheduler(critical=False)
+        for node in (reader, reader, dead):
+            SshJob(node, command=Run("wc", "-c", stdin=broadcast),
+                   critical=False, scheduler=scheduler)
+        scheduler.run()
+        self.assertEqual(reader.formatter.get_capture(),
+                         2 * f"{len(contents)}\n")
+        self.assertEqual(broadcast._chunks, [])
+        self.assertEqual(broadcast._started, 3)
+        # a consumer that gives up after reading has nothing to give back
+        with stdin_consumer(broadcast) as consumer:
+            pass
+        self.assertTrue(consumer.released)
+        self.assertEqual(broadcast._started, 3)
+        # retrying is not possible with --stdin -
+        with self.assertRaises(SystemExit):
+            Apssh().main('-t', 'localhost', '--stdin', '-', '--retries', '1',
+                         'cat')
+
+    def test_stdin_errors(self):
+        # a bad source is reported right away
+        with self.assertRaises(ValueError):
+            Run("cat", stdin="not-a-path")
+        with self.assertRaises(ValueError):
+            StdinBroadcast(12)
+
+        async def broken():
+            yield b"some data"
+            raise RuntimeError("broken source")
+
+        node = self.localnode()
+        async def run(source):
+            await node.connect_lazy()
+            try:
+                # must not wait for an EOF that never comes
+                return await asyncio.wait_for(
+                    node.run("cat > /dev/null", stdin=source), timeout=10)
+            finally:
+                await node.close()
+        with self.assertRaises(FileNotFoundError):
+            asyncio.run(run(Path("tests/no-such-stdin")))
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run(broken()))
+
     def test_local_command(self):
         # create random file in python rather than with /dev/random
         # this uses sha1sum which is available on the linux test boxes
@@ -368,6 +978,16 @@ xterm
         argv += ['hostname']
         self.run_apssh(argv)
 
+    def test_stdin_option(self):
+        # each target streams its own copy of the file
+        random_path = "tests/stdin-option"
+        self.random_file(random_path, 16)
+        full_path = Path(random_path).resolve()
+        argv = ['-l', localuser()]
+        argv += ['-t', 'localhost', '-t', '127.0.0.1']
+        argv += ['--stdin', random_path, f'cmp - {full_path}']
+        self.run_apssh(argv)
+
     def test_targets2(self):
         argv = []
         argv = ['-l', localuser()]
@@ -376,6 +996,160 @@ xterm
         argv += ['hostname']
         self.run_apssh(argv)
 
+    def test_lazy_imports(self):
+        # apssh --version and a mere import should not load
+        # the heavy dependencies
+        script = """
+import sys
+import apssh
+from apssh.cli import Apssh
+try:
+    Apssh().main('-V')
+except SystemExit:
+    pass
+print(*(module for module in ('asyncssh', 'asynciojobs', 'jinja2', 'yaml')
+        if module in sys.modules))
+"""
+        completed = subprocess.run([sys.executable, "-c", script],
+                                   capture_output=True, text=True, check=True)
+        version, loaded = completed.stdout.split("\n")[:2]
+        self.assertTrue(version.startswith("apssh version"))
+        self.assertEqual(loaded, "")
+        # and yet everything is available
+        import apssh                    # pylint: disable=import-outside-toplevel
+        self.assertIs(apssh.SshNode, SshNode)
+        self.assertIn('YamlLoader', dir(apssh))
+        with self.assertRaises(AttributeError):
+            apssh.NoSuchThing           # pylint: disable=pointless-statement
+
+    def test_progress(self):
+        # redirected, one line per period
+        stream = io.StringIO()
+        jobs = [SshJob(LocalNode(), command=command, critical=False)
+                for command in ("true", "false", "sleep 0.3")]
+        progress = ProgressJob(jobs, period=0.1, stream=stream)
+        self.assertTrue(Scheduler(*jobs, progress).run())
+        lines = stream.getvalue().splitlines()
+        self.assertGreater(len(lines), 1)
+        self.assertTrue(lines[-1].startswith("3/3 done (2 ok, 1 failed)"))
+        self.assertTrue(lines[-1].endswith("- done"))
+        self.assertNotIn("\r", stream.getvalue())
+
+        # a fanout, on a terminal
+        class Terminal(io.StringIO):
+            def isatty(self):
+                return True
+        stream = Terminal()
+        nodes = [LocalNode() for _ in range(5)]
+        fanout = FanoutJob(nodes, command="sleep 0.2", window=2)
+        progress = ProgressJob([fanout], stream=stream)
+        self.assertEqual(progress.period, 0.5)
+        self.assertTrue(Scheduler(fanout, progress).run())
+        output = stream.getvalue()
+        self.assertTrue(output.startswith("\r0/5 done"))
+        self.assertTrue(output.split("\r")[-1].startswith(
+            "5/5 done (5 ok, 0 failed)"))
+        self.assertEqual(output.count("\n"), 1)
+        self.assertEqual(progress.counters()['succeeded'], 5)
+
+        argv = ['-l', localuser(), '-t', 'localhost', '--progress']
+        self.assertEqual(Apssh().main(*argv, 'hostname'), 0)
+
+    def test_skip_recently_failed(self):
+        saved = reachability.reachability_path
+        with tempfile.TemporaryDirectory() as tmpdir:
+            reachability.reachability_path = Path(tmpdir) / "reachability"
+            try:
+                argv = ['-l', localuser(), '-t', 'localhost',
+                        '-t', 'nosuchhost.invalid',
+                        '--skip-recently-failed', '60']
+                self.assertEqual(Apssh().main(*argv, 'hostname'), 1)
+                record = reachability.Reachability().load()
+                self.assertEqual(record.entries['localhost'][0],
+                                 reachability.REACHABLE)
+                self.assertIsNotNone(
+                    record.failed_since('nosuchhost.invalid', 60))
+                self.assertIsNone(record.failed_since('localhost', 60))
+                # the dead host is now skipped, and marked as such
+                beg = time.time()
+                self.assertEqual(
+                    Apssh().main('-o', str(Path(tmpdir) / "out"), '--mark',
+                                 *argv, 'hostname'), 1)
+                self.assertLess(time.time() - beg, 5)
+                mark = Path(tmpdir) / "out" / "3skipped" / "nosuchhost.invalid"
+                self.assertEqual(mark.read_text(), "SKIPPED\n")
+                # but not with a zero TTL
+                self.assertIsNone(reachability.Reachability().load()
+                                  .failed_since('nosuchhost.invalid', -1))
+                # the old outcomes are dropped
+                record = reachability.Reachability().load()
+                record.record('oldhost', False, time.time() - 3600)
+                record.save(max_age=60)
+                self.assertNotIn('oldhost',
+                                 reachability.Reachability().load().entries)
+                # and the record is left alone without the option
+                reachability.reachability_path.unlink()
+                self.assertEqual(Apssh().main(*argv[:-2], 'hostname'), 1)
+                self.assertFalse(reachability.reachability_path.exists())
+            finally:
+                reachability.reachability_path = saved
+
+    def test_adaptive_window(self):
+        # a fake server that resets connections beyond 20 simultaneous ones
+        window = AdaptiveWindow(4)
+        in_flight = Counter()
+
+        async def attempt():
+            async with window.attempt():
+                in_flight['now'] += 1
+                in_flight['max'] = max(in_flight['max'], in_flight['now'])
+                try:
+                    await asyncio.sleep(0.01)
+                    if in_flight['now'] > 20:
+                        raise ConnectionResetError("MaxStartups")
+                finally:
+                    in_flight['now'] -= 1
+
+        async def run_all():
+            return await asyncio.gather(*(attempt() for _ in range(1000)),
+                                        return_exceptions=True)
+
+        outcomes = asyncio.run(run_all())
+        resets = sum(isinstance(outcome, Exception) for outcome in outcomes)
+        reasons = [reason for *_, reason in window.trajectory]
+        print(f"{resets} resets, max in flight {in_flight['max']},"
+              f" trajectory {window.trajectory[:20]}...")
+        self.assertEqual(reasons[0], "start")
+        self.assertIn("increase", reasons)
+        self.assertIn("ConnectionResetError", reasons)
+        self.assertLess(resets, 100)
+        self.assertLessEqual(window.limit(), 40)
+        self.assertEqual(window.in_flight, 0)
+        with self.assertRaises(ValueError):
+            AdaptiveWindow(decrease=2)
+
+    def test_window_auto(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log = Path(tmpdir) / "window.log"
+            argv = ['-l', localuser(), '-t', 'localhost', '-t', '127.0.0.1',
+                    '-w', 'auto', '--window-log', str(log)]
+            self.assertEqual(Apssh().main(*argv, 'hostname'), 0)
+            lines = log.read_text().splitlines()
+            self.assertTrue(lines[0].endswith(" start"))
+
+    def test_deadline(self):
+        argv = ['-l', localuser(), '-t', 'localhost', '-t', '127.0.0.1']
+        beg = time.time()
+        self.assertEqual(
+            Apssh().main('--deadline', '1', *argv, 'sleep 10'), 1)
+        self.assertLess(time.time() - beg, 5)
+        # the quorum is enough for a 0 exit code
+        lock = Path("DEADLINE-LOCK")
+        self.assertEqual(
+            Apssh().main('--quorum', '1', *argv,
+                         f'mkdir {lock.resolve()} || sleep 10'), 0)
+        lock.rmdir()
+
     def test_targets3(self):
         filename = 'TARGETS3'
         with open(filename, 'w') as targets:
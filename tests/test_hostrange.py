@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+"""
+Testing the host patterns in apssh
+"""
+
+import unittest
+from argparse import ArgumentParser
+
+from apssh.hostrange import (
+    expand_hostnames, compress_hostnames, HostPattern, split_targets)
+from apssh.targets import Targets
+
+
+class Tests(unittest.TestCase):
+
+    def test_expand(self):
+        self.assertEqual(list(expand_hostnames("fit[01-03,40].example.org")),
+                         ["fit01.example.org", "fit02.example.org",
+                          "fit03.example.org", "fit40.example.org"])
+        self.assertEqual(list(expand_hostnames("node{a,b}-[9-10]")),
+                         ["nodea-9", "nodea-10", "nodeb-9", "nodeb-10"])
+        self.assertEqual(list(expand_hostnames("plain")), ["plain"])
+        for broken in ("fit[01", "fit[a-b]", "fit[5-1]", "fit{a,[1-2]}"):
+            with self.assertRaises(ValueError):
+                expand_hostnames(broken)
+
+    def test_match(self):
+        pattern = HostPattern("node{a,b}-[1-64]")
+        for hostname in ("nodea-1", "nodeb-64"):
+            self.assertTrue(pattern.match(hostname))
+        for hostname in ("nodea-01", "nodeb-65", "nodec-1", "nodea-"):
+            self.assertFalse(pattern.match(hostname))
+        pattern = HostPattern("fit[01-37]")
+        self.assertTrue(pattern.match("fit07"))
+        self.assertFalse(pattern.match("fit7"))
+        # no expansion is needed
+        self.assertTrue(HostPattern("n[1-1000000000]").match("n123456789"))
+        # adjacent ranges, the digits can be split in several ways;
+        # and padded numbers can be wider than the pad
+        for text in ("fit[1-2][10-30]", "n[01-100]", "n[001-10,7-1000]"):
+            pattern = HostPattern(text)
+            for hostname in expand_hostnames(text):
+                self.assertTrue(pattern.match(hostname), hostname)
+        pattern = HostPattern("fit[1-2][10-30]")
+        self.assertTrue(pattern.match("fit120"))
+        self.assertFalse(pattern.match("fit131"))
+        self.assertFalse(pattern.match("fit12"))
+        pattern = HostPattern("n[01-100]")
+        self.assertTrue(pattern.match("n100"))
+        self.assertFalse(pattern.match("n0100"))
+        self.assertFalse(pattern.match("n101"))
+
+    def test_compress(self):
+        hostnames = (list(expand_hostnames("fit[01-37,40].x"))
+                     + list(expand_hostnames("node[1-64]"))
+                     + ["localhost", "n007", "n7", "fit01.x"])
+        compressed = compress_hostnames(reversed(hostnames))
+        self.assertIn("fit[01-37,40].x", compressed)
+        self.assertIn("node[1-64]", compressed)
+        expanded = [hostname for pattern in compressed
+                    for hostname in expand_hostnames(pattern)]
+        self.assertEqual(sorted(expanded), sorted(set(hostnames)))
+
+    def test_split(self):
+        self.assertEqual(split_targets("fit[01-37,40] a,b  node{a,b}-[1-3]"),
+                         ["fit[01-37,40]", "a", "b", "node{a,b}-[1-3]"])
+
+    def test_targets(self):
+        parser = ArgumentParser()
+        targets = Targets()
+        targets.add_target_options(parser)
+        args = parser.parse_args(
+            ["-t", "fit[01-05],user@other", "-x", "fit[02-03]", "-x", "fit05"])
+        args.timeout, args.debug, args.dry_run = 5, False, False
+        targets.init_from_args(args, [], None)
+        proxies = targets.create_proxies()
+        self.assertEqual([proxy.hostname for proxy in proxies],
+                         ["fit01", "fit04", "other"])
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+"""
+Testing the loading of target files and directories
+"""
+
+import os
+import unittest
+import tempfile
+from pathlib import Path
+
+from apssh import inventory
+
+
+class Tests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.saved_inventory_dir = inventory.inventory_dir
+        inventory.inventory_dir = Path(self.tmpdir.name) / "inventory"
+        inventory.clear_inventory_cache()
+
+    def tearDown(self):
+        inventory.inventory_dir = self.saved_inventory_dir
+        inventory.clear_inventory_cache()
+        self.tmpdir.cleanup()
+
+    def test_directory(self):
+        markdir = Path(self.tmpdir.name) / "marks"
+        (markdir / "subdir").mkdir(parents=True)
+        for hostname in ("host1", "host2"):
+            (markdir / hostname).touch()
+        self.assertEqual(sorted(inventory.scan_directory(markdir)),
+                         ["host1", "host2"])
+
+    def test_compiled(self):
+        hostfile = Path(self.tmpdir.name) / "hosts"
+        nb_hosts = inventory.INVENTORY_THRESHOLD // 10
+        hostfile.write_text("# a comment\n" + "".join(
+            f"host{index:05d} user@other{index:05d}\n"
+            for index in range(nb_hosts)))
+        tokens = inventory.read_target_file(hostfile)
+        self.assertEqual(len(tokens), 2 * nb_hosts)
+        compiled = list(inventory.inventory_dir.glob("*.inv"))
+        self.assertEqual(len(compiled), 1)
+        # as in a subsequent run
+        inventory.clear_inventory_cache()
+        self.assertEqual(inventory.read_target_file(hostfile), tokens)
+        # a change in the file is noticed
+        hostfile.write_text("alone\n" * nb_hosts)
+        stat = hostfile.stat()
+        os.utime(hostfile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(inventory.read_target_file(hostfile),
+                         ["alone"] * nb_hosts)
+        inventory.clear_inventory_cache(on_disk=True)
+        self.assertFalse(list(inventory.inventory_dir.glob("*.inv")))
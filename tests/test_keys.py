@@ -5,9 +5,16 @@ Testing the keys loading features in apssh
 """
 
 import unittest
+import asyncio
+import tempfile
 from pathlib import Path
 
+import asyncssh
+
 from apssh.keys import import_private_key, load_private_keys
+from apssh.keys import (
+    load_agent_keys, co_load_agent_keys, co_load_private_keys,
+    clear_keys_cache)
 
 
 class Tests(unittest.TestCase):
@@ -25,3 +32,29 @@ class Tests(unittest.TestCase):
     def test_agent(self):
         for key in load_private_keys():
             print(f"Found in agent: {key}")
+
+    def test_cache(self):
+        clear_keys_cache()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "id_test"
+            asyncssh.generate_private_key('ssh-ed25519').write_private_key(path)
+            keys1 = load_private_keys([path])
+            keys2 = asyncio.run(co_load_private_keys([str(path)]))
+            self.assertEqual(len(keys1), 1)
+            # the file is parsed only once
+            self.assertIs(keys1[0], keys2[0])
+            clear_keys_cache()
+            keys3 = load_private_keys([path])
+            self.assertIsNot(keys1[0], keys3[0])
+
+    def test_agent_in_loop(self):
+        # an unreachable agent yields no key, even from a running loop
+        bogus = "/nonexistent/agent.sock"
+        clear_keys_cache()
+
+        async def from_loop():
+            return load_agent_keys(bogus), await co_load_agent_keys(bogus)
+
+        self.assertEqual(asyncio.run(from_loop()), ([], []))
+        self.assertEqual(load_agent_keys(bogus), [])
+        clear_keys_cache()